@@ -1,12 +1,29 @@
 import base64
+import codecs
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
 from io import BytesIO
 from pathlib import Path
 
 import requests
 from PIL import Image as PILImage, ImageDraw, ImageFont
-from openpyxl.formatting.rule import ColorScaleRule
-from openpyxl.styles import Alignment, Font, PatternFill
-
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.utils import absolute_coordinate, get_column_letter
+
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.charts.legends import Legend
+from reportlab.graphics.charts.lineplots import LinePlot
+from reportlab.graphics.shapes import Drawing, Group, String
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from reportlab.lib.pagesizes import A4
@@ -30,7 +47,10 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
+from pvlib.irradiance import get_total_irradiance
 from pvlib.location import Location
+from pvlib.pvsystem import pvwatts_dc
+from pvlib.temperature import faiman
 
 
 # ============================================================
@@ -1324,69 +1344,434 @@ def render_header() -> None:
     )
 
 
-@st.cache_data(show_spinner=False)
-def read_enedis_file(file_bytes: bytes, filename: str) -> pd.DataFrame:
-    buffer = BytesIO(file_bytes)
+ENEDIS_COLUMNS = ["Unité", "Horodate", "Valeur", "Nature", "Pas"]
+CSV_SNIFF_BYTES = 64 * 1024
+CSV_CHUNK_ROWS = 200_000
+EXCEL_HEADER_SCAN_ROWS = 50
+EXCEL_PROGRESS_ROWS = 20_000
+HORODATE_FORMATS = [
+    "%Y-%m-%dT%H:%M:%S%z",
+    "%Y-%m-%d %H:%M:%S%z",
+    "%Y-%m-%dT%H:%M%z",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%d/%m/%Y",
+]
+HORODATE_EXCEL_SERIAL = "excel"
+HORODATE_SAMPLE_SIZE = 500
+CSV_UNRECOGNIZED_MESSAGE = (
+    "Le CSV ne contient pas les colonnes Horodate et Valeur "
+    "ou son format n'est pas reconnu."
+)
 
-    if filename.lower().endswith(".csv"):
-        attempts = [
-            {"sep": ";", "encoding": "utf-8"},
-            {"sep": ";", "encoding": "latin-1"},
-            {"sep": ",", "encoding": "utf-8"},
-            {"sep": ",", "encoding": "latin-1"},
-        ]
 
-        df = None
-        last_error = None
+def sniff_enedis_csv(file_bytes: bytes) -> dict:
+    """Détecte encodage, séparateur et ligne d'en-tête sur le début du fichier.
 
-        for params in attempts:
-            try:
-                buffer.seek(0)
-                candidate = pd.read_csv(buffer, **params)
+    Seuls les premiers kilo-octets sont décodés : la lecture complète n'est
+    ensuite faite qu'une seule fois, avec les bons paramètres.
+    """
+    sample = file_bytes[:CSV_SNIFF_BYTES]
+    text = None
+    encoding = "latin-1"
 
-                if {"Horodate", "Valeur"}.issubset(candidate.columns):
-                    df = candidate
-                    break
-            except Exception as exc:
-                last_error = exc
+    for candidate in ("utf-8-sig", "latin-1"):
+        try:
+            # Le décodeur incrémental tolère un caractère multi-octets coupé
+            # en fin d'échantillon.
+            decoder = codecs.getincrementaldecoder(candidate)()
+            text = decoder.decode(sample, final=False)
+            encoding = candidate
+            break
+        except UnicodeDecodeError:
+            continue
 
-        if df is None:
-            raise ValueError(
-                "Le CSV ne contient pas les colonnes Horodate et Valeur "
-                "ou son format n'est pas reconnu."
-            ) from last_error
-    else:
-        df = pd.read_excel(buffer)
+    lines = (text or "").splitlines()
 
-    required = {"Horodate", "Valeur"}
-    missing = required - set(df.columns)
+    # La dernière ligne de l'échantillon peut être tronquée.
+    if len(file_bytes) > len(sample) and len(lines) > 1:
+        lines = lines[:-1]
 
-    if missing:
-        raise ValueError(
-            "Colonne(s) manquante(s) : " + ", ".join(sorted(missing))
+    for line_number, line in enumerate(lines):
+        for separator in (";", ","):
+            fields = [
+                field.strip().strip('"')
+                for field in line.split(separator)
+            ]
+            if {"Horodate", "Valeur"}.issubset(fields):
+                value_position = fields.index("Valeur")
+                sample_values = [
+                    row.split(separator)[value_position]
+                    for row in lines[line_number + 1:]
+                    if len(row.split(separator)) > value_position
+                ]
+                decimal = (
+                    ","
+                    if separator == ";"
+                    and any("," in value for value in sample_values)
+                    else "."
+                )
+                return {
+                    "encoding": encoding,
+                    "sep": separator,
+                    "decimal": decimal,
+                    "skiprows": line_number,
+                    "columns": [
+                        column
+                        for column in ENEDIS_COLUMNS
+                        if column in fields
+                    ],
+                }
+
+    raise ValueError(CSV_UNRECOGNIZED_MESSAGE)
+
+
+def detect_horodate_format(values: pd.Series) -> str | None:
+    """Reconnaît la mise en forme des horodatages sur un échantillon.
+
+    Formats Enedis connus : ISO avec décalage horaire (SGE), date française
+    « jj/mm/aaaa hh:mm[:ss] », ISO sans décalage et numéros de série Excel.
+    Retourne None si aucun format explicite ne convient à tout l'échantillon.
+    """
+    sample = values.dropna().head(HORODATE_SAMPLE_SIZE)
+
+    if sample.empty:
+        return None
+
+    sample = sample.astype(str).str.strip()
+
+    for horodate_format in HORODATE_FORMATS:
+        parsed = pd.to_datetime(
+            sample,
+            format=horodate_format,
+            errors="coerce",
+            utc="%z" in horodate_format,
+        )
+        if parsed.notna().all():
+            return horodate_format
+
+    serials = pd.to_numeric(
+        sample.str.replace(",", ".", regex=False),
+        errors="coerce",
+    )
+    # Plage plausible des numéros de série Excel : années 1954 à 2119.
+    if serials.notna().all() and serials.between(20000, 80000).all():
+        return HORODATE_EXCEL_SERIAL
+
+    return None
+
+
+def parse_enedis_horodate(
+    values: pd.Series,
+    horodate_format: str | None,
+) -> tuple[pd.Series, pd.Series | None]:
+    """Convertit Horodate en heure locale naïve, avec l'instant UTC si connu.
+
+    Quand le fichier porte le décalage (+01:00 / +02:00), l'instant UTC est
+    conservé : il lève toute ambiguïté sur l'heure répétée d'octobre.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        if getattr(values.dt, "tz", None) is None:
+            return values, None
+        utc = values.dt.tz_convert("UTC")
+        return utc.dt.tz_convert("Europe/Paris").dt.tz_localize(None), utc
+
+    if horodate_format == HORODATE_EXCEL_SERIAL:
+        serials = pd.to_numeric(
+            values.astype(str).str.replace(",", ".", regex=False),
+            errors="coerce",
+        )
+        local = pd.to_datetime(
+            serials,
+            unit="D",
+            origin="1899-12-30",
+        ).dt.round("s")
+        return local, None
+
+    if horodate_format is None:
+        parsed = pd.to_datetime(values, errors="coerce", dayfirst=True)
+
+        if not pd.api.types.is_datetime64_any_dtype(parsed):
+            # Décalages différents (heure d'hiver / d'été) : lecture en UTC.
+            parsed = pd.to_datetime(
+                values,
+                errors="coerce",
+                dayfirst=True,
+                utc=True,
+            )
+        return parse_enedis_horodate(parsed, None)
+
+    text = values.astype(str).str.strip()
+    has_offset = "%z" in horodate_format
+    parsed = pd.to_datetime(
+        text,
+        format=horodate_format,
+        errors="coerce",
+        utc=has_offset,
+    )
+
+    # Lignes isolées hors format (ex. minuit sans heure) : seul ce reliquat
+    # passe par l'inférence lente.
+    leftovers = parsed.isna() & values.notna()
+    if leftovers.any():
+        parsed.loc[leftovers] = pd.to_datetime(
+            text[leftovers],
+            errors="coerce",
+            dayfirst=True,
+            utc=has_offset,
         )
 
+    if not has_offset:
+        return parsed, None
+
+    local = parsed.dt.tz_convert("Europe/Paris").dt.tz_localize(None)
+    return local, parsed
+
+
+def parse_enedis_values(values: pd.Series) -> pd.Series:
+    """Convertit Valeur en nombre, virgule ou point décimal acceptés."""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+
+    text = values.astype(str)
+
+    if text.str.contains(",", regex=False).any():
+        text = text.str.replace(",", ".", regex=False)
+
+    return pd.to_numeric(text, errors="coerce")
+
+
+def normalize_enedis_frame(
+    df: pd.DataFrame,
+    horodate_format: str | None,
+) -> pd.DataFrame:
+    """Convertit Horodate/Valeur et écarte les lignes inexploitables.
+
+    ``horodate_format`` est celui reconnu par detect_horodate_format pour
+    l'ensemble du fichier ; None impose l'inférence de pandas.
+    """
     available_columns = [
         column
-        for column in ["Unité", "Horodate", "Valeur", "Nature", "Pas"]
+        for column in ENEDIS_COLUMNS
         if column in df.columns
     ]
 
     df = df[available_columns].copy()
-
-    df["Horodate"] = pd.to_datetime(
+    df["Horodate"], horodate_utc = parse_enedis_horodate(
         df["Horodate"],
-        errors="coerce",
-        dayfirst=True,
+        horodate_format,
     )
 
-    df["Valeur"] = pd.to_numeric(
-        df["Valeur"].astype(str).str.replace(",", ".", regex=False),
-        errors="coerce",
+    if horodate_utc is not None:
+        df["Horodate_UTC"] = horodate_utc
+
+    df["Valeur"] = parse_enedis_values(df["Valeur"])
+
+    return df.dropna(subset=["Horodate", "Valeur"])
+
+
+def normalize_enedis_chunks(chunks) -> list[pd.DataFrame]:
+    """Normalise des blocs successifs avec un format d'horodate commun."""
+    normalized = []
+    horodate_format = None
+    detected = False
+
+    for chunk in chunks:
+        # Le format est reconnu une fois, sur le premier bloc comportant des
+        # horodates, puis imposé à tous les blocs, même s'il n'a pas été
+        # reconnu : chaque ligne est ainsi lue de la même façon.
+        if not detected and chunk["Horodate"].notna().any():
+            horodate_format = detect_horodate_format(chunk["Horodate"])
+            detected = True
+        normalized.append(normalize_enedis_frame(chunk, horodate_format))
+
+    return normalized
+
+
+def read_enedis_csv(file_bytes: bytes) -> pd.DataFrame:
+    """Lit un CSV Enedis en une seule passe, par blocs de lignes.
+
+    Seules les colonnes utiles sont chargées (Valeur directement en nombre
+    avec le séparateur décimal détecté, le reste en texte), puis chaque bloc
+    est normalisé avant d'être conservé : la mémoire reste proportionnelle
+    aux données utiles et non au fichier complet.
+    """
+    dialect = sniff_enedis_csv(file_bytes)
+    encodings = [dialect["encoding"]]
+
+    # Un fichier dont l'échantillon est en ASCII pur peut contenir plus loin
+    # des caractères Latin-1 : une seule relecture est alors nécessaire.
+    if dialect["encoding"] != "latin-1":
+        encodings.append("latin-1")
+
+    last_error = None
+
+    for encoding in encodings:
+        try:
+            reader = pd.read_csv(
+                BytesIO(file_bytes),
+                sep=dialect["sep"],
+                encoding=encoding,
+                skiprows=dialect["skiprows"],
+                usecols=dialect["columns"],
+                dtype={
+                    column: str
+                    for column in dialect["columns"]
+                    if column != "Valeur"
+                },
+                decimal=dialect["decimal"],
+                chunksize=CSV_CHUNK_ROWS,
+            )
+            chunks = normalize_enedis_chunks(reader)
+            break
+        except UnicodeDecodeError as exc:
+            last_error = exc
+        except (pd.errors.ParserError, ValueError) as exc:
+            raise ValueError(CSV_UNRECOGNIZED_MESSAGE) from exc
+    else:
+        raise ValueError(CSV_UNRECOGNIZED_MESSAGE) from last_error
+
+    if not chunks:
+        return pd.DataFrame(columns=dialect["columns"])
+
+    return pd.concat(chunks, ignore_index=True)
+
+
+def locate_enedis_sheet(workbook) -> tuple:
+    """Trouve la feuille et la ligne d'en-tête contenant Horodate et Valeur.
+
+    Les classeurs Enedis comportent souvent quelques lignes de présentation
+    (titre, PRM, période) au-dessus du tableau.
+    """
+    for worksheet in workbook.worksheets:
+        for row_number, row in enumerate(
+            worksheet.iter_rows(
+                max_row=EXCEL_HEADER_SCAN_ROWS,
+                values_only=True,
+            ),
+            start=1,
+        ):
+            labels = [
+                str(value).strip() if value is not None else ""
+                for value in row
+            ]
+            if {"Horodate", "Valeur"}.issubset(labels):
+                return worksheet, row_number, labels
+
+    raise ValueError("Colonne(s) manquante(s) : Horodate, Valeur")
+
+
+def _excel_rows_to_frame(rows: list[tuple], offsets: dict) -> pd.DataFrame:
+    frame = pd.DataFrame.from_records(rows)
+    return pd.DataFrame(
+        {
+            column: frame[offset] if offset in frame.columns else None
+            for column, offset in offsets.items()
+        }
+    )
+
+
+def read_enedis_excel(file_bytes: bytes, progress=None) -> pd.DataFrame:
+    """Lit un classeur .xlsx en flux (mode lecture seule d'openpyxl).
+
+    Seules les colonnes Enedis utiles sont extraites, par blocs de lignes.
+    ``progress`` reçoit la fraction de lignes lues lorsque la taille de la
+    feuille est connue.
+    """
+    workbook = load_workbook(
+        BytesIO(file_bytes),
+        read_only=True,
+        data_only=True,
     )
 
-    df = df.dropna(subset=["Horodate", "Valeur"])
-    df = df.sort_values("Horodate").reset_index(drop=True)
+    try:
+        worksheet, header_row, labels = locate_enedis_sheet(workbook)
+        positions = {
+            column: labels.index(column)
+            for column in ENEDIS_COLUMNS
+            if column in labels
+        }
+        first_column = min(positions.values())
+        last_column = max(positions.values())
+        offsets = {
+            column: position - first_column
+            for column, position in positions.items()
+        }
+        total_rows = max((worksheet.max_row or 0) - header_row, 0)
+
+        def iter_chunks():
+            rows = []
+            for row_number, row in enumerate(
+                worksheet.iter_rows(
+                    min_row=header_row + 1,
+                    min_col=first_column + 1,
+                    max_col=last_column + 1,
+                    values_only=True,
+                ),
+                start=1,
+            ):
+                rows.append(row)
+
+                if progress is not None and total_rows and (
+                    row_number % EXCEL_PROGRESS_ROWS == 0
+                ):
+                    progress(min(row_number / total_rows, 1.0))
+
+                if len(rows) == CSV_CHUNK_ROWS:
+                    yield _excel_rows_to_frame(rows, offsets)
+                    rows = []
+
+            if rows:
+                yield _excel_rows_to_frame(rows, offsets)
+
+        chunks = normalize_enedis_chunks(iter_chunks())
+    finally:
+        workbook.close()
+
+    if progress is not None:
+        progress(1.0)
+
+    if not chunks:
+        return pd.DataFrame(columns=list(positions))
+
+    return pd.concat(chunks, ignore_index=True)
+
+
+def read_enedis_file(
+    file_bytes: bytes,
+    filename: str,
+    progress=None,
+) -> pd.DataFrame:
+    lower_name = filename.lower()
+
+    if lower_name.endswith(".csv"):
+        df = read_enedis_csv(file_bytes)
+    elif lower_name.endswith(".xlsx"):
+        df = read_enedis_excel(file_bytes, progress=progress)
+    else:
+        # Ancien format .xls : non pris en charge par openpyxl.
+        df = pd.read_excel(BytesIO(file_bytes))
+
+        required = {"Horodate", "Valeur"}
+        missing = required - set(df.columns)
+
+        if missing:
+            raise ValueError(
+                "Colonne(s) manquante(s) : " + ", ".join(sorted(missing))
+            )
+
+        df = normalize_enedis_frame(
+            df,
+            detect_horodate_format(df["Horodate"]),
+        )
+
+    # L'instant UTC, quand il est connu, ordonne sans ambiguïté les deux
+    # occurrences de l'heure répétée d'octobre.
+    sort_column = "Horodate_UTC" if "Horodate_UTC" in df.columns else "Horodate"
+    df = df.sort_values(sort_column).reset_index(drop=True)
 
     if df.empty:
         raise ValueError("Aucune donnée exploitable n'a été trouvée.")
@@ -1445,6 +1830,32 @@ def parse_pas_hours(value, default_step: pd.Timedelta) -> float:
     return default_step.total_seconds() / 3600
 
 
+def parse_pas_hours_column(
+    values: pd.Series,
+    default_step: pd.Timedelta,
+) -> pd.Series:
+    """Version vectorisée de parse_pas_hours pour une colonne complète.
+
+    Une colonne Pas ne contient qu'une poignée de valeurs distinctes : chacune
+    est convertie une seule fois, puis diffusée aux lignes par indexation.
+    """
+    codes, uniques = pd.factorize(values)
+    hours_by_code = np.array(
+        [parse_pas_hours(value, default_step) for value in uniques],
+        dtype=float,
+    )
+
+    # Code -1 : valeur manquante, remplacée par le pas détecté.
+    hours = np.full(
+        len(codes),
+        default_step.total_seconds() / 3600,
+        dtype=float,
+    )
+    known = codes >= 0
+    hours[known] = hours_by_code[codes[known]]
+    return pd.Series(hours, index=values.index)
+
+
 def enrich_energy_data(
     df: pd.DataFrame,
     time_step: pd.Timedelta,
@@ -1455,9 +1866,7 @@ def enrich_energy_data(
     # Le fichier peut contenir plusieurs pas de temps (ex. PT60M puis PT30M).
     # On calcule donc la durée ligne par ligne quand la colonne Pas est présente.
     if "Pas" in result.columns:
-        result["Duree_h"] = result["Pas"].apply(
-            lambda value: parse_pas_hours(value, time_step)
-        )
+        result["Duree_h"] = parse_pas_hours_column(result["Pas"], time_step)
     else:
         result["Duree_h"] = time_step.total_seconds() / 3600
 
@@ -1494,248 +1903,777 @@ def enrich_energy_data(
     return result, message
 
 
-def add_consumption_period_columns(df: pd.DataFrame) -> pd.DataFrame:
-    """Ajoute le début et le milieu de chaque intervalle de consommation.
+# ============================================================
+# IMPORT MULTI-FICHIERS
+# ============================================================
 
-    Convention Enedis : ``Horodate`` correspond à la FIN de l'intervalle.
-    Exemple en pas de 30 min : la valeur horodatée 00:00 couvre 23:30 -> 00:00.
-    Pour les regroupements calendaires (jour/mois/année), l'intervalle est donc
-    rattaché à sa date/heure de début.
-    """
-    result = df.copy()
-    if "Duree_h" not in result.columns:
-        result["Duree_h"] = 1.0
+ENEDIS_FILE_SUFFIXES = (".csv", ".xlsx", ".xls")
+SLICE_READ_WORKERS = 4
 
-    durations = pd.to_numeric(result["Duree_h"], errors="coerce").fillna(1.0)
-    result["Horodate_debut"] = (
-        result["Horodate"] - pd.to_timedelta(durations, unit="h")
-    )
-    result["Horodate_milieu"] = (
-        result["Horodate"] - pd.to_timedelta(durations / 2, unit="h")
-    )
-    return result
 
+def expand_enedis_uploads(
+    uploads: list[tuple[str, bytes]],
+) -> list[tuple[str, bytes]]:
+    """Remplace chaque archive ZIP par les fichiers Enedis qu'elle contient."""
+    slices = []
 
-def filter_period(
-    df: pd.DataFrame,
-    period_mode: str,
-    selected_year: int | None,
-    start_date,
-    end_date,
-) -> pd.DataFrame:
-    result = add_consumption_period_columns(df)
-    reference = result["Horodate_debut"]
+    for filename, file_bytes in uploads:
+        if not filename.lower().endswith(".zip"):
+            slices.append((filename, file_bytes))
+            continue
 
-    if period_mode == "Année" and selected_year is not None:
-        result = result[reference.dt.year == selected_year]
+        with zipfile.ZipFile(BytesIO(file_bytes)) as archive:
+            members = sorted(
+                member
+                for member in archive.namelist()
+                if member.lower().endswith(ENEDIS_FILE_SUFFIXES)
+                and not member.startswith("__MACOSX/")
+                and not Path(member).name.startswith(".")
+            )
 
-    elif period_mode == "Période personnalisée":
-        start_timestamp = pd.Timestamp(start_date)
-        end_exclusive = pd.Timestamp(end_date) + pd.Timedelta(days=1)
-        result = result[
-            (reference >= start_timestamp)
-            & (reference < end_exclusive)
-        ]
+            if not members:
+                raise ValueError(
+                    f"L'archive {filename} ne contient aucun fichier "
+                    "Enedis (CSV ou Excel)."
+                )
 
-    return result.copy()
+            slices.extend(
+                (f"{filename}/{member}", archive.read(member))
+                for member in members
+            )
 
+    return slices
 
-def build_autocalsol_export(
-    df: pd.DataFrame,
-    export_year: int,
-) -> tuple[pd.DataFrame, int]:
-    """Construit un fichier horaire complet conforme à l'import AutoCal-Sol.
 
-    La date est celle du début de la période de consommation et l'heure est
-    l'heure de fin de la mesure. Les heures totalement absentes sont complétées
-    à 0 W. Le calendrier reste volontairement naïf (24 h par jour), sans
-    traitement particulier des changements d'heure été/hiver.
-    """
-    hourly_all = build_hourly_data(df)
-    hourly_all = hourly_all.copy()
-    hourly_all["Debut_mesure"] = hourly_all["Horodate_debut"]
+def read_enedis_slices(
+    slices: list[tuple[str, bytes]],
+) -> list[pd.DataFrame]:
+    """Lit plusieurs tranches en parallèle, dans l'ordre fourni."""
 
-    year_start = pd.Timestamp(year=export_year, month=1, day=1, hour=0)
-    next_year = pd.Timestamp(year=export_year + 1, month=1, day=1, hour=0)
-    full_hours = pd.date_range(
-        start=year_start,
-        end=next_year - pd.Timedelta(hours=1),
-        freq="h",
-    )
+    def read_slice(item: tuple[str, bytes]) -> pd.DataFrame:
+        filename, file_bytes = item
+        try:
+            return read_enedis_file(file_bytes, filename)
+        except Exception as exc:
+            raise ValueError(f"{filename} : {exc}") from exc
 
-    base = pd.DataFrame({"Debut_mesure": full_hours})
-    source = hourly_all[["Debut_mesure", "Puissance_kW"]].copy()
-    merged = base.merge(source, on="Debut_mesure", how="left")
+    workers = max(1, min(len(slices), SLICE_READ_WORKERS, os.cpu_count() or 1))
 
-    missing_hours = int(merged["Puissance_kW"].isna().sum())
-    merged["Puissance_kW"] = merged["Puissance_kW"].fillna(0.0)
-    merged["Fin_mesure"] = merged["Debut_mesure"] + pd.Timedelta(hours=1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(read_slice, slices))
 
-    result = pd.DataFrame(
-        {
-            "Date de la mesure": merged["Fin_mesure"].dt.date,
-            "Heure de fin de la mesure": merged["Fin_mesure"].dt.time,
-            "Puissance moyenne (W)": (
-                merged["Puissance_kW"] * 1000.0
-            ).round(3),
-        }
-    )
-    return result, missing_hours
 
+def merge_enedis_slices(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """Assemble des tranches Enedis (annuelles, mensuelles...) sur Horodate.
 
-def make_autocalsol_excel(export_df: pd.DataFrame) -> bytes:
-    """Génère un XLSX à trois colonnes, sans feuille ni métadonnée supplémentaire."""
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        export_df.to_excel(writer, sheet_name="Courbe de charge", index=False)
-        ws = writer.book["Courbe de charge"]
-        ws.column_dimensions["A"].width = 20
-        ws.column_dimensions["B"].width = 25
-        ws.column_dimensions["C"].width = 24
-        for cell in ws["A"][1:]:
-            cell.number_format = "dd/mm/yyyy"
-        for cell in ws["B"][1:]:
-            cell.number_format = "hh:mm"
-    return output.getvalue()
+    Règle de recouvrement déterministe : les tranches au pas le plus fin sont
+    prioritaires, puis l'ordre d'import. Une ligne d'une tranche moins
+    prioritaire n'est conservée que si son intervalle ne chevauche aucun des
+    intervalles déjà retenus : une tranche annuelle au pas horaire complète
+    donc les mois absents de tranches plus fines. Les changements de pas
+    (PT60M puis PT30M) sont conservés via la colonne Pas.
+    """
+    units = {
+        detect_source_unit(frame)
+        for frame in frames
+    }
+    if len(units) > 1:
+        raise ValueError(
+            "Les fichiers importés n'utilisent pas la même unité : "
+            + ", ".join(sorted(units))
+        )
 
+    keep_utc = all("Horodate_UTC" in frame.columns for frame in frames)
+    steps = [detect_time_step(frame) for frame in frames]
+    order = sorted(range(len(frames)), key=lambda index: (steps[index], index))
 
-def build_hourly_data(df: pd.DataFrame) -> pd.DataFrame:
-    """Agrège les pas Enedis en heures civiles, en respectant les DST.
+    # Intervalles retenus, triés par début ; ``covered_until`` est la fin la
+    # plus tardive parmi les intervalles qui précèdent chaque position.
+    kept_starts = np.array([], dtype="datetime64[ns]")
+    kept_ends = np.array([], dtype="datetime64[ns]")
+    kept = []
 
-    L'horodatage Enedis marque la FIN de l'intervalle. L'agrégation est faite
-    sur une chronologie réelle (UTC) puis reprojetée en heure locale
-    Europe/Paris. Cela évite de créer artificiellement le créneau 02h-03h
-    lors du passage à l'heure d'été. Au retour à l'heure d'hiver, les deux
-    occurrences réelles de l'heure répétée sont regroupées dans la même case
-    locale pour conserver une grille visuelle de 24 colonnes.
-    """
-    hourly = add_consumption_period_columns(df)
-    hourly = hourly.copy()
+    for index in order:
+        frame = frames[index].copy()
+        step = steps[index]
 
-    # Localiser les horodatages naïfs Enedis dans le fuseau français.
-    # ambiguous="infer" distingue les deux occurrences de 02:xx en octobre.
-    local_index = pd.DatetimeIndex(pd.to_datetime(hourly["Horodate"]))
-    try:
-        local_aware = local_index.tz_localize(
-            "Europe/Paris",
-            ambiguous="infer",
-            nonexistent="raise",
-        )
-    except Exception:
-        # Repli prudent pour les fichiers atypiques : le traitement normal
-        # reste inchangé hors heure ambiguë.
-        local_aware = local_index.tz_localize(
-            "Europe/Paris",
-            ambiguous=True,
-            nonexistent="shift_forward",
-        )
+        if not keep_utc:
+            frame = frame.drop(columns=["Horodate_UTC"], errors="ignore")
 
-    # Travailler en UTC garantit des heures de durée réelle égale à 60 min,
-    # y compris pendant les deux changements d'heure annuels.
-    hourly["_Heure_fin_utc"] = local_aware.tz_convert("UTC").ceil("h")
-    hourly["Puissance_ponderee"] = (
-        hourly["Puissance_kW"] * hourly["Duree_h"]
-    )
+        # Une tranche sans colonne Pas garde son propre pas de temps une fois
+        # fusionnée avec des tranches au pas différent.
+        if "Pas" not in frame.columns:
+            frame["Pas"] = f"PT{int(step.total_seconds() // 60)}M"
 
-    grouped = (
-        hourly.groupby("_Heure_fin_utc", as_index=False)
-        .agg(
-            Energie_kWh=("Energie_kWh", "sum"),
-            Puissance_ponderee=("Puissance_ponderee", "sum"),
-            Duree_totale_h=("Duree_h", "sum"),
-            Nombre_points=("Valeur", "size"),
+        durations = pd.to_timedelta(
+            parse_pas_hours_column(frame["Pas"], step),
+            unit="h",
         )
-        .sort_values("_Heure_fin_utc")
-        .reset_index(drop=True)
-    )
+        interval_end = frame["Horodate"].to_numpy(dtype="datetime64[ns]")
+        interval_start = interval_end - durations.to_numpy()
 
-    # Revenir en heure locale après l'agrégation réelle. Soustraire une heure
-    # sur un timestamp tz-aware respecte le saut 01:59 -> 03:00 au printemps.
-    end_local_aware = pd.DatetimeIndex(grouped["_Heure_fin_utc"]).tz_convert(
-        "Europe/Paris"
-    )
-    start_local_aware = end_local_aware - pd.Timedelta(hours=1)
-    grouped["_Debut_local"] = start_local_aware.tz_localize(None)
+        # Un intervalle [début, fin) chevauche un intervalle retenu si l'un de
+        # ceux qui commencent avant sa fin se termine après son début.
+        preceding = np.searchsorted(kept_starts, interval_end, side="left")
+        overlap = np.zeros(len(frame), dtype=bool)
 
-    # En octobre, deux heures réelles peuvent partager le même libellé local
-    # de début (02h). On les regroupe pour la grille 24 h, en conservant toute
-    # l'énergie et une puissance moyenne pondérée par la durée réelle.
-    grouped = (
-        grouped.groupby("_Debut_local", as_index=False)
-        .agg(
-            Energie_kWh=("Energie_kWh", "sum"),
-            Puissance_ponderee=("Puissance_ponderee", "sum"),
-            Duree_totale_h=("Duree_totale_h", "sum"),
-            Nombre_points=("Nombre_points", "sum"),
-        )
-        .sort_values("_Debut_local")
-        .reset_index(drop=True)
-    )
+        if len(kept_starts):
+            covered_until = np.maximum.accumulate(kept_ends)
+            overlap = (preceding > 0) & (
+                covered_until[np.maximum(preceding - 1, 0)] > interval_start
+            )
 
-    grouped["Puissance_kW"] = np.where(
-        grouped["Duree_totale_h"] > 0,
-        grouped["Puissance_ponderee"] / grouped["Duree_totale_h"],
-        np.nan,
-    )
-    grouped["Horodate_debut"] = grouped["_Debut_local"]
-    grouped["Horodate"] = grouped["Horodate_debut"] + pd.Timedelta(hours=1)
-    grouped["Horodate_milieu"] = (
-        grouped["Horodate_debut"] + pd.Timedelta(minutes=30)
-    )
+        frame = frame.loc[~overlap]
 
-    return grouped[
-        [
-            "Horodate",
-            "Horodate_debut",
-            "Horodate_milieu",
-            "Energie_kWh",
-            "Puissance_kW",
-            "Nombre_points",
-        ]
-    ]
+        if not frame.empty:
+            kept.append(frame)
+            kept_starts = np.concatenate(
+                [kept_starts, interval_start[~overlap]]
+            )
+            kept_ends = np.concatenate([kept_ends, interval_end[~overlap]])
+            by_start = np.argsort(kept_starts, kind="stable")
+            kept_starts = kept_starts[by_start]
+            kept_ends = kept_ends[by_start]
 
+    merged = pd.concat(kept, ignore_index=True)
+    sort_column = "Horodate_UTC" if keep_utc else "Horodate"
 
-def build_daily_data(df: pd.DataFrame) -> pd.DataFrame:
-    daily = add_consumption_period_columns(df)
-    daily["Date"] = daily["Horodate_debut"].dt.normalize()
+    # Tri stable : les deux occurrences naïves de l'heure d'octobre gardent
+    # leur ordre d'origine.
+    return merged.sort_values(sort_column, kind="stable").reset_index(drop=True)
 
-    daily = (
-        daily.groupby("Date", as_index=False)
+
+# ============================================================
+# CACHE DISQUE DES IMPORTS
+# ============================================================
+
+UPLOAD_CACHE_DIR = Path(os.environ.get("CMA_CACHE_DIR", ".cache")) / "uploads"
+UPLOAD_CACHE_MAX_BYTES = 512 * 1024 * 1024
+UPLOAD_CACHE_VERSION = 7
+UPLOAD_MEMORY_ENTRIES = 4
+
+
+def upload_content_hash(file_digests: list[tuple[str, bytes]]) -> str:
+    """Clé de cache : contenu et extension des fichiers, version du format.
+
+    ``file_digests`` associe à chaque nom de fichier le SHA-256 de son
+    contenu (voir uploaded_files_key).
+    """
+    digest = hashlib.sha256()
+    digest.update(f"v{UPLOAD_CACHE_VERSION}".encode())
+
+    for filename, file_digest in file_digests:
+        digest.update(f":{Path(filename).suffix.lower()}:".encode())
+        digest.update(file_digest)
+
+    return digest.hexdigest()
+
+
+def uploaded_files_key(uploaded_files: list) -> str:
+    """Clé de contenu des fichiers déposés, sans les relire à chaque rerun.
+
+    Streamlit attribue un ``file_id`` distinct à chaque dépôt : l'empreinte
+    d'un fichier est calculée à son arrivée puis conservée dans la session
+    tant qu'il reste dans le widget.
+    """
+    known = st.session_state.get("upload_digests", {})
+    digests = {}
+
+    for uploaded in uploaded_files:
+        key = (uploaded.file_id, uploaded.size)
+        digests[key] = known.get(key) or hashlib.sha256(
+            uploaded.getvalue()
+        ).digest()
+
+    st.session_state["upload_digests"] = digests
+
+    return upload_content_hash(
+        [
+            (uploaded.name, digests[(uploaded.file_id, uploaded.size)])
+            for uploaded in uploaded_files
+        ]
+    )
+
+
+def _upload_cache_paths(content_hash: str) -> tuple[Path, Path]:
+    return (
+        UPLOAD_CACHE_DIR / f"{content_hash}.feather",
+        UPLOAD_CACHE_DIR / f"{content_hash}.json",
+    )
+
+
+def prune_upload_cache(max_bytes: int = UPLOAD_CACHE_MAX_BYTES) -> None:
+    """Supprime les imports les moins récemment utilisés au-delà du budget."""
+    entries = {}
+
+    for path in UPLOAD_CACHE_DIR.glob("*"):
+        if path.suffix not in {".feather", ".json"}:
+            continue
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        last_used, size, paths = entries.get(path.stem, (0.0, 0, []))
+        entries[path.stem] = (
+            max(last_used, stat.st_mtime),
+            size + stat.st_size,
+            paths + [path],
+        )
+
+    total = sum(size for _, size, _ in entries.values())
+
+    for last_used, size, paths in sorted(entries.values(), key=lambda e: e[0]):
+        if total <= max_bytes:
+            break
+        for path in paths:
+            path.unlink(missing_ok=True)
+        total -= size
+
+
+def read_upload_cache(
+    content_hash: str,
+) -> tuple[pd.DataFrame, pd.Timedelta, str, str] | None:
+    data_path, meta_path = _upload_cache_paths(content_hash)
+
+    try:
+        metadata = json.loads(meta_path.read_text(encoding="utf-8"))
+        cached = (
+            pd.read_feather(data_path),
+            pd.Timedelta(seconds=metadata["time_step_seconds"]),
+            metadata["source_unit"],
+            metadata["interpretation"],
+        )
+        now = time.time()
+        # La date de modification sert d'horodatage LRU.
+        os.utime(data_path, (now, now))
+        os.utime(meta_path, (now, now))
+    except (OSError, ValueError, ImportError, KeyError, TypeError):
+        # Entrée illisible ou incomplète : simple absence du cache.
+        return None
+
+    return cached
+
+
+def write_upload_cache(
+    content_hash: str,
+    df: pd.DataFrame,
+    time_step: pd.Timedelta,
+    source_unit: str,
+    interpretation: str,
+) -> None:
+    """Enregistre le tableau normalisé ; le cache reste facultatif."""
+    data_path, meta_path = _upload_cache_paths(content_hash)
+    temporary_path = data_path.with_suffix(f".{os.getpid()}.tmp")
+
+    try:
+        UPLOAD_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        df.reset_index(drop=True).to_feather(temporary_path)
+        os.replace(temporary_path, data_path)
+        # Les métadonnées sont écrites en dernier : leur présence garantit
+        # que le fichier de données est complet.
+        meta_path.write_text(
+            json.dumps(
+                {
+                    "time_step_seconds": time_step.total_seconds(),
+                    "source_unit": source_unit,
+                    "interpretation": interpretation,
+                }
+            ),
+            encoding="utf-8",
+        )
+        prune_upload_cache()
+    except (OSError, ValueError, ImportError):
+        temporary_path.unlink(missing_ok=True)
+
+
+@st.cache_data(max_entries=UPLOAD_MEMORY_ENTRIES, show_spinner=False)
+def load_enedis_upload(
+    content_hash: str,
+    _uploaded_files: list,
+) -> tuple[pd.DataFrame, pd.Timedelta, str, str]:
+    """Lit, normalise et enrichit un import, avec cache disque persistant.
+
+    Le contenu est identifié par ``content_hash`` (uploaded_files_key) :
+    Streamlit ne hache pas les fichiers, et leur contenu n'est lu qu'en
+    l'absence de cache. Un même import rouvert dans une session ultérieure
+    est relu depuis le disque sans analyse. Plusieurs fichiers ou archives
+    ZIP sont lus en parallèle puis fusionnés.
+    """
+    cached = read_upload_cache(content_hash)
+
+    if cached is not None:
+        return cached
+
+    slices = expand_enedis_uploads(
+        [(uploaded.name, uploaded.getvalue()) for uploaded in _uploaded_files]
+    )
+
+    if len(slices) == 1:
+        # Élément créé dans la fonction : il est rejoué sans erreur depuis le
+        # cache Streamlit, puis effacé en fin de lecture.
+        progress_placeholder = st.empty()
+
+        def report_progress(fraction: float) -> None:
+            progress_placeholder.progress(
+                fraction,
+                text=f"Lecture du classeur Excel… {fraction:.0%}",
+            )
+
+        filename, file_bytes = slices[0]
+        source_df = read_enedis_file(
+            file_bytes,
+            filename,
+            progress=report_progress,
+        )
+        progress_placeholder.empty()
+    else:
+        source_df = merge_enedis_slices(read_enedis_slices(slices))
+
+    time_step = detect_time_step(source_df)
+    source_unit = detect_source_unit(source_df)
+    enriched_df, interpretation = enrich_energy_data(
+        source_df,
+        time_step,
+        source_unit,
+    )
+    enriched_df = build_interval_table(enriched_df)
+
+    write_upload_cache(
+        content_hash,
+        enriched_df,
+        time_step,
+        source_unit,
+        interpretation,
+    )
+    return enriched_df, time_step, source_unit, interpretation
+
+
+INTERVAL_COLUMNS = [
+    "Horodate_debut",
+    "Horodate_milieu",
+    "Horodate_UTC",
+    "Date_conso",
+    "Mois_conso",
+    "Annee_conso",
+    "Heure_conso",
+]
+
+
+def build_interval_table(df: pd.DataFrame) -> pd.DataFrame:
+    """Construit la table canonique des intervalles, une fois par import.
+
+    Convention Enedis : ``Horodate`` correspond à la FIN de l'intervalle.
+    Exemple en pas de 30 min : la valeur horodatée 00:00 couvre 23:30 -> 00:00.
+    Pour les regroupements calendaires (jour/mois/année), l'intervalle est donc
+    rattaché à sa date/heure de début.
+
+    Colonnes ajoutées : début, milieu, instant réel de fin en UTC et clés
+    calendaires locales du début. Tous les constructeurs en aval les lisent
+    directement au lieu de les recalculer sur une copie du tableau.
+
+    La table est triée par ``Date_conso`` (tri stable : l'ordre réel est
+    conservé dans chaque journée), ce qui permet à filter_period de découper
+    les périodes par recherche dichotomique.
+    """
+    result = df.copy()
+    if "Duree_h" not in result.columns:
+        result["Duree_h"] = 1.0
+
+    # Arrondi à la seconde : 1/6 h converti directement donne 10 min + 1 ns,
+    # ce qui rattachait le relevé de 00:10 à la veille.
+    seconds = (
+        pd.to_numeric(result["Duree_h"], errors="coerce").fillna(1.0) * 3600
+    )
+    result["Horodate_debut"] = (
+        result["Horodate"] - pd.to_timedelta(seconds.round(), unit="s")
+    )
+    result["Horodate_milieu"] = (
+        result["Horodate"] - pd.to_timedelta((seconds / 2).round(), unit="s")
+    )
+
+    if "Horodate_UTC" not in result.columns:
+        # Sans décalage dans le fichier, l'instant réel est reconstruit une
+        # seule fois ; ambiguous="infer" distingue les deux 02:xx d'octobre.
+        result["Horodate_UTC"] = localize_paris(
+            result["Horodate"]
+        ).tz_convert("UTC")
+
+    start = result["Horodate_debut"].dt
+    result["Date_conso"] = start.normalize()
+    result["Mois_conso"] = start.to_period("M").dt.to_timestamp()
+    result["Annee_conso"] = start.year
+    result["Heure_conso"] = start.hour
+
+    if not result["Date_conso"].is_monotonic_increasing:
+        result = result.sort_values("Date_conso", kind="stable")
+    return result
+
+
+def add_consumption_period_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Garantit la présence de la table des intervalles, sans copie si acquise."""
+    if set(INTERVAL_COLUMNS).issubset(df.columns):
+        return df
+    return build_interval_table(df)
+
+
+def filter_period(
+    df: pd.DataFrame,
+    period_mode: str,
+    selected_year: int | None,
+    start_date,
+    end_date,
+) -> pd.DataFrame:
+    # Les constructeurs en aval ne modifient jamais le tableau reçu : la
+    # période est donc une tranche contiguë de la table, sans copie.
+    result = add_consumption_period_columns(df)
+
+    if period_mode == "Année" and selected_year is not None:
+        return slice_consumption_dates(
+            result,
+            pd.Timestamp(year=int(selected_year), month=1, day=1),
+            pd.Timestamp(year=int(selected_year) + 1, month=1, day=1),
+        )
+
+    if period_mode == "Période personnalisée":
+        start_timestamp = pd.Timestamp(start_date)
+        end_exclusive = pd.Timestamp(end_date) + pd.Timedelta(days=1)
+        return slice_consumption_dates(result, start_timestamp, end_exclusive)
+
+    return result
+
+
+def slice_consumption_dates(
+    df: pd.DataFrame,
+    start: pd.Timestamp,
+    end_exclusive: pd.Timestamp,
+) -> pd.DataFrame:
+    """Tranche [start, end_exclusive[ d'une table triée par ``Date_conso``.
+
+    Deux recherches dichotomiques remplacent les masques booléens sur tout
+    l'historique ; ``iloc`` renvoie une vue et non une copie.
+    """
+    dates = df["Date_conso"].to_numpy()
+    first, last = np.searchsorted(
+        dates,
+        [start.to_datetime64(), end_exclusive.to_datetime64()],
+        side="left",
+    )
+    return df.iloc[first:last]
+
+
+def build_autocalsol_export(
+    df: pd.DataFrame,
+    export_year: int,
+) -> tuple[pd.DataFrame, int]:
+    """Construit un fichier horaire complet conforme à l'import AutoCal-Sol.
+
+    La date est celle du début de la période de consommation et l'heure est
+    l'heure de fin de la mesure. Les heures totalement absentes sont complétées
+    à 0 W. Le calendrier reste volontairement naïf (24 h par jour), sans
+    traitement particulier des changements d'heure été/hiver.
+    """
+    hourly_all = build_hourly_data(df)
+    hourly_all = hourly_all.copy()
+    hourly_all["Debut_mesure"] = hourly_all["Horodate_debut"]
+
+    year_start = pd.Timestamp(year=export_year, month=1, day=1, hour=0)
+    next_year = pd.Timestamp(year=export_year + 1, month=1, day=1, hour=0)
+    full_hours = pd.date_range(
+        start=year_start,
+        end=next_year - pd.Timedelta(hours=1),
+        freq="h",
+    )
+
+    base = pd.DataFrame({"Debut_mesure": full_hours})
+    source = hourly_all[["Debut_mesure", "Puissance_kW"]].copy()
+    merged = base.merge(source, on="Debut_mesure", how="left")
+
+    missing_hours = int(merged["Puissance_kW"].isna().sum())
+    merged["Puissance_kW"] = merged["Puissance_kW"].fillna(0.0)
+    merged["Fin_mesure"] = merged["Debut_mesure"] + pd.Timedelta(hours=1)
+
+    result = pd.DataFrame(
+        {
+            "Date de la mesure": merged["Fin_mesure"].dt.date,
+            "Heure de fin de la mesure": merged["Fin_mesure"].dt.time,
+            "Puissance moyenne (W)": (
+                merged["Puissance_kW"] * 1000.0
+            ).round(3),
+        }
+    )
+    return result, missing_hours
+
+
+def excel_column_widths(
+    frame: pd.DataFrame,
+    headers: list,
+    minimum: float,
+    maximum: float,
+) -> list[float]:
+    """Largeur de chaque colonne d'après sa plus longue valeur affichée.
+
+    Utilisée par tous les exports openpyxl. Les longueurs sont calculées sur
+    le DataFrame avant l'écriture (``.str.len()`` par colonne, en-tête
+    compris) : la feuille n'est jamais relue cellule par cellule.
+    ``headers`` donne l'en-tête de chaque colonne de ``frame``, dans l'ordre.
+    """
+    widths = []
+
+    for position, header in enumerate(headers):
+        values = frame.iloc[:, position].dropna()
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = values.astype(object)
+        longest = max(
+            len(str(header)) if header is not None else 0,
+            int(values.astype(str).str.len().max()) if len(values) else 0,
+        )
+        widths.append(min(max(longest + 2, minimum), maximum))
+
+    return widths
+
+
+def make_autocalsol_excel(export_df: pd.DataFrame) -> bytes:
+    """Génère un XLSX à trois colonnes, sans feuille ni métadonnée supplémentaire."""
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+        export_df.to_excel(writer, sheet_name="Courbe de charge", index=False)
+        ws = writer.book["Courbe de charge"]
+        widths = excel_column_widths(
+            export_df,
+            list(export_df.columns),
+            minimum=20,
+            maximum=35,
+        )
+        for position, width in enumerate(widths, start=1):
+            ws.column_dimensions[get_column_letter(position)].width = width
+        for cell in ws["A"][1:]:
+            cell.number_format = "dd/mm/yyyy"
+        for cell in ws["B"][1:]:
+            cell.number_format = "hh:mm"
+    return output.getvalue()
+
+
+HOURLY_COLUMNS = [
+    "Horodate",
+    "Horodate_debut",
+    "Horodate_milieu",
+    "Energie_kWh",
+    "Puissance_kW",
+    "Nombre_points",
+]
+
+# Accumulateurs additifs portés par le cube horaire : les cumuls journaliers
+# et mensuels s'en déduisent sans relire les relevés bruts.
+CUBE_SUM_COLUMNS = [
+    "Energie_kWh",
+    "Puissance_ponderee",
+    "Duree_totale_h",
+    "Puissance_somme_kW",
+    "Nombre_puissances",
+    "Nombre_points",
+]
+
+
+HOUR_NS = 3_600 * 1_000_000_000
+
+
+def _bucket_sums(
+    bucket_ids: np.ndarray,
+    columns: dict[str, np.ndarray],
+    size: int,
+) -> dict[str, np.ndarray]:
+    """Somme chaque colonne par seau entier (valeurs manquantes ignorées)."""
+    return {
+        name: np.bincount(
+            bucket_ids,
+            weights=np.where(np.isnan(values), 0.0, values),
+            minlength=size,
+        )
+        for name, values in columns.items()
+    }
+
+
+def _bucket_max(bucket_ids: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    """Maximum par seau ; NaN si le seau ne contient aucune valeur."""
+    result = np.full(size, np.nan)
+    # fmax ignore les NaN, comme le max de pandas.
+    np.fmax.at(result, bucket_ids, values)
+    return result
+
+
+def build_hourly_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """Agrège les pas Enedis en heures civiles, en respectant les DST.
+
+    L'horodatage Enedis marque la FIN de l'intervalle. L'agrégation est faite
+    sur une chronologie réelle (UTC) puis reprojetée en heure locale
+    Europe/Paris. Cela évite de créer artificiellement le créneau 02h-03h
+    lors du passage à l'heure d'été. Au retour à l'heure d'hiver, les deux
+    occurrences réelles de l'heure répétée sont regroupées dans la même case
+    locale pour conserver une grille visuelle de 24 colonnes.
+
+    Outre les colonnes horaires publiques, le cube conserve les accumulateurs
+    (sommes, effectifs, maximum des relevés) nécessaires aux agrégats jour et
+    mois : moyenne et maximum y restent ceux des relevés bruts.
+
+    Le regroupement se fait sur des seaux entiers (heures depuis l'epoch)
+    avec ``np.bincount``, sans groupby pandas sur des horodatages tz-aware.
+    """
+    data = add_consumption_period_columns(df)
+
+    # L'instant réel (UTC) vient de la table des intervalles. Travailler en
+    # UTC garantit des heures de durée réelle égale à 60 min, y compris
+    # pendant les deux changements d'heure annuels.
+    end_ns = pd.DatetimeIndex(data["Horodate_UTC"]).asi8
+    valid = end_ns != pd.NaT.value
+    end_ns = end_ns[valid]
+
+    power = data["Puissance_kW"].to_numpy(dtype=float)[valid]
+    duration = data["Duree_h"].to_numpy(dtype=float)[valid]
+    point_columns = {
+        "Energie_kWh": data["Energie_kWh"].to_numpy(dtype=float)[valid],
+        "Puissance_ponderee": power * duration,
+        "Duree_totale_h": duration,
+        "Puissance_somme_kW": power,
+        "Nombre_puissances": (~np.isnan(power)).astype(float),
+        "Nombre_points": np.ones(len(power)),
+    }
+
+    # Seau = heure UTC de fin, arrondie à l'heure supérieure.
+    hour_end = -(-end_ns // HOUR_NS)
+    first_hour = int(hour_end.min()) if len(hour_end) else 0
+    hour_ids = hour_end - first_hour
+    size = int(hour_ids.max()) + 1 if len(hour_ids) else 0
+
+    sums = _bucket_sums(hour_ids, point_columns, size)
+    maxima = _bucket_max(hour_ids, power, size)
+    occupied = np.flatnonzero(sums["Nombre_points"] > 0)
+
+    # Revenir en heure locale après l'agrégation réelle. Soustraire une heure
+    # sur un timestamp tz-aware respecte le saut 01:59 -> 03:00 au printemps.
+    end_local_aware = pd.DatetimeIndex(
+        (occupied + first_hour) * HOUR_NS,
+        tz="UTC",
+    ).tz_convert("Europe/Paris")
+    start_local = (end_local_aware - pd.Timedelta(hours=1)).tz_localize(None)
+
+    # En octobre, deux heures réelles peuvent partager le même libellé local
+    # de début (02h). On les regroupe pour la grille 24 h, en conservant toute
+    # l'énergie et une puissance moyenne pondérée par la durée réelle.
+    local_starts, local_ids = np.unique(start_local.asi8, return_inverse=True)
+    grouped_sums = _bucket_sums(
+        local_ids,
+        {name: values[occupied] for name, values in sums.items()},
+        len(local_starts),
+    )
+
+    grouped = pd.DataFrame(
+        {
+            **{
+                name: grouped_sums[name]
+                for name in CUBE_SUM_COLUMNS
+            },
+            "Puissance_max_kW": _bucket_max(
+                local_ids,
+                maxima[occupied],
+                len(local_starts),
+            ),
+        }
+    )
+    for name in ["Nombre_puissances", "Nombre_points"]:
+        grouped[name] = grouped[name].astype("int64")
+
+    grouped["Puissance_kW"] = np.where(
+        grouped["Duree_totale_h"] > 0,
+        grouped["Puissance_ponderee"] / grouped["Duree_totale_h"],
+        np.nan,
+    )
+    grouped["Horodate_debut"] = local_starts.astype("datetime64[ns]")
+    grouped["Horodate"] = grouped["Horodate_debut"] + pd.Timedelta(hours=1)
+    grouped["Horodate_milieu"] = (
+        grouped["Horodate_debut"] + pd.Timedelta(minutes=30)
+    )
+    return grouped
+
+
+def _rollup_cube(cube: pd.DataFrame, key: pd.Series) -> pd.DataFrame:
+    """Regroupe les accumulateurs du cube selon une clé calendaire."""
+    rolled = (
+        cube.groupby(key.to_numpy())
         .agg(
-            Consommation_kWh=("Energie_kWh", "sum"),
-            Puissance_moyenne_kW=("Puissance_kW", "mean"),
-            Puissance_max_kW=("Puissance_kW", "max"),
-            Nombre_points=("Valeur", "size"),
+            **{column: (column, "sum") for column in CUBE_SUM_COLUMNS},
+            Puissance_max_kW=("Puissance_max_kW", "max"),
         )
-        .sort_values("Date")
-        .reset_index(drop=True)
+        .rename_axis("_Cle")
+        .reset_index()
+    )
+    # Moyenne simple des relevés bruts, comme un groupby direct sur ceux-ci.
+    rolled["Puissance_moyenne_kW"] = (
+        rolled["Puissance_somme_kW"]
+        / rolled["Nombre_puissances"].where(rolled["Nombre_puissances"] > 0)
     )
+    return rolled
 
+
+def build_consumption_cube(df: pd.DataFrame) -> dict:
+    """Calcule en une passe les agrégats horaire, journalier et mensuel.
+
+    Les relevés ne sont groupés qu'une fois, à l'heure ; jours et mois sont
+    ensuite déduits du cube horaire.
+    """
+    cube = build_hourly_cube(df)
+    return {"hourly": cube[HOURLY_COLUMNS], **rollup_hourly_cube(cube)}
+
+
+def rollup_hourly_cube(cube: pd.DataFrame) -> dict:
+    """Agrégats journalier et mensuel déduits du cube horaire.
+
+    Les pas Enedis divisant l'heure, chaque relevé appartient à une seule
+    heure civile, dont la date de début est celle de l'intervalle.
+    """
+    daily_rollup = _rollup_cube(cube, cube["Horodate_debut"].dt.normalize())
+    daily = pd.DataFrame(
+        {
+            "Date": daily_rollup["_Cle"],
+            "Consommation_kWh": daily_rollup["Energie_kWh"],
+            "Puissance_moyenne_kW": daily_rollup["Puissance_moyenne_kW"],
+            "Puissance_max_kW": daily_rollup["Puissance_max_kW"],
+            "Nombre_points": daily_rollup["Nombre_points"],
+        }
+    )
     daily["Jour_num"] = daily["Date"].dt.weekday
     daily["Jour"] = daily["Jour_num"].map(WEEKDAYS)
     daily["Année"] = daily["Date"].dt.year
     daily["Mois_num"] = daily["Date"].dt.month
     daily["Mois"] = daily["Mois_num"].map(MONTHS)
-    return daily
 
-
-def build_monthly_data(df: pd.DataFrame) -> pd.DataFrame:
-    monthly = add_consumption_period_columns(df)
-    monthly["Mois_date"] = (
-        monthly["Horodate_debut"].dt.to_period("M").dt.to_timestamp()
+    # Le mois se déduit des cumuls journaliers, déjà réduits à ~365 lignes/an.
+    monthly_rollup = _rollup_cube(
+        daily_rollup.drop(columns=["_Cle"]),
+        daily_rollup["_Cle"].dt.to_period("M").dt.to_timestamp(),
     )
-
-    return (
-        monthly.groupby("Mois_date", as_index=False)
-        .agg(
-            Consommation_kWh=("Energie_kWh", "sum"),
-            Puissance_moyenne_kW=("Puissance_kW", "mean"),
-            Puissance_max_kW=("Puissance_kW", "max"),
-        )
-        .sort_values("Mois_date")
-        .reset_index(drop=True)
+    monthly = pd.DataFrame(
+        {
+            "Mois_date": monthly_rollup["_Cle"],
+            "Consommation_kWh": monthly_rollup["Energie_kWh"],
+            "Puissance_moyenne_kW": monthly_rollup["Puissance_moyenne_kW"],
+            "Puissance_max_kW": monthly_rollup["Puissance_max_kW"],
+        }
     )
 
+    return {"daily": daily, "monthly": monthly}
+
+
+def build_hourly_data(df: pd.DataFrame) -> pd.DataFrame:
+    return build_hourly_cube(df)[HOURLY_COLUMNS]
+
+
+def build_daily_data(df: pd.DataFrame) -> pd.DataFrame:
+    return build_consumption_cube(df)["daily"]
+
+
+def build_monthly_data(df: pd.DataFrame) -> pd.DataFrame:
+    return build_consumption_cube(df)["monthly"]
+
 
 def build_weekday_hour_matrix(hourly: pd.DataFrame) -> pd.DataFrame:
     data = hourly.copy()
@@ -1794,7 +2732,6 @@ def build_quality_report(df: pd.DataFrame, time_step: pd.Timedelta):
     normal = int(round(pd.Timedelta(days=1) / time_step))
     one_hour = int(round(pd.Timedelta(hours=1) / time_step))
 
-    data["Date_conso"] = data["Horodate_debut"].dt.normalize()
     actual = data.groupby("Date_conso").size()
 
     if actual.empty:
@@ -1868,6 +2805,158 @@ def build_quality_report(df: pd.DataFrame, time_step: pd.Timedelta):
     }
     return report, metrics
 
+
+# ============================================================
+# ÉCHELLE DE COULEURS DES TABLEAUX
+# ============================================================
+# Une seule échelle vert-jaune-rouge sert au tableau Streamlit, au PNG, au
+# classeur Excel, au tableau du PDF et aux heatmaps Plotly. Les valeurs sont
+# réparties en HEAT_LEVELS niveaux sur l'étendue de la matrice : une même
+# valeur a exactement la même couleur dans tous les livrables. Les cellules
+# vides restent sur fond blanc, sauf dans le PNG (HEAT_MISSING_COLOR).
+
+HEAT_COLOR_STOPS = (
+    (0.00, (99, 190, 123)),
+    (0.30, (169, 210, 109)),
+    (0.50, (255, 235, 132)),
+    (0.72, (246, 178, 107)),
+    (1.00, (248, 105, 107)),
+)
+HEAT_MISSING_COLOR = (242, 245, 247)
+HEAT_LEVELS = 20
+HEAT_COLORSCALE = [
+    [position, "#%02X%02X%02X" % rgb]
+    for position, rgb in HEAT_COLOR_STOPS
+]
+
+
+def _heat_palette(levels: int) -> np.ndarray:
+    """Couleur RGB du centre de chaque niveau, interpolée entre les paliers."""
+    positions = [position for position, _ in HEAT_COLOR_STOPS]
+    centers = (np.arange(levels) + 0.5) / levels
+    return np.column_stack(
+        [
+            np.interp(
+                centers,
+                positions,
+                [rgb[channel] for _, rgb in HEAT_COLOR_STOPS],
+            )
+            for channel in range(3)
+        ]
+    ).round().astype(np.uint8)
+
+
+# Dernière ligne : couleur des cellules vides (niveau -1).
+HEAT_PALETTE = np.vstack(
+    [_heat_palette(HEAT_LEVELS), np.array([HEAT_MISSING_COLOR], dtype=np.uint8)]
+)
+HEAT_HEX = np.array(["#%02X%02X%02X" % tuple(rgb) for rgb in HEAT_PALETTE.tolist()])
+
+
+def heat_value_range(values: np.ndarray) -> tuple[float, float] | None:
+    finite = values[np.isfinite(values)]
+    if not finite.size:
+        return None
+    return float(finite.min()), float(finite.max())
+
+
+def heat_levels(values) -> np.ndarray:
+    """Niveau de couleur de chaque valeur (0 à HEAT_LEVELS - 1, -1 si vide).
+
+    L'échelle est calculée sur l'ensemble de la matrice, comme un
+    dégradé appliqué à tout le tableau.
+    """
+    values = np.asarray(values, dtype=float)
+    levels = np.full(values.shape, -1, dtype=np.int64)
+    value_range = heat_value_range(values)
+
+    if value_range is None:
+        return levels
+
+    vmin, vmax = value_range
+    finite = np.isfinite(values)
+
+    if vmax <= vmin:
+        levels[finite] = HEAT_LEVELS // 2
+    else:
+        ratios = (values[finite] - vmin) / (vmax - vmin)
+        levels[finite] = np.minimum(
+            (ratios * HEAT_LEVELS).astype(np.int64),
+            HEAT_LEVELS - 1,
+        )
+
+    return levels
+
+
+def heat_style_runs(levels: np.ndarray) -> list[tuple[int, int, int, int]]:
+    """Regroupe, ligne par ligne, les cellules voisines de même niveau.
+
+    Renvoie des tuples (ligne, première colonne, dernière colonne, niveau) :
+    une commande de style par plage au lieu d'une par cellule.
+    """
+    if not levels.size:
+        return []
+
+    row_count, column_count = levels.shape
+    run_starts = np.ones(levels.shape, dtype=bool)
+    run_starts[:, 1:] = levels[:, 1:] != levels[:, :-1]
+    rows, first_columns = np.nonzero(run_starts)
+
+    flat_starts = rows * column_count + first_columns
+    last_columns = (
+        np.append(flat_starts[1:], row_count * column_count) - 1
+    ) % column_count
+
+    return list(
+        zip(
+            rows.tolist(),
+            first_columns.tolist(),
+            last_columns.tolist(),
+            levels[rows, first_columns].tolist(),
+        )
+    )
+
+
+def heat_background_css(block: pd.DataFrame) -> pd.DataFrame:
+    """Styles de fond pour Styler.apply(axis=None).
+
+    Les cellules vides gardent le fond du tableau.
+    """
+    levels = heat_levels(block.to_numpy(dtype=float))
+    css = np.where(
+        levels >= 0,
+        np.char.add("background-color: ", HEAT_HEX[levels]),
+        "",
+    )
+    return pd.DataFrame(css, index=block.index, columns=block.columns)
+
+
+def heat_excel_rules(cell_range: str) -> list[tuple[str, str]]:
+    """Règles de mise en forme conditionnelle Excel, une par niveau.
+
+    Chaque règle calcule, comme heat_levels, le niveau de la première
+    cellule de ``cell_range`` à partir du minimum et du maximum de toute la
+    plage : la règle reste vivante, et modifier une valeur dans Excel
+    recolore le tableau. Les cellules vides ne sont pas colorées.
+    """
+    first_cell = cell_range.split(":")[0]
+    absolute_range = absolute_coordinate(cell_range)
+    low = f"MIN({absolute_range})"
+    high = f"MAX({absolute_range})"
+    level = (
+        f"IF({high}={low},{HEAT_LEVELS // 2},"
+        f"MIN({HEAT_LEVELS - 1},"
+        f"INT(({first_cell}-{low})/({high}-{low})*{HEAT_LEVELS})))"
+    )
+    return [
+        (
+            f"AND(ISNUMBER({first_cell}),{level}={index})",
+            HEAT_HEX[index][1:],
+        )
+        for index in range(HEAT_LEVELS)
+    ]
+
+
 def make_colored_style(matrix: pd.DataFrame):
     numeric_columns = list(matrix.select_dtypes(include=[np.number]).columns)
     styler = (
@@ -1895,8 +2984,8 @@ def make_colored_style(matrix: pd.DataFrame):
     )
     if numeric_columns:
         styler = styler.format({col: "{:.1f}" for col in numeric_columns})
-        styler = styler.background_gradient(
-            cmap="RdYlGn_r",
+        styler = styler.apply(
+            heat_background_css,
             axis=None,
             subset=numeric_columns,
         )
@@ -1934,50 +3023,85 @@ def make_colored_excel_bytes(
         if numeric_cols and len(export_df) > 0:
             start_col = min(numeric_cols)
             end_col = max(numeric_cols)
-            from openpyxl.utils import get_column_letter
             rng = (
                 f"{get_column_letter(start_col)}2:"
                 f"{get_column_letter(end_col)}{len(export_df) + 1}"
             )
-            ws.conditional_formatting.add(
-                rng,
-                ColorScaleRule(
-                    start_type="min", start_color="63BE7B",
-                    mid_type="percentile", mid_value=50, mid_color="FFEB84",
-                    end_type="max", end_color="F8696B",
-                ),
-            )
+            for formula, color in heat_excel_rules(rng):
+                ws.conditional_formatting.add(
+                    rng,
+                    FormulaRule(
+                        formula=[formula],
+                        fill=PatternFill("solid", fgColor=color, bgColor=color),
+                        stopIfTrue=True,
+                    ),
+                )
 
         ws.freeze_panes = "B2"
-        for column_cells in ws.columns:
-            max_len = max(
-                len(str(c.value)) if c.value is not None else 0
-                for c in column_cells
-            )
-            ws.column_dimensions[column_cells[0].column_letter].width = min(max(max_len + 2, 11), 22)
+        widths = excel_column_widths(
+            export_df.reset_index(),
+            [index_label] + list(export_df.columns),
+            minimum=11,
+            maximum=22,
+        )
+        for position, width in enumerate(widths, start=1):
+            ws.column_dimensions[get_column_letter(position)].width = width
 
     return output.getvalue()
 
 
-def _heat_color(value: float, vmin: float, vmax: float) -> tuple[int, int, int]:
-    if pd.isna(value):
-        return (242, 245, 247)
-    if vmax <= vmin:
-        ratio = 0.5
-    else:
-        ratio = max(0.0, min(1.0, (float(value) - vmin) / (vmax - vmin)))
-    stops = [
-        (0.00, (99, 190, 123)),
-        (0.30, (169, 210, 109)),
-        (0.50, (255, 235, 132)),
-        (0.72, (246, 178, 107)),
-        (1.00, (248, 105, 107)),
-    ]
-    for (p0, c0), (p1, c1) in zip(stops, stops[1:]):
-        if ratio <= p1:
-            t = (ratio - p0) / (p1 - p0) if p1 > p0 else 0
-            return tuple(round(c0[i] + t * (c1[i] - c0[i])) for i in range(3))
-    return stops[-1][1]
+PNG_ROW_HEIGHT = 28
+PNG_MAX_BODY_HEIGHT = 12000
+PNG_TEXT_MIN_ROW_HEIGHT = 14
+PNG_INDEX_FILL = (232, 237, 243)
+PNG_TEXT_FILL = (247, 249, 251)
+
+
+def _text_stamp(text: str, font, width: int, row_h: int) -> tuple:
+    """Pixels du texte dans une cellule : décalages ligne, colonne et opacité."""
+    canvas = PILImage.new("L", (width, row_h), 0)
+    ImageDraw.Draw(canvas).text(
+        (4, min(9, row_h - 11)),
+        text,
+        fill=255,
+        font=font,
+    )
+    coverage = np.asarray(canvas)[:, : width - 1]
+    dy, dx = np.nonzero(coverage)
+    return dy, dx, coverage[dy, dx].astype(np.uint16)
+
+
+def _blit_texts(
+    pixels: np.ndarray,
+    texts: np.ndarray,
+    tops: np.ndarray,
+    lefts: np.ndarray,
+    width: int,
+    row_h: int,
+    font,
+    color: tuple[int, int, int],
+) -> None:
+    """Écrit des textes dans l'image, un tampon par texte distinct.
+
+    Chaque texte n'est rasterisé qu'une fois ; ses pixels sont ensuite posés
+    sur toutes les cellules concernées par indexation NumPy.
+    """
+    ink = np.array(color, dtype=np.uint16)
+    uniques, inverse = np.unique(texts, return_inverse=True)
+    for position, text in enumerate(uniques):
+        if not text:
+            continue
+        dy, dx, alpha = _text_stamp(text, font, width, row_h)
+        cells = np.flatnonzero(inverse == position)
+        rows = tops[cells, None] + dy[None, :]
+        columns = lefts[cells, None] + dx[None, :]
+        visible = rows < pixels.shape[0]
+        rows = rows[visible]
+        columns = columns[visible]
+        alpha = np.broadcast_to(alpha, visible.shape)[visible][:, None]
+        pixels[rows, columns] = (
+            pixels[rows, columns] * (255 - alpha) + ink * alpha
+        ) // 255
 
 
 def make_colored_png_bytes(
@@ -1985,56 +3109,99 @@ def make_colored_png_bytes(
     title: str,
     index_label: str,
 ) -> bytes:
-    """Crée une image PNG du tableau coloré sans dépendance Kaleido."""
+    """Crée une image PNG du tableau coloré sans dépendance Kaleido.
+
+    Le fond des cellules est calculé d'un bloc (une couleur par cellule,
+    agrandie à la taille de la grille). Pour les très longues matrices, la
+    hauteur des lignes est réduite sans descendre sous la hauteur lisible :
+    toutes les valeurs et toutes les dates restent écrites.
+    """
     df = table.copy()
     numeric_cols = list(df.select_dtypes(include=[np.number]).columns)
-    vals = df[numeric_cols].to_numpy(dtype=float) if numeric_cols else np.array([])
-    finite = vals[np.isfinite(vals)] if vals.size else np.array([])
-    vmin = float(finite.min()) if finite.size else 0.0
-    vmax = float(finite.max()) if finite.size else 1.0
+    is_numeric = np.array([col in numeric_cols for col in df.columns], dtype=bool)
+    row_count = len(df)
 
     font = ImageFont.load_default()
-    row_h = 28
+    row_h = max(
+        PNG_TEXT_MIN_ROW_HEIGHT,
+        min(PNG_ROW_HEIGHT, PNG_MAX_BODY_HEIGHT // max(row_count, 1)),
+    )
+    header_h = PNG_ROW_HEIGHT
     title_h = 44
     index_w = 105
     text_col_w = 85
     numeric_w = 62
-    widths = [index_w] + [numeric_w if c in numeric_cols else text_col_w for c in df.columns]
-    width = sum(widths)
-    height = title_h + row_h * (len(df) + 1)
-    image = PILImage.new("RGB", (width, height), "white")
+    widths = np.array(
+        [index_w] + [numeric_w if numeric else text_col_w for numeric in is_numeric]
+    )
+    lefts = np.concatenate([[0], np.cumsum(widths)[:-1]])
+    width = int(widths.sum())
+    body_top = title_h + header_h
+    height = body_top + row_h * row_count
+
+    # Couleur de chaque cellule, index compris, puis agrandissement en une fois.
+    cell_colors = np.empty((row_count, len(widths), 3), dtype=np.uint8)
+    cell_colors[:, 0] = PNG_INDEX_FILL
+    cell_colors[:, 1:][:, ~is_numeric] = PNG_TEXT_FILL
+    if numeric_cols:
+        cell_colors[:, 1:][:, is_numeric] = HEAT_PALETTE[
+            heat_levels(df[numeric_cols].to_numpy(dtype=float))
+        ]
+
+    pixels = np.full((height, width, 3), 255, dtype=np.uint8)
+    body = np.repeat(np.repeat(cell_colors, row_h, axis=0), widths, axis=1)
+    pixels[body_top : body_top + row_h * row_count] = body
+    pixels[body_top : height : row_h] = 255
+    pixels[body_top:, lefts] = 255
+
+    text_color = tuple(int(CMA_TEXT[i : i + 2], 16) for i in (1, 3, 5))
+    row_tops = body_top + row_h * np.arange(row_count)
+
+    for position, col in enumerate(df.columns, start=1):
+        values = df[col]
+        if is_numeric[position - 1]:
+            texts = np.where(
+                values.isna(),
+                "",
+                values.map("{:.1f}".format, na_action="ignore").astype(str),
+            )
+        else:
+            texts = values.fillna("").astype(str).to_numpy()
+        _blit_texts(
+            pixels,
+            np.asarray(texts, dtype=str),
+            row_tops,
+            np.full(row_count, lefts[position]),
+            int(widths[position]),
+            row_h,
+            font,
+            text_color,
+        )
+
+    # Libellés de lignes (dates, semaines...).
+    _blit_texts(
+        pixels,
+        df.index.astype(str).to_numpy(),
+        row_tops,
+        np.zeros(row_count, dtype=int),
+        index_w,
+        row_h,
+        font,
+        text_color,
+    )
+
+    image = PILImage.fromarray(pixels)
     draw = ImageDraw.Draw(image)
     draw.rectangle([0, 0, width, title_h], fill=CMA_BLUE)
     draw.text((10, 14), title, fill="white", font=font)
 
     headers = [index_label] + [str(c) for c in df.columns]
-    x = 0
-    for w, header in zip(widths, headers):
-        draw.rectangle([x, title_h, x + w, title_h + row_h], fill=CMA_BLUE, outline="white")
+    for x, w, header in zip(lefts.tolist(), widths.tolist(), headers):
+        draw.rectangle([x, title_h, x + w, title_h + header_h], fill=CMA_BLUE, outline="white")
         draw.text((x + 4, title_h + 9), header, fill="white", font=font)
-        x += w
-
-    for r, (idx, row) in enumerate(df.iterrows(), start=1):
-        y = title_h + row_h * r
-        x = 0
-        draw.rectangle([x, y, x + widths[0], y + row_h], fill=(232, 237, 243), outline="white")
-        draw.text((x + 4, y + 9), str(idx), fill=CMA_TEXT, font=font)
-        x += widths[0]
-        for c_idx, col in enumerate(df.columns):
-            value = row[col]
-            w = widths[c_idx + 1]
-            if col in numeric_cols:
-                fill = _heat_color(value, vmin, vmax)
-                text = "" if pd.isna(value) else f"{float(value):.1f}"
-            else:
-                fill = (247, 249, 251)
-                text = "" if pd.isna(value) else str(value)
-            draw.rectangle([x, y, x + w, y + row_h], fill=fill, outline="white")
-            draw.text((x + 4, y + 9), text, fill=CMA_TEXT, font=font)
-            x += w
 
     output = BytesIO()
-    image.save(output, format="PNG", optimize=True)
+    image.save(output, format="PNG", compress_level=1)
     return output.getvalue()
 
 
@@ -2272,15 +3439,13 @@ def add_astronomical_solar_data(
         tz="Europe/Paris",
     )
 
-    if "Duree_h" not in result.columns:
-        result["Duree_h"] = 1.0
-
-    result["Horodate_milieu"] = (
-        result["Horodate"]
-        - pd.to_timedelta(result["Duree_h"] / 2, unit="h")
-    )
+    result = add_consumption_period_columns(result)
 
-    local_midpoints = localize_paris(result["Horodate_milieu"])
+    # Milieu réel de l'intervalle, dérivé de l'instant UTC de la table.
+    local_midpoints = pd.DatetimeIndex(
+        result["Horodate_UTC"]
+        - (result["Horodate"] - result["Horodate_milieu"])
+    ).tz_convert("Europe/Paris")
     solar_position = location.get_solarposition(local_midpoints)
 
     result["Hauteur_soleil_deg"] = pd.to_numeric(
@@ -2359,31 +3524,183 @@ def add_astronomical_solar_data(
     return result
 
 
-@st.cache_data(ttl=86400, show_spinner=False)
-def fetch_pvgis_reference_profile(
+# ============================================================
+# CACHE DISQUE PVGIS
+# ============================================================
+
+PVGIS_CACHE_PATH = (
+    Path(os.environ.get("CMA_CACHE_DIR", ".cache")) / "pvgis.sqlite"
+)
+PVGIS_CACHE_MAX_BYTES = 256 * 1024 * 1024
+PVGIS_CACHE_TTL_DAYS = float(os.environ.get("CMA_PVGIS_TTL_DAYS", "180"))
+# Maille d'environ 1 km, plus fine que la résolution des données
+# d'irradiation PVGIS : les adresses voisines partagent une même série.
+PVGIS_GRID_DEGREES = 0.01
+
+# Un serveur de substitution (pvgis_standin.py) peut remplacer l'API publique.
+PVGIS_API_URL = os.environ.get(
+    "CMA_PVGIS_URL",
+    "https://re.jrc.ec.europa.eu/api/v5_3/seriescalc",
+)
+
+# La puissance PVGIS (P) est proportionnelle à la puissance crête demandée :
+# le profil est récupéré une seule fois pour 1 kWc puis mis à l'échelle.
+PVGIS_REFERENCE_KWP = 1.0
+
+
+def pvgis_grid_cell(latitude: float, longitude: float) -> tuple[float, float]:
+    """Centre de la maille PVGIS contenant le point."""
+    return (
+        round(round(latitude / PVGIS_GRID_DEGREES) * PVGIS_GRID_DEGREES, 4),
+        round(round(longitude / PVGIS_GRID_DEGREES) * PVGIS_GRID_DEGREES, 4),
+    )
+
+
+def pvgis_cache_key(
+    latitude: float,
+    longitude: float,
+    tilt: float,
+    aspect: float,
+    losses_percent: float,
+) -> str:
+    return (
+        f"{PVGIS_API_URL}|{latitude:.4f}:{longitude:.4f}:{tilt:g}:"
+        f"{aspect:g}:{losses_percent:g}:{PVGIS_REFERENCE_KWP:g}"
+    )
+
+
+def _pvgis_cache_connection() -> sqlite3.Connection:
+    PVGIS_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(PVGIS_CACHE_PATH, timeout=30)
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS pvgis_series ("
+        "key TEXT PRIMARY KEY, fetched_at REAL NOT NULL, "
+        "last_used REAL NOT NULL, metadata TEXT NOT NULL, "
+        "series BLOB NOT NULL)"
+    )
+    return connection
+
+
+def read_pvgis_cache(key: str) -> tuple[pd.DataFrame, dict] | None:
+    """Série horaire PVGIS enregistrée, si elle existe et n'a pas expiré."""
+    now = time.time()
+
+    try:
+        connection = _pvgis_cache_connection()
+        try:
+            with connection:
+                row = connection.execute(
+                    "SELECT metadata, series FROM pvgis_series "
+                    "WHERE key = ? AND fetched_at >= ?",
+                    (key, now - PVGIS_CACHE_TTL_DAYS * 86400),
+                ).fetchone()
+                if row is None:
+                    return None
+                # La date de dernière lecture sert à l'éviction LRU.
+                connection.execute(
+                    "UPDATE pvgis_series SET last_used = ? WHERE key = ?",
+                    (now, key),
+                )
+        finally:
+            connection.close()
+
+        with np.load(BytesIO(row[1])) as arrays:
+            series = pd.DataFrame(
+                {
+                    "Datetime_UTC": pd.to_datetime(
+                        arrays["Datetime_UTC"],
+                        unit="s",
+                        utc=True,
+                    ),
+                    "Production_PV_kW": arrays["Production_PV_kW"],
+                    "Irradiation_Wm2": arrays["Irradiation_Wm2"],
+                }
+            )
+        metadata = json.loads(row[0])
+    except (sqlite3.Error, OSError, ValueError, KeyError):
+        return None
+
+    return series, metadata
+
+
+def prune_pvgis_cache(
+    connection: sqlite3.Connection,
+    now: float,
+    max_bytes: int = PVGIS_CACHE_MAX_BYTES,
+) -> None:
+    """Supprime les séries expirées puis les moins récemment utilisées."""
+    connection.execute(
+        "DELETE FROM pvgis_series WHERE fetched_at < ?",
+        (now - PVGIS_CACHE_TTL_DAYS * 86400,),
+    )
+    entries = connection.execute(
+        "SELECT key, length(series) FROM pvgis_series "
+        "ORDER BY last_used DESC"
+    ).fetchall()
+
+    total = 0
+    stale_keys = []
+
+    for key, size in entries:
+        total += size
+        if total > max_bytes:
+            stale_keys.append((key,))
+
+    connection.executemany(
+        "DELETE FROM pvgis_series WHERE key = ?",
+        stale_keys,
+    )
+
+
+def write_pvgis_cache(key: str, series: pd.DataFrame, metadata: dict) -> None:
+    """Enregistre une série PVGIS ; le cache reste facultatif."""
+    buffer = BytesIO()
+    np.savez_compressed(
+        buffer,
+        Datetime_UTC=(
+            series["Datetime_UTC"].astype("int64").to_numpy() // 10**9
+        ),
+        Production_PV_kW=series["Production_PV_kW"].to_numpy(dtype=float),
+        Irradiation_Wm2=series["Irradiation_Wm2"].to_numpy(dtype=float),
+    )
+    now = time.time()
+
+    try:
+        connection = _pvgis_cache_connection()
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO pvgis_series "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, now, now, json.dumps(metadata), buffer.getvalue()),
+                )
+                prune_pvgis_cache(connection, now)
+        finally:
+            connection.close()
+    except (sqlite3.Error, OSError, ValueError, TypeError):
+        pass
+
+
+def download_pvgis_series(
     latitude: float,
     longitude: float,
     tilt: float,
     aspect: float,
-    peak_power_kwp: float,
     losses_percent: float,
 ) -> tuple[pd.DataFrame, dict]:
     """
-    Récupère un profil horaire PVGIS récent (2020-2023), puis calcule un
-    profil de référence moyen par mois, jour et heure.
+    Récupère la série horaire PVGIS 2020-2023 pour PVGIS_REFERENCE_KWP.
 
     PVGIS exprime aspect ainsi :
     0 = sud, -90 = est, 90 = ouest.
     """
-    url = "https://re.jrc.ec.europa.eu/api/v5_3/seriescalc"
-
     params = {
         "lat": latitude,
         "lon": longitude,
         "startyear": 2020,
         "endyear": 2023,
         "pvcalculation": 1,
-        "peakpower": peak_power_kwp,
+        "peakpower": PVGIS_REFERENCE_KWP,
         "loss": losses_percent,
         "pvtechchoice": "crystSi",
         "mountingplace": "free",
@@ -2395,7 +3712,7 @@ def fetch_pvgis_reference_profile(
     }
 
     response = requests.get(
-        url,
+        PVGIS_API_URL,
         params=params,
         timeout=120,
     )
@@ -2417,12 +3734,6 @@ def fetch_pvgis_reference_profile(
     )
     pvgis = pvgis.dropna(subset=["Datetime_UTC"]).copy()
 
-    pvgis["Datetime_local"] = (
-        pvgis["Datetime_UTC"]
-        .dt.tz_convert("Europe/Paris")
-        .dt.tz_localize(None)
-    )
-
     if "G(i)" in pvgis.columns:
         pvgis["Irradiation_Wm2"] = pd.to_numeric(
             pvgis["G(i)"],
@@ -2448,86 +3759,266 @@ def fetch_pvgis_reference_profile(
         pd.to_numeric(pvgis.get("P"), errors="coerce") / 1000
     )
 
-    pvgis["Mois"] = pvgis["Datetime_local"].dt.month
-    pvgis["Jour_mois"] = pvgis["Datetime_local"].dt.day
-    pvgis["Heure"] = pvgis["Datetime_local"].dt.hour
+    metadata = payload.get("inputs", {})
+    metadata["source_period"] = "2020-2023"
+    metadata["provider"] = "pvgis"
+
+    series = pvgis[
+        ["Datetime_UTC", "Production_PV_kW", "Irradiation_Wm2"]
+    ].reset_index(drop=True)
+
+    return series, metadata
+
+
+CLEARSKY_YEAR = 2020
+CLEARSKY_AIR_TEMPERATURE = 15.0
+CLEARSKY_ALBEDO = 0.2
+CLEARSKY_GAMMA_PDC = -0.004
+
+
+def synthesize_clearsky_series(
+    latitude: float,
+    longitude: float,
+    tilt: float,
+    aspect: float,
+    losses_percent: float,
+) -> tuple[pd.DataFrame, dict]:
+    """
+    Série horaire par ciel clair calculée localement avec pvlib.
+
+    Déterministe et sans réseau, elle reprend le format de
+    download_pvgis_series. Faute de nébulosité, la production obtenue est un
+    majorant : elle sert au travail hors connexion et aux essais.
+    """
+    # Année bissextile : chaque jour du calendrier reçoit une valeur.
+    # Milieu d'heure, comme les horodatages PVGIS.
+    times = pd.date_range(
+        f"{CLEARSKY_YEAR}-01-01 00:30",
+        f"{CLEARSKY_YEAR}-12-31 23:30",
+        freq="h",
+        tz="UTC",
+    )
+    location = Location(latitude, longitude, tz="UTC")
+    solar_position = location.get_solarposition(times)
+    clearsky = location.get_clearsky(
+        times,
+        model="ineichen",
+        solar_position=solar_position,
+    )
+
+    # PVGIS : 0 = sud, -90 = est ; pvlib : 180 = sud, 90 = est.
+    irradiance = get_total_irradiance(
+        surface_tilt=tilt,
+        surface_azimuth=180 + aspect,
+        solar_zenith=solar_position["apparent_zenith"],
+        solar_azimuth=solar_position["azimuth"],
+        dni=clearsky["dni"],
+        ghi=clearsky["ghi"],
+        dhi=clearsky["dhi"],
+        albedo=CLEARSKY_ALBEDO,
+    )
+    plane_irradiance = irradiance["poa_global"].fillna(0).clip(lower=0)
+
+    cell_temperature = faiman(
+        plane_irradiance,
+        temp_air=CLEARSKY_AIR_TEMPERATURE,
+        wind_speed=1.0,
+    )
+    production_w = pvwatts_dc(
+        plane_irradiance,
+        cell_temperature,
+        pdc0=PVGIS_REFERENCE_KWP * 1000,
+        gamma_pdc=CLEARSKY_GAMMA_PDC,
+    )
+
+    series = pd.DataFrame(
+        {
+            "Datetime_UTC": times,
+            "Production_PV_kW": (
+                np.asarray(production_w) * (1 - losses_percent / 100) / 1000
+            ),
+            "Irradiation_Wm2": plane_irradiance.to_numpy(),
+        }
+    )
+    metadata = {
+        "location": {"latitude": latitude, "longitude": longitude},
+        "source_period": f"ciel clair {CLEARSKY_YEAR} (pvlib)",
+        "provider": "clearsky",
+    }
+
+    return series, metadata
+
 
-    exact_profile = (
-        pvgis.groupby(
-            ["Mois", "Jour_mois", "Heure"],
-            as_index=False,
+# Sources d'irradiation : même signature, même format de série horaire.
+IRRADIANCE_PROVIDERS = {
+    "pvgis": download_pvgis_series,
+    "clearsky": synthesize_clearsky_series,
+}
+IRRADIANCE_PROVIDER_LABELS = {
+    "PVGIS (en ligne)": "pvgis",
+    "Ciel clair pvlib (hors ligne)": "clearsky",
+}
+DEFAULT_IRRADIANCE_PROVIDER = os.environ.get(
+    "CMA_IRRADIANCE_PROVIDER",
+    "pvgis",
+)
+
+if DEFAULT_IRRADIANCE_PROVIDER not in IRRADIANCE_PROVIDERS:
+    DEFAULT_IRRADIANCE_PROVIDER = "pvgis"
+
+
+def fetch_pvgis_reference_profile(
+    latitude: float,
+    longitude: float,
+    tilt: float,
+    aspect: float,
+    losses_percent: float,
+    provider: str = "pvgis",
+) -> tuple[dict[str, np.ndarray], dict]:
+    """
+    Récupère un profil horaire PVGIS récent (2020-2023), puis calcule un
+    profil de référence moyen par mois, jour et heure (voir
+    build_pvgis_lookup).
+
+    Les coordonnées sont ramenées au centre de leur maille PVGIS et la série
+    horaire est conservée dans un cache SQLite persistant : une adresse
+    voisine d'une étude précédente est relue localement, même après un
+    redéploiement.
+
+    La série provient de ``provider`` (voir IRRADIANCE_PROVIDERS) ; seules
+    les séries téléchargées passent par le cache disque. En mémoire, les
+    profils sont conservés par le registre de préchargement PVGIS.
+
+    Le profil est calculé pour PVGIS_REFERENCE_KWP : Production_PV_kW est
+    une production par kWc, à mettre à l'échelle avec scale_pv_production.
+    """
+    if provider not in IRRADIANCE_PROVIDERS:
+        raise ValueError(f"Source d'irradiation inconnue : {provider}.")
+
+    latitude, longitude = pvgis_grid_cell(latitude, longitude)
+    series_source = IRRADIANCE_PROVIDERS[provider]
+
+    if provider != "pvgis":
+        pvgis, metadata = series_source(
+            latitude,
+            longitude,
+            tilt,
+            aspect,
+            losses_percent,
         )
-        .agg(
-            Irradiation_Wm2=("Irradiation_Wm2", "mean"),
-            Production_PV_kW=("Production_PV_kW", "mean"),
+    else:
+        key = pvgis_cache_key(
+            latitude,
+            longitude,
+            tilt,
+            aspect,
+            losses_percent,
         )
+        cached = read_pvgis_cache(key)
+
+        if cached is not None:
+            pvgis, metadata = cached
+        else:
+            pvgis, metadata = series_source(
+                latitude,
+                longitude,
+                tilt,
+                aspect,
+                losses_percent,
+            )
+            write_pvgis_cache(key, pvgis, metadata)
+
+    return build_pvgis_lookup(pvgis), metadata
+
+
+PVGIS_PROFILE_COLUMNS = ("Irradiation_Wm2", "Production_PV_kW")
+PVGIS_LOOKUP_SHAPE = (12, 31, 24)
+
+
+def pvgis_calendar_slots(timestamps: pd.Series) -> np.ndarray:
+    """Position (mois, jour, heure) de chaque horodate dans le profil dense."""
+    return np.ravel_multi_index(
+        (
+            timestamps.dt.month.to_numpy() - 1,
+            timestamps.dt.day.to_numpy() - 1,
+            timestamps.dt.hour.to_numpy(),
+        ),
+        PVGIS_LOOKUP_SHAPE,
     )
 
-    metadata = payload.get("inputs", {})
-    metadata["source_period"] = "2020-2023"
 
-    return exact_profile, metadata
+def build_pvgis_lookup(pvgis: pd.DataFrame) -> dict[str, np.ndarray]:
+    """Profil moyen dense (mois, jour, heure) de chaque grandeur PVGIS.
+
+    Les cases sans valeur (29 février hors année bissextile, rares trous,
+    jours inexistants) reçoivent la moyenne mois/heure des jours connus.
+    """
+    datetime_local = (
+        pvgis["Datetime_UTC"]
+        .dt.tz_convert("Europe/Paris")
+        .dt.tz_localize(None)
+    )
+    slots = pvgis_calendar_slots(datetime_local)
+    size = int(np.prod(PVGIS_LOOKUP_SHAPE))
+    lookup = {}
+
+    for column in PVGIS_PROFILE_COLUMNS:
+        values = pvgis[column].to_numpy(dtype=float)
+        known = ~np.isnan(values)
+        totals = np.bincount(
+            slots[known],
+            weights=values[known],
+            minlength=size,
+        )
+        counts = np.bincount(slots[known], minlength=size)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            profile = (totals / counts).reshape(PVGIS_LOOKUP_SHAPE)
+            # Moyenne mois/heure des jours renseignés.
+            filled_days = ~np.isnan(profile)
+            fallback = (
+                np.where(filled_days, profile, 0).sum(axis=1, keepdims=True)
+                / filled_days.sum(axis=1, keepdims=True)
+            )
+
+        lookup[column] = np.where(np.isnan(profile), fallback, profile)
+
+    return lookup
 
 
 def merge_pvgis_profile(
     df: pd.DataFrame,
-    pvgis_profile: pd.DataFrame,
+    pvgis_lookup: dict[str, np.ndarray],
 ) -> pd.DataFrame:
-    result = df.copy()
-    result["Mois_solaire"] = result["Horodate"].dt.month
-    result["Jour_mois_solaire"] = result["Horodate"].dt.day
-    result["Heure_solaire"] = result["Horodate"].dt.hour
+    """Profil PVGIS de référence rapproché de chaque relevé.
+
+    Une seule lecture indexée par (mois, jour, heure) de ``Horodate`` : ni
+    jointure ni copie intermédiaire, quel que soit le pas des relevés.
+    """
+    slots = pvgis_calendar_slots(df["Horodate"])
 
-    exact = pvgis_profile.rename(
-        columns={
-            "Mois": "Mois_solaire",
-            "Jour_mois": "Jour_mois_solaire",
-            "Heure": "Heure_solaire",
+    return df.assign(
+        **{
+            column: pvgis_lookup[column].take(slots)
+            for column in PVGIS_PROFILE_COLUMNS
         }
     )
 
-    result = result.merge(
-        exact,
-        on=[
-            "Mois_solaire",
-            "Jour_mois_solaire",
-            "Heure_solaire",
-        ],
-        how="left",
-    )
 
-    # Repli pour le 29 février ou les rares trous : moyenne mois/heure.
-    fallback = (
-        pvgis_profile.groupby(
-            ["Mois", "Heure"],
-            as_index=False,
-        )
-        .agg(
-            Irradiation_fallback=("Irradiation_Wm2", "mean"),
-            Production_fallback=("Production_PV_kW", "mean"),
-        )
-        .rename(
-            columns={
-                "Mois": "Mois_solaire",
-                "Heure": "Heure_solaire",
-            }
-        )
-    )
+def scale_pv_production(
+    df: pd.DataFrame,
+    peak_power_kwp: float,
+) -> pd.DataFrame:
+    """Production et autoconsommation pour la puissance crête étudiée.
 
-    result = result.merge(
-        fallback,
-        on=["Mois_solaire", "Heure_solaire"],
-        how="left",
+    ``df`` porte la production PVGIS de référence (PVGIS_REFERENCE_KWP) ;
+    changer de puissance ne nécessite donc ni appel réseau ni rapprochement.
+    """
+    result = df.copy()
+    result["Production_PV_kW"] = df["Production_PV_kW"] * (
+        peak_power_kwp / PVGIS_REFERENCE_KWP
     )
 
-    result["Irradiation_Wm2"] = result[
-        "Irradiation_Wm2"
-    ].fillna(result["Irradiation_fallback"])
-
-    result["Production_PV_kW"] = result[
-        "Production_PV_kW"
-    ].fillna(result["Production_fallback"])
-
     result["Production_PV_kWh"] = (
         result["Production_PV_kW"] * result["Duree_h"]
     )
@@ -2761,15 +4252,8 @@ def add_tariff_categories(
 
     Le classement utilise le milieu réel de l'intervalle.
     """
-    result = df.copy()
-
-    if "Duree_h" not in result.columns:
-        result["Duree_h"] = 1.0
-
-    result["Horodate_tarif"] = (
-        result["Horodate"]
-        - pd.to_timedelta(result["Duree_h"] / 2, unit="h")
-    )
+    result = add_consumption_period_columns(df).copy()
+    result["Horodate_tarif"] = result["Horodate_milieu"]
 
     hc_ranges_minutes = [
         (time_to_minutes(start), time_to_minutes(end))
@@ -2800,36 +4284,41 @@ def add_tariff_categories(
     month = result["Horodate_tarif"].dt.month
     winter_mask = month.isin([11, 12, 1, 2, 3])
 
-    result["Saison_tarifaire"] = np.where(
-        winter_mask,
-        "Hiver / saison haute",
-        "Été / saison basse",
+    result["Saison_tarifaire"] = _label_column(
+        np.where(winter_mask, 0, 1),
+        ["Hiver / saison haute", "Été / saison basse"],
     )
-    result["Plage_tarifaire"] = np.where(
-        hc_mask,
-        "Heures creuses",
-        "Heures pleines",
+    result["Plage_tarifaire"] = _label_column(
+        np.where(hc_mask, 0, 1),
+        ["Heures creuses", "Heures pleines"],
     )
 
-    result["Categorie_tarifaire"] = np.select(
-        [
-            winter_mask & ~hc_mask,
-            winter_mask & hc_mask,
-            ~winter_mask & ~hc_mask,
-            ~winter_mask & hc_mask,
-        ],
-        [
-            "HP hiver",
-            "HC hiver",
-            "HP été",
-            "HC été",
-        ],
-        default="Non classé",
+    result["Categorie_tarifaire"] = _label_column(
+        np.select(
+            [
+                winter_mask & ~hc_mask,
+                winter_mask & hc_mask,
+                ~winter_mask & ~hc_mask,
+                ~winter_mask & hc_mask,
+            ],
+            [0, 1, 2, 3],
+            default=4,
+        ),
+        ["HP hiver", "HC hiver", "HP été", "HC été", "Non classé"],
     )
 
     return result
 
 
+def _label_column(codes: np.ndarray, labels: list[str]) -> np.ndarray:
+    """Colonne de libellés partageant une seule chaîne par valeur distincte.
+
+    np.where / np.select créent une chaîne Python par ligne : la colonne est
+    alors lourde en mémoire et lente à resérialiser depuis st.cache_data.
+    """
+    return np.array(labels, dtype=object)[codes]
+
+
 def build_tariff_summary(df: pd.DataFrame) -> pd.DataFrame:
     order = ["HP hiver", "HC hiver", "HP été", "HC été"]
 
@@ -3359,132 +4848,731 @@ def irr_from_cashflows(
     def value(rate: float) -> float:
         return npv_from_cashflows(cashflows, rate)
 
-    low_value = value(lower)
-    high_value = value(upper)
+    low_value = value(lower)
+    high_value = value(upper)
+
+    if low_value * high_value > 0:
+        return np.nan
+
+    for _ in range(150):
+        middle = (lower + upper) / 2.0
+        middle_value = value(middle)
+
+        if abs(middle_value) < 1e-8:
+            return middle
+
+        if low_value * middle_value <= 0:
+            upper = middle
+            high_value = middle_value
+        else:
+            lower = middle
+            low_value = middle_value
+
+    return (lower + upper) / 2.0
+
+
+def build_financial_projection(
+    net_investment: float,
+    annual_self_consumption_saving: float,
+    annual_surplus_revenue: float,
+    annual_operating_cost: float,
+    horizon_years: int,
+    electricity_price_increase_percent: float,
+    surplus_price_increase_percent: float,
+    production_degradation_percent: float,
+    operating_cost_increase_percent: float,
+    discount_rate_percent: float,
+) -> dict:
+    rows = []
+    cumulative = -net_investment
+    discounted_cumulative = -net_investment
+    cashflows = [-net_investment]
+    payback_year = np.nan
+
+    for year in range(1, horizon_years + 1):
+        production_factor = (
+            1.0 - production_degradation_percent / 100.0
+        ) ** (year - 1)
+        electricity_factor = (
+            1.0 + electricity_price_increase_percent / 100.0
+        ) ** (year - 1)
+        surplus_factor = (
+            1.0 + surplus_price_increase_percent / 100.0
+        ) ** (year - 1)
+        opex_factor = (
+            1.0 + operating_cost_increase_percent / 100.0
+        ) ** (year - 1)
+
+        self_consumption_saving = (
+            annual_self_consumption_saving
+            * production_factor
+            * electricity_factor
+        )
+        surplus_revenue = (
+            annual_surplus_revenue
+            * production_factor
+            * surplus_factor
+        )
+        operating_cost = (
+            annual_operating_cost * opex_factor
+        )
+        net_cashflow = (
+            self_consumption_saving
+            + surplus_revenue
+            - operating_cost
+        )
+
+        discount_factor = (
+            1.0 + discount_rate_percent / 100.0
+        ) ** year
+        discounted_cashflow = net_cashflow / discount_factor
+
+        previous_cumulative = cumulative
+        cumulative += net_cashflow
+        discounted_cumulative += discounted_cashflow
+        cashflows.append(net_cashflow)
+
+        if (
+            pd.isna(payback_year)
+            and cumulative >= 0
+            and net_cashflow > 0
+        ):
+            fraction = (
+                -previous_cumulative / net_cashflow
+                if previous_cumulative < 0
+                else 0.0
+            )
+            payback_year = year - 1 + fraction
+
+        rows.append(
+            {
+                "Année": year,
+                "Économie autoconsommation (€)": self_consumption_saving,
+                "Revenu surplus (€)": surplus_revenue,
+                "Charges annuelles (€)": operating_cost,
+                "Flux net (€)": net_cashflow,
+                "Flux actualisé (€)": discounted_cashflow,
+                "Cumul net (€)": cumulative,
+                "Cumul actualisé (€)": discounted_cumulative,
+            }
+        )
+
+    discount_rate = discount_rate_percent / 100.0
+    npv = npv_from_cashflows(cashflows, discount_rate)
+    irr = irr_from_cashflows(cashflows)
+
+    return {
+        "table": pd.DataFrame(rows),
+        "cashflows": cashflows,
+        "payback_year": payback_year,
+        "npv": npv,
+        "irr": irr,
+        "total_net_gain": cumulative,
+        "annual_net_gain_year_1": (
+            rows[0]["Flux net (€)"] if rows else 0.0
+        ),
+    }
+
+
+
+# ============================================================
+# PIPELINE DE CALCUL MÉMOÏSÉ
+# ============================================================
+# Chaque étape est mise en cache sur l'empreinte de l'étape amont et sur les
+# seuls paramètres qu'elle utilise. Les tableaux reçus en argument (préfixe
+# « _ ») ne sont pas hachés : l'empreinte amont les identifie déjà. Modifier
+# un curseur de projection ne relance donc aucune étape ci-dessous.
+
+PIPELINE_CACHE_ENTRIES = 8
+
+
+def stage_fingerprint(*parts) -> str:
+    """Empreinte compacte d'une étape : empreinte amont et paramètres."""
+    return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()[:20]
+
+
+@st.cache_data(max_entries=PIPELINE_CACHE_ENTRIES, show_spinner=False)
+def run_hourly_stage(
+    period_key: str,
+    _period_df: pd.DataFrame,
+) -> dict:
+    """Cube horaire de la période et matrices jour/heure qui en découlent."""
+    cube = build_hourly_cube(_period_df)
+    hourly = cube[HOURLY_COLUMNS]
+    return {
+        "cube": cube,
+        "hourly": hourly,
+        "weekday_hour_matrix": build_weekday_hour_matrix(hourly),
+        "date_hour_matrix": build_date_hour_matrix(hourly),
+    }
+
+
+@st.cache_data(max_entries=PIPELINE_CACHE_ENTRIES, show_spinner=False)
+def run_quality_stage(
+    period_key: str,
+    time_step: pd.Timedelta,
+    _period_df: pd.DataFrame,
+) -> tuple[pd.DataFrame, dict]:
+    """Contrôle de complétude de la période."""
+    return build_quality_report(_period_df, time_step)
+
+
+@st.cache_data(max_entries=PIPELINE_CACHE_ENTRIES, show_spinner=False)
+def run_tariff_stage(
+    period_key: str,
+    hc_ranges: list[tuple],
+    _period_df: pd.DataFrame,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Classement tarifaire des relevés et synthèse par catégorie."""
+    tariff_df = add_tariff_categories(_period_df, hc_ranges)
+    return tariff_df, build_tariff_summary(tariff_df)
+
+
+@st.cache_data(max_entries=PIPELINE_CACHE_ENTRIES, show_spinner=False)
+def run_solar_stage(
+    tariff_key: str,
+    latitude: float,
+    longitude: float,
+    _tariff_df: pd.DataFrame,
+) -> pd.DataFrame:
+    """Position du soleil et lever/coucher pour chaque relevé."""
+    return add_astronomical_solar_data(
+        _tariff_df,
+        latitude=latitude,
+        longitude=longitude,
+    )
+
+
+@st.cache_data(max_entries=PIPELINE_CACHE_ENTRIES, show_spinner=False)
+def run_pvgis_merge_stage(
+    solar_key: str,
+    tilt: float,
+    aspect: float,
+    losses_percent: float,
+    provider: str,
+    _solar_df: pd.DataFrame,
+    _pvgis_profile: dict[str, np.ndarray],
+) -> pd.DataFrame:
+    """Production PVGIS de référence (par kWc) rapprochée de chaque relevé.
+
+    Le profil PVGIS est entièrement déterminé par la localisation (portée par
+    ``solar_key``), par l'orientation et les pertes de l'installation et par
+    la source d'irradiation ; la puissance crête n'intervient qu'ensuite,
+    dans scale_pv_production.
+    """
+    return merge_pvgis_profile(_solar_df, _pvgis_profile)
+
+
+@st.cache_data(max_entries=PIPELINE_CACHE_ENTRIES, show_spinner=False)
+def run_energy_value_stage(
+    frame_key: str,
+    price_map: dict,
+    surplus_sale_price: float,
+    annual_subscription: float,
+    analysis_years: float,
+    _df: pd.DataFrame,
+) -> dict:
+    """Valorisation annuelle de l'énergie, sans le détail ligne à ligne."""
+    energy_value = calculate_energy_value(
+        df=_df,
+        price_map=price_map,
+        surplus_sale_price=surplus_sale_price,
+        annual_subscription=annual_subscription,
+        analysis_years=analysis_years,
+    )
+    return {
+        key: value
+        for key, value in energy_value.items()
+        if key != "detail"
+    }
+
+
+# ============================================================
+# GRAPHE DE CALCUL
+# ============================================================
+# La section CALCULS est décrite comme un petit graphe : chaque nœud déclare
+# ses entrées (paramètres issus des widgets ou nœuds amont). À chaque rerun,
+# seuls les nœuds dont une entrée a changé sont recalculés ; les autres
+# reprennent le résultat conservé dans la session, sans resérialisation.
+
+def calculation_node(function, *inputs: str) -> dict:
+    """Déclare un nœud : fonction appelée avec les valeurs de ses entrées."""
+    return {"function": function, "inputs": list(inputs)}
+
+
+def run_calculation_graph(
+    nodes: dict,
+    params: dict,
+    state: dict,
+    param_keys: dict | None = None,
+) -> tuple[dict, dict, list[dict]]:
+    """Évalue les nœuds dans leur ordre de déclaration (ordre topologique).
+
+    ``state`` (st.session_state) conserve l'empreinte et le dernier résultat
+    de chaque nœud. L'empreinte d'un paramètre est celle de sa valeur, sauf
+    pour les gros tableaux dont l'empreinte est fournie par ``param_keys``.
+    Un nœud n'est recalculé que si l'empreinte d'une de ses entrées a changé.
+
+    Un résultat portant une ``error`` (PVGIS injoignable...) n'est pas
+    conservé : le nœud est réévalué au rerun suivant, et son empreinte est
+    marquée pour que les nœuds aval soient recalculés une fois l'erreur
+    levée. Les empreintes sont renvoyées pour indexer les exports préparés à
+    la demande.
+    """
+    param_keys = param_keys or {}
+    fingerprints = {
+        name: param_keys.get(name) or stage_fingerprint(name, value)
+        for name, value in params.items()
+    }
+    values = dict(params)
+    timings = []
+
+    for name, node in nodes.items():
+        fingerprint = stage_fingerprint(
+            name,
+            *[fingerprints[input_name] for input_name in node["inputs"]],
+        )
+        previous = state.get(name)
+
+        if previous is not None and previous["fingerprint"] == fingerprint:
+            values[name] = previous["value"]
+            status = "À jour"
+            elapsed_ms = 0.0
+        else:
+            started = time.perf_counter()
+            values[name] = node["function"](
+                *[values[input_name] for input_name in node["inputs"]]
+            )
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            status = "Recalculé"
+
+            if isinstance(values[name], dict) and values[name].get("error"):
+                state.pop(name, None)
+                fingerprint = stage_fingerprint(fingerprint, "error")
+            else:
+                state[name] = {
+                    "fingerprint": fingerprint,
+                    "value": values[name],
+                }
+
+        fingerprints[name] = fingerprint
+        timings.append(
+            {"Nœud": name, "Statut": status, "Durée (ms)": elapsed_ms}
+        )
+
+    return values, fingerprints, timings
+
+
+def node_hourly(period_df: pd.DataFrame, period_key: str) -> dict:
+    return run_hourly_stage(period_key, period_df)
+
+
+def node_daily(hourly: dict) -> dict:
+    return rollup_hourly_cube(hourly["cube"])
+
+
+def node_quality(
+    period_df: pd.DataFrame,
+    period_key: str,
+    time_step: pd.Timedelta,
+) -> tuple[pd.DataFrame, dict]:
+    return run_quality_stage(period_key, time_step, period_df)
+
+
+def node_indicators(period_df: pd.DataFrame, daily: dict) -> dict:
+    """Indicateurs globaux de consommation et durée couverte."""
+    analysis_start = period_df["Horodate"].min()
+    analysis_end = period_df["Horodate"].max()
+    analysis_days = max(
+        (analysis_end - analysis_start).total_seconds() / 86400,
+        1,
+    )
+    maximum_power_kw = period_df["Puissance_kW"].max()
+    mean_power_kw = period_df["Puissance_kW"].mean()
+    daily_consumption = daily["daily"]["Consommation_kWh"]
+
+    return {
+        "analysis_start": analysis_start,
+        "analysis_end": analysis_end,
+        "analysis_days": analysis_days,
+        "coverage_ratio": min(analysis_days / 365.25, 1.0),
+        "analysis_duration_years": max(analysis_days / 365.25, 1 / 365.25),
+        "total_kwh": period_df["Energie_kWh"].sum(),
+        "average_daily_kwh": daily_consumption.mean(),
+        "median_daily_kwh": daily_consumption.median(),
+        "maximum_power_kw": maximum_power_kw,
+        "mean_power_kw": mean_power_kw,
+        "load_factor": (
+            mean_power_kw / maximum_power_kw * 100
+            if maximum_power_kw
+            else 0
+        ),
+    }
+
+
+def node_tariff(
+    period_df: pd.DataFrame,
+    period_key: str,
+    hc_ranges: list[tuple],
+    daily: dict,
+    indicators: dict,
+) -> dict:
+    """Catégories tarifaires, synthèse et score d'optimisation."""
+    tariff_df, tariff_summary = run_tariff_stage(
+        period_key,
+        hc_ranges,
+        period_df,
+    )
+    tariff_values = tariff_summary.set_index(
+        "Categorie_tarifaire"
+    )["Consommation_kWh"]
+
+    return {
+        "frame": tariff_df,
+        # Empreinte du tableau détaillé, enrichie par les nœuds suivants.
+        "frame_key": stage_fingerprint(period_key, hc_ranges),
+        "summary": tariff_summary,
+        "score_data": calculate_tariff_optimization_score(
+            tariff_summary=tariff_summary,
+            daily_consumption=daily["daily"]["Consommation_kWh"],
+            coverage_ratio=indicators["coverage_ratio"],
+        ),
+        "hp_winter_kwh": float(tariff_values.get("HP hiver", 0)),
+        "hc_winter_kwh": float(tariff_values.get("HC hiver", 0)),
+        "hp_summer_kwh": float(tariff_values.get("HP été", 0)),
+        "hc_summer_kwh": float(tariff_values.get("HC été", 0)),
+    }
+
+
+def node_solar(
+    tariff: dict,
+    selected_location: dict | None,
+    indicators: dict,
+) -> dict:
+    """Position du soleil et part de consommation pendant le jour."""
+    result = {
+        "frame": tariff["frame"],
+        "frame_key": tariff["frame_key"],
+        "available": selected_location is not None,
+        "error": None,
+        "daylight_kwh": np.nan,
+        "daylight_share": np.nan,
+        "rows_count": 0,
+        "day_rows_count": 0,
+        "event_rows_count": 0,
+        "coherence_rate": np.nan,
+    }
+
+    if selected_location is None:
+        return result
+
+    total_kwh = indicators["total_kwh"]
+
+    try:
+        solar_df = run_solar_stage(
+            tariff["frame_key"],
+            selected_location["latitude"],
+            selected_location["longitude"],
+            tariff["frame"],
+        )
+        result["frame"] = solar_df
+        result["frame_key"] = stage_fingerprint(
+            tariff["frame_key"],
+            selected_location["latitude"],
+            selected_location["longitude"],
+        )
+
+        daylight_kwh = solar_df.loc[
+            solar_df["Soleil_leve"],
+            "Energie_kWh",
+        ].sum()
+        result["daylight_kwh"] = daylight_kwh
+        result["daylight_share"] = (
+            daylight_kwh / total_kwh * 100
+            if total_kwh
+            else 0
+        )
+
+        rows_count = len(solar_df)
+        result["rows_count"] = rows_count
+        result["day_rows_count"] = int(solar_df["Soleil_leve"].sum())
+        result["event_rows_count"] = int(
+            solar_df["Lever_soleil"].notna().sum()
+        )
+        result["coherence_rate"] = (
+            solar_df["Controle_solaire_coherent"].mean() * 100
+            if rows_count
+            else np.nan
+        )
+
+    except Exception as exc:
+        result["available"] = False
+        result["error"] = f"Analyse solaire impossible : {exc}"
+
+    return result
+
+
+PVGIS_ERROR = (
+    "Les heures de lever/coucher ont été calculées, "
+    "mais PVGIS n'a pas pu être interrogé : {}. "
+    "La source « Ciel clair pvlib (hors ligne) » permet de "
+    "poursuivre sans connexion."
+)
 
-    if low_value * high_value > 0:
-        return np.nan
 
-    for _ in range(150):
-        middle = (lower + upper) / 2.0
-        middle_value = value(middle)
+def node_pvgis(
+    solar: dict,
+    pv_settings: dict,
+    pvgis_future: Future | None,
+    daily: dict,
+    indicators: dict,
+) -> dict:
+    """Production PVGIS de référence, autoconsommation et score CMA.
 
-        if abs(middle_value) < 1e-8:
-            return middle
+    Tant que la requête PVGIS préchargée n'a pas abouti, le résultat est
+    marqué ``pending`` et le reste de l'analyse s'affiche sans la production.
+    """
+    result = {
+        "frame": solar["frame"],
+        "frame_key": solar["frame_key"],
+        "available": False,
+        "pending": False,
+        "error": solar["error"],
+        "production_period_kwh": np.nan,
+        "production_period_share": np.nan,
+        "pvgis_production_kwh": np.nan,
+        "self_consumed_kwh": np.nan,
+        "pv_surplus_kwh": np.nan,
+        "grid_import_kwh": np.nan,
+        "self_consumption_rate": np.nan,
+        "self_sufficiency_rate": np.nan,
+        "annual_yield_kwh_per_kwp": np.nan,
+        "cma_score_data": {
+            "score": 0.0,
+            "label": "Non calculé",
+            "color": "#7B8794",
+            "overlap_score": 0.0,
+            "self_consumption_score": 0.0,
+            "self_sufficiency_score": 0.0,
+            "regularity_score": 0.0,
+            "solar_resource_score": 0.0,
+            "coefficient_variation": np.nan,
+        },
+        "solar_daily_df": pd.DataFrame(),
+        "provider": pv_settings["provider"],
+    }
 
-        if low_value * middle_value <= 0:
-            upper = middle
-            high_value = middle_value
-        else:
-            lower = middle
-            low_value = middle_value
+    if not solar["available"] or pvgis_future is None:
+        return result
 
-    return (lower + upper) / 2.0
+    if not pvgis_future.done():
+        result["pending"] = True
+        return result
 
+    total_kwh = indicators["total_kwh"]
+    peak_power_kwp = pv_settings["peak_power_kwp"]
 
-def build_financial_projection(
-    net_investment: float,
-    annual_self_consumption_saving: float,
-    annual_surplus_revenue: float,
-    annual_operating_cost: float,
-    horizon_years: int,
-    electricity_price_increase_percent: float,
-    surplus_price_increase_percent: float,
-    production_degradation_percent: float,
-    operating_cost_increase_percent: float,
-    discount_rate_percent: float,
-) -> dict:
-    rows = []
-    cumulative = -net_investment
-    discounted_cumulative = -net_investment
-    cashflows = [-net_investment]
-    payback_year = np.nan
+    try:
+        pvgis_profile, _pvgis_metadata = pvgis_future.result()
+
+        reference_df = run_pvgis_merge_stage(
+            solar["frame_key"],
+            pv_settings["tilt"],
+            pv_settings["aspect"],
+            pv_settings["losses_percent"],
+            pv_settings["provider"],
+            solar["frame"],
+            pvgis_profile,
+        )
+        merged_df = scale_pv_production(reference_df, peak_power_kwp)
+        result["frame"] = merged_df
+        result["frame_key"] = stage_fingerprint(
+            solar["frame_key"],
+            pv_settings["tilt"],
+            pv_settings["aspect"],
+            peak_power_kwp,
+            pv_settings["losses_percent"],
+            pv_settings["provider"],
+        )
+        result["available"] = True
+
+        production_active_mask = merged_df["Production_PV_kW"].fillna(0) > 0
+        production_period_kwh = merged_df.loc[
+            production_active_mask,
+            "Energie_kWh",
+        ].sum()
+        result["production_period_kwh"] = production_period_kwh
+        result["production_period_share"] = (
+            production_period_kwh / total_kwh * 100
+            if total_kwh
+            else 0
+        )
 
-    for year in range(1, horizon_years + 1):
-        production_factor = (
-            1.0 - production_degradation_percent / 100.0
-        ) ** (year - 1)
-        electricity_factor = (
-            1.0 + electricity_price_increase_percent / 100.0
-        ) ** (year - 1)
-        surplus_factor = (
-            1.0 + surplus_price_increase_percent / 100.0
-        ) ** (year - 1)
-        opex_factor = (
-            1.0 + operating_cost_increase_percent / 100.0
-        ) ** (year - 1)
+        pvgis_production_kwh = merged_df["Production_PV_kWh"].sum()
+        self_consumed_kwh = merged_df["Autoconsommation_estimee_kWh"].sum()
+        result["pvgis_production_kwh"] = pvgis_production_kwh
+        result["self_consumed_kwh"] = self_consumed_kwh
 
-        self_consumption_saving = (
-            annual_self_consumption_saving
-            * production_factor
-            * electricity_factor
+        result["self_consumption_rate"] = (
+            self_consumed_kwh / pvgis_production_kwh * 100
+            if pvgis_production_kwh
+            else 0
         )
-        surplus_revenue = (
-            annual_surplus_revenue
-            * production_factor
-            * surplus_factor
+        result["self_sufficiency_rate"] = (
+            self_consumed_kwh / total_kwh * 100
+            if total_kwh
+            else 0
         )
-        operating_cost = (
-            annual_operating_cost * opex_factor
+        result["pv_surplus_kwh"] = max(
+            pvgis_production_kwh - self_consumed_kwh,
+            0,
         )
-        net_cashflow = (
-            self_consumption_saving
-            + surplus_revenue
-            - operating_cost
+        result["grid_import_kwh"] = max(
+            total_kwh - self_consumed_kwh,
+            0,
+        )
+        result["annual_yield_kwh_per_kwp"] = (
+            pvgis_production_kwh / peak_power_kwp
+            if peak_power_kwp
+            else np.nan
         )
 
-        discount_factor = (
-            1.0 + discount_rate_percent / 100.0
-        ) ** year
-        discounted_cashflow = net_cashflow / discount_factor
+        result["cma_score_data"] = calculate_cma_pv_score(
+            production_period_share=result["production_period_share"],
+            self_consumption_rate=result["self_consumption_rate"],
+            self_sufficiency_rate=result["self_sufficiency_rate"],
+            daily_consumption=daily["daily"]["Consommation_kWh"],
+            annual_yield_kwh_per_kwp=result["annual_yield_kwh_per_kwp"],
+        )
+        result["solar_daily_df"] = build_daily_solar_summary(merged_df)
 
-        previous_cumulative = cumulative
-        cumulative += net_cashflow
-        discounted_cumulative += discounted_cashflow
-        cashflows.append(net_cashflow)
+    except Exception as exc:
+        result["error"] = PVGIS_ERROR.format(exc)
 
-        if (
-            pd.isna(payback_year)
-            and cumulative >= 0
-            and net_cashflow > 0
-        ):
-            fraction = (
-                -previous_cumulative / net_cashflow
-                if previous_cumulative < 0
-                else 0.0
-            )
-            payback_year = year - 1 + fraction
+    return result
 
-        rows.append(
-            {
-                "Année": year,
-                "Économie autoconsommation (€)": self_consumption_saving,
-                "Revenu surplus (€)": surplus_revenue,
-                "Charges annuelles (€)": operating_cost,
-                "Flux net (€)": net_cashflow,
-                "Flux actualisé (€)": discounted_cashflow,
-                "Cumul net (€)": cumulative,
-                "Cumul actualisé (€)": discounted_cumulative,
-            }
-        )
 
-    discount_rate = discount_rate_percent / 100.0
-    npv = npv_from_cashflows(cashflows, discount_rate)
-    irr = irr_from_cashflows(cashflows)
+def node_investment(investment_settings: dict) -> dict:
+    """Raccordement, investissement et charges annuelles d'exploitation."""
+    settings = investment_settings
+    connection_data = calculate_connection_cost(
+        peak_power_kwp=settings["peak_power_kwp"],
+        **settings["connection"],
+    )
+    investment_data = calculate_investment_costs(
+        peak_power_kwp=settings["peak_power_kwp"],
+        connection_data=connection_data,
+        **settings["investment"],
+    )
+    operating_cost_data = calculate_annual_operating_costs(
+        peak_power_kwp=settings["peak_power_kwp"],
+        investment_gross=investment_data["gross_total"],
+        **settings["operating"],
+    )
+    return {
+        "connection_data": connection_data,
+        "investment_data": investment_data,
+        "operating_cost_data": operating_cost_data,
+    }
 
+
+def node_energy_value(
+    pvgis: dict,
+    price_settings: dict,
+    sale_settings: dict,
+    indicators: dict,
+) -> dict:
+    """Valorisation de l'énergie autoconsommée et du surplus."""
+    electricity_prices = tariff_price_map(**price_settings)
     return {
-        "table": pd.DataFrame(rows),
-        "cashflows": cashflows,
-        "payback_year": payback_year,
-        "npv": npv,
-        "irr": irr,
-        "total_net_gain": cumulative,
-        "annual_net_gain_year_1": (
-            rows[0]["Flux net (€)"] if rows else 0.0
+        "electricity_prices": electricity_prices,
+        "energy_value_data": run_energy_value_stage(
+            pvgis["frame_key"],
+            electricity_prices,
+            sale_settings["surplus_sale_price"],
+            sale_settings["annual_subscription"],
+            indicators["analysis_duration_years"],
+            pvgis["frame"],
         ),
     }
 
 
+def node_projection(
+    investment: dict,
+    energy_value: dict,
+    projection_settings: dict,
+) -> dict:
+    energy_value_data = energy_value["energy_value_data"]
+    return build_financial_projection(
+        net_investment=investment["investment_data"]["net_total"],
+        annual_self_consumption_saving=(
+            energy_value_data["annual_self_consumption_saving"]
+        ),
+        annual_surplus_revenue=energy_value_data["annual_surplus_revenue"],
+        annual_operating_cost=investment["operating_cost_data"]["total"],
+        **projection_settings,
+    )
+
+
+def node_assistant(
+    solar: dict,
+    pvgis: dict,
+    tariff: dict,
+    investment: dict,
+    projection: dict,
+    assistant_settings: dict,
+    indicators: dict,
+) -> dict:
+    return build_cma_business_assistant(
+        daylight_share=solar["daylight_share"],
+        production_period_share=pvgis["production_period_share"],
+        self_consumption_rate=pvgis["self_consumption_rate"],
+        self_sufficiency_rate=pvgis["self_sufficiency_rate"],
+        pv_surplus_kwh=pvgis["pv_surplus_kwh"],
+        pvgis_production_kwh=pvgis["pvgis_production_kwh"],
+        cma_score_data=pvgis["cma_score_data"],
+        tariff_score_data=tariff["score_data"],
+        investment_data=investment["investment_data"],
+        operating_cost_data=investment["operating_cost_data"],
+        financial_projection=projection,
+        connection_data=investment["connection_data"],
+        coverage_ratio=indicators["coverage_ratio"],
+        **assistant_settings,
+    )
+
+
+CALCULATION_GRAPH = {
+    "hourly": calculation_node(node_hourly, "period_df", "period_key"),
+    "daily": calculation_node(node_daily, "hourly"),
+    "quality": calculation_node(
+        node_quality, "period_df", "period_key", "time_step"
+    ),
+    "indicators": calculation_node(node_indicators, "period_df", "daily"),
+    "tariff": calculation_node(
+        node_tariff, "period_df", "period_key", "hc_ranges", "daily",
+        "indicators",
+    ),
+    "solar": calculation_node(
+        node_solar, "tariff", "selected_location", "indicators"
+    ),
+    "pvgis": calculation_node(
+        node_pvgis, "solar", "pv_settings", "pvgis_future", "daily",
+        "indicators",
+    ),
+    "investment": calculation_node(node_investment, "investment_settings"),
+    "energy_value": calculation_node(
+        node_energy_value, "pvgis", "price_settings", "sale_settings",
+        "indicators",
+    ),
+    "projection": calculation_node(
+        node_projection, "investment", "energy_value", "projection_settings"
+    ),
+    "assistant": calculation_node(
+        node_assistant, "solar", "pvgis", "tariff", "investment",
+        "projection", "assistant_settings", "indicators",
+    ),
+}
+
 
 # ============================================================
 # ASSISTANT MÉTIER CMA — RÈGLES EXPLICITES, SANS IA EXTERNE
@@ -3718,14 +5806,109 @@ def safe_pdf_text(value) -> str:
     )
 
 
-def figure_to_png_bytes(fig, width: int = 1100, height: int = 520) -> BytesIO:
-    image_bytes = fig.to_image(
-        format="png",
-        width=width,
-        height=height,
-        scale=1.5,
-    )
-    return BytesIO(image_bytes)
+KALEIDO_POOL_SIZE = 3
+FIGURE_PNG_CACHE_ENTRIES = 32
+
+
+@st.cache_resource(show_spinner=False)
+def kaleido_renderer_pool() -> dict:
+    """Processus Kaleido conservés entre les rapports et cache des PNG rendus.
+
+    Chaque PlotlyScope garde son processus Chromium vivant après le premier
+    rendu : seul le tout premier rapport paie le démarrage. Plusieurs scopes
+    permettent de rendre les figures d'un rapport en parallèle.
+    """
+    import plotly.io as pio
+
+    reference_scope = pio.kaleido.scope
+    if reference_scope is None:
+        raise ValueError(
+            "Le paquet kaleido est nécessaire pour exporter les graphiques."
+        )
+
+    pool_size = max(1, min(KALEIDO_POOL_SIZE, os.cpu_count() or 1))
+    scopes = queue.SimpleQueue()
+    scopes.put(reference_scope)
+    for _ in range(pool_size - 1):
+        scopes.put(
+            type(reference_scope)(
+                plotlyjs=reference_scope.plotlyjs,
+                mathjax=reference_scope.mathjax,
+            )
+        )
+
+    return {
+        "scopes": scopes,
+        "executor": ThreadPoolExecutor(
+            max_workers=pool_size,
+            thread_name_prefix="kaleido",
+        ),
+        "cache": {},
+        "lock": threading.Lock(),
+    }
+
+
+def render_figure_png(
+    pool: dict,
+    fig,
+    width: int = 1100,
+    height: int = 520,
+    scale: float = 1.5,
+) -> bytes:
+    """Rend une figure en PNG sur un scope libre du pool.
+
+    Le cache est adressé par le contenu : la même figure (données, mise en
+    forme et dimensions) n'est jamais rendue deux fois.
+    """
+    cache = pool["cache"]
+    key = hashlib.sha256(
+        f"{width}x{height}@{scale}|{fig.to_json()}".encode("utf-8")
+    ).hexdigest()
+
+    with pool["lock"]:
+        if key in cache:
+            cache[key] = cache.pop(key)
+            return cache[key]
+
+    scope = pool["scopes"].get()
+    try:
+        image_bytes = scope.transform(
+            fig,
+            format="png",
+            width=width,
+            height=height,
+            scale=scale,
+        )
+    finally:
+        pool["scopes"].put(scope)
+
+    with pool["lock"]:
+        cache[key] = image_bytes
+        while len(cache) > FIGURE_PNG_CACHE_ENTRIES:
+            cache.pop(next(iter(cache)))
+
+    return image_bytes
+
+
+def figures_to_png_bytes(
+    figures: dict,
+    pool: dict,
+    width: int = 1100,
+    height: int = 520,
+) -> dict[str, BytesIO]:
+    """Rend plusieurs figures en parallèle, dans l'ordre du dictionnaire."""
+    futures = {
+        name: pool["executor"].submit(
+            render_figure_png,
+            pool,
+            fig,
+            width,
+            height,
+        )
+        for name, fig in figures.items()
+    }
+    return {name: BytesIO(future.result()) for name, future in futures.items()}
+
 
 
 def build_automatic_commentary(
@@ -3773,42 +5956,374 @@ def build_automatic_commentary(
             "La majorité de l'électricité produite pourrait être consommée "
             "directement sur le site, ce qui limite le surplus potentiel."
         )
-    elif self_consumption_rate >= 55:
-        self_consumption = (
-            "Une part importante de la production pourrait être utilisée "
-            "directement par l'entreprise. Un surplus resterait toutefois "
-            "possible à certaines heures."
+    elif self_consumption_rate >= 55:
+        self_consumption = (
+            "Une part importante de la production pourrait être utilisée "
+            "directement par l'entreprise. Un surplus resterait toutefois "
+            "possible à certaines heures."
+        )
+    else:
+        self_consumption = (
+            "Une part notable de la production pourrait ne pas être consommée "
+            "immédiatement. La puissance étudiée devra être comparée à des "
+            "scénarios plus modestes ou à une solution de valorisation du surplus."
+        )
+
+    if pd.isna(self_sufficiency_rate):
+        self_sufficiency = "Le taux d'autoproduction n'a pas pu être estimé."
+    elif self_sufficiency_rate >= 40:
+        self_sufficiency = (
+            "La simulation indique qu'une part importante des besoins "
+            "électriques pourrait être couverte par la production solaire."
+        )
+    elif self_sufficiency_rate >= 20:
+        self_sufficiency = (
+            "La production solaire pourrait couvrir une part utile des besoins "
+            "électriques, sans rendre l'entreprise indépendante du réseau."
+        )
+    else:
+        self_sufficiency = (
+            "La production simulée couvrirait une part limitée des besoins. "
+            "Le réseau resterait la principale source d'électricité."
+        )
+
+    return {
+        "profile": profile,
+        "self_consumption": self_consumption,
+        "self_sufficiency": self_sufficiency,
+    }
+
+
+def build_pdf_figures(
+    monthly_df: pd.DataFrame,
+    weekday_hour_matrix: pd.DataFrame,
+    filtered_df: pd.DataFrame,
+) -> dict:
+    """Figures Plotly du rapport PDF, indexées par nom.
+
+    Elles sont construites ensemble pour être rendues en parallèle ; la
+    comparaison consommation / production n'existe qu'avec les données PV.
+    """
+    fig_monthly_pdf = px.bar(
+        monthly_df,
+        x="Mois_date",
+        y="Consommation_kWh",
+        labels={"Mois_date": "Mois", "Consommation_kWh": "Consommation (kWh)"},
+        title="Consommation mensuelle",
+        color_discrete_sequence=["#17365D"],
+    )
+    fig_monthly_pdf.update_layout(template="plotly_white", showlegend=False)
+
+    profile_long = (
+        weekday_hour_matrix.reset_index()
+        .melt(id_vars="Heure", var_name="Jour", value_name="Puissance_kW")
+        .dropna()
+    )
+    fig_profiles_pdf = px.line(
+        profile_long,
+        x="Heure",
+        y="Puissance_kW",
+        color="Jour",
+        title="Profil horaire moyen selon le jour de la semaine",
+        labels={"Heure": "Heure", "Puissance_kW": "Puissance moyenne (kW)"},
+    )
+    fig_profiles_pdf.update_layout(template="plotly_white", hovermode="x unified")
+
+    figures = {
+        "monthly": fig_monthly_pdf,
+        "profiles": fig_profiles_pdf,
+    }
+
+    if "Production_PV_kW" in filtered_df.columns:
+        solar_plot_pdf = filtered_df[
+            ["Horodate", "Puissance_kW", "Production_PV_kW"]
+        ].copy()
+        fig_compare_pdf = go.Figure()
+        fig_compare_pdf.add_trace(
+            go.Scatter(
+                x=solar_plot_pdf["Horodate"],
+                y=solar_plot_pdf["Puissance_kW"],
+                name="Consommation",
+                mode="lines",
+                line=dict(color="#17365D", width=1.3),
+            )
+        )
+        fig_compare_pdf.add_trace(
+            go.Scatter(
+                x=solar_plot_pdf["Horodate"],
+                y=solar_plot_pdf["Production_PV_kW"],
+                name="Production PV estimée",
+                mode="lines",
+                line=dict(color="#E53935", width=1.3),
+            )
+        )
+        fig_compare_pdf.update_layout(
+            title="Consommation et production photovoltaïque simulée",
+            xaxis_title="Date",
+            yaxis_title="Puissance (kW)",
+            template="plotly_white",
+            legend=dict(orientation="h"),
         )
-    else:
-        self_consumption = (
-            "Une part notable de la production pourrait ne pas être consommée "
-            "immédiatement. La puissance étudiée devra être comparée à des "
-            "scénarios plus modestes ou à une solution de valorisation du surplus."
+        figures["compare"] = fig_compare_pdf
+
+    return figures
+
+
+# Rendu vectoriel des graphiques du PDF : mêmes figures que build_pdf_figures,
+# tracées directement en ReportLab, sans Chromium ni rastérisation.
+
+PDF_CHART_BACKENDS = {
+    "Vectoriel (ReportLab)": "reportlab",
+    "Image Plotly (Kaleido)": "kaleido",
+}
+PDF_CHART_WIDTH = 16.5 * cm
+PDF_CHART_HEIGHTS = {
+    "monthly": 7.4 * cm,
+    "profiles": 7.6 * cm,
+    "compare": 7.6 * cm,
+}
+PDF_CHART_ENVELOPE_BUCKETS = 600
+PDF_AXIS_COLOR = colors.HexColor("#697589")
+PDF_GRID_COLOR = colors.HexColor("#E5ECF6")
+
+
+def format_chart_value(value: float) -> str:
+    return f"{value:g}".replace(".", ",")
+
+
+def envelope_series(
+    x: np.ndarray,
+    y: np.ndarray,
+    buckets: int = PDF_CHART_ENVELOPE_BUCKETS,
+) -> list[tuple[float, float]]:
+    """Réduit une longue série à son enveloppe min/max par tranche.
+
+    À la largeur d'une page A4, plusieurs milliers de points se confondent :
+    le minimum et le maximum de chaque tranche suffisent à conserver l'allure
+    de la courbe (pics compris) tout en gardant un PDF léger.
+    """
+    valid = np.isfinite(y)
+    x = x[valid]
+    y = y[valid]
+
+    if len(y) <= 2 * buckets:
+        return list(zip(x.tolist(), y.tolist()))
+
+    starts = np.linspace(0, len(y), buckets + 1).astype(int)[:-1]
+    centers = np.add.reduceat(x, starts) / np.diff(np.append(starts, len(y)))
+    lows = np.minimum.reduceat(y, starts)
+    highs = np.maximum.reduceat(y, starts)
+
+    points = np.empty((2 * buckets, 2))
+    points[0::2, 0] = centers
+    points[1::2, 0] = centers
+    points[0::2, 1] = lows
+    points[1::2, 1] = highs
+    return [tuple(point) for point in points.tolist()]
+
+
+def _pdf_chart_drawing(height: float, title: str, y_title: str) -> Drawing:
+    drawing = Drawing(PDF_CHART_WIDTH, height)
+    drawing.add(
+        String(
+            PDF_CHART_WIDTH / 2,
+            height - 14,
+            title,
+            fontName="Helvetica-Bold",
+            fontSize=11,
+            fillColor=colors.HexColor("#202735"),
+            textAnchor="middle",
         )
+    )
+    y_label = Group(
+        String(
+            0,
+            0,
+            y_title,
+            fontName="Helvetica",
+            fontSize=8,
+            fillColor=PDF_AXIS_COLOR,
+            textAnchor="middle",
+        )
+    )
+    y_label.translate(10, height / 2 - 6)
+    y_label.rotate(90)
+    drawing.add(y_label)
+    return drawing
+
+
+def _style_chart_axes(x_axis, value_axis) -> None:
+    for axis in (x_axis, value_axis):
+        axis.strokeColor = PDF_AXIS_COLOR
+        axis.labels.fontName = "Helvetica"
+        axis.labels.fontSize = 7
+        axis.labels.fillColor = PDF_AXIS_COLOR
+    value_axis.visibleGrid = True
+    value_axis.gridStrokeColor = PDF_GRID_COLOR
+    value_axis.labelTextFormat = format_chart_value
+    value_axis.valueMin = 0
+
+
+def _pdf_chart_legend(x: float, y: float, pairs: list, columns: int) -> Legend:
+    legend = Legend()
+    legend.x = x
+    legend.y = y
+    legend.alignment = "right"
+    legend.fontName = "Helvetica"
+    legend.fontSize = 7
+    legend.dx = 10
+    legend.dy = 3
+    legend.deltay = 10
+    legend.columnMaximum = max(1, -(-len(pairs) // columns))
+    legend.colorNamePairs = pairs
+    return legend
+
+
+def build_pdf_drawings(
+    monthly_df: pd.DataFrame,
+    weekday_hour_matrix: pd.DataFrame,
+    filtered_df: pd.DataFrame,
+) -> dict:
+    """Graphiques vectoriels du rapport PDF, avec les clés de build_pdf_figures."""
+    drawings = {}
 
-    if pd.isna(self_sufficiency_rate):
-        self_sufficiency = "Le taux d'autoproduction n'a pas pu être estimé."
-    elif self_sufficiency_rate >= 40:
-        self_sufficiency = (
-            "La simulation indique qu'une part importante des besoins "
-            "électriques pourrait être couverte par la production solaire."
+    height = PDF_CHART_HEIGHTS["monthly"]
+    drawing = _pdf_chart_drawing(
+        height,
+        "Consommation mensuelle",
+        "Consommation (kWh)",
+    )
+    chart = VerticalBarChart()
+    chart.x = 48
+    chart.y = 36
+    chart.width = PDF_CHART_WIDTH - 60
+    chart.height = height - 36 - 28
+    chart.data = [monthly_df["Consommation_kWh"].fillna(0).tolist() or [0]]
+    chart.categoryAxis.categoryNames = (
+        monthly_df["Mois_date"].dt.strftime("%m/%Y").tolist() or [""]
+    )
+    chart.bars[0].fillColor = colors.HexColor("#17365D")
+    chart.bars[0].strokeColor = None
+    chart.barSpacing = 2
+    _style_chart_axes(chart.categoryAxis, chart.valueAxis)
+    if len(monthly_df) > 12:
+        chart.categoryAxis.labels.angle = 35
+        chart.categoryAxis.labels.boxAnchor = "ne"
+    drawing.add(chart)
+    drawings["monthly"] = drawing
+
+    height = PDF_CHART_HEIGHTS["profiles"]
+    drawing = _pdf_chart_drawing(
+        height,
+        "Profil horaire moyen selon le jour de la semaine",
+        "Puissance moyenne (kW)",
+    )
+    chart = LinePlot()
+    chart.x = 48
+    chart.y = 36
+    chart.width = PDF_CHART_WIDTH - 140
+    chart.height = height - 36 - 28
+    palette = px.colors.qualitative.Plotly
+    days = list(weekday_hour_matrix.columns)
+    hours = weekday_hour_matrix.index.to_numpy(dtype=float)
+    chart.data = [
+        envelope_series(hours, weekday_hour_matrix[day].to_numpy(dtype=float))
+        or [(0.0, 0.0)]
+        for day in days
+    ]
+    for index, day in enumerate(days):
+        chart.lines[index].strokeColor = colors.HexColor(
+            palette[index % len(palette)]
+        )
+        chart.lines[index].strokeWidth = 1.3
+    chart.xValueAxis.valueMin = 0
+    chart.xValueAxis.valueMax = 23
+    chart.xValueAxis.valueSteps = list(range(0, 24, 2))
+    chart.xValueAxis.labelTextFormat = "%d"
+    _style_chart_axes(chart.xValueAxis, chart.yValueAxis)
+    drawing.add(chart)
+    drawing.add(
+        _pdf_chart_legend(
+            PDF_CHART_WIDTH - 70,
+            height - 40,
+            [
+                (colors.HexColor(palette[index % len(palette)]), day)
+                for index, day in enumerate(days)
+            ],
+            columns=1,
         )
-    elif self_sufficiency_rate >= 20:
-        self_sufficiency = (
-            "La production solaire pourrait couvrir une part utile des besoins "
-            "électriques, sans rendre l'entreprise indépendante du réseau."
+    )
+    drawing.add(
+        String(
+            chart.x + chart.width / 2,
+            6,
+            "Heure",
+            fontName="Helvetica",
+            fontSize=8,
+            fillColor=PDF_AXIS_COLOR,
+            textAnchor="middle",
         )
-    else:
-        self_sufficiency = (
-            "La production simulée couvrirait une part limitée des besoins. "
-            "Le réseau resterait la principale source d'électricité."
+    )
+    drawings["profiles"] = drawing
+
+    if "Production_PV_kW" in filtered_df.columns:
+        height = PDF_CHART_HEIGHTS["compare"]
+        drawing = _pdf_chart_drawing(
+            height,
+            "Consommation et production photovoltaïque simulée",
+            "Puissance (kW)",
+        )
+        chart = LinePlot()
+        chart.x = 48
+        chart.y = 46
+        chart.width = PDF_CHART_WIDTH - 80
+        chart.height = height - 46 - 28
+        days_axis = (
+            filtered_df["Horodate"].to_numpy(dtype="datetime64[ns]")
+            .astype("int64") / 86_400e9
+        )
+        series = [
+            ("Consommation", "Puissance_kW", "#17365D"),
+            ("Production PV estimée", "Production_PV_kW", "#E53935"),
+        ]
+        chart.data = [
+            envelope_series(
+                days_axis,
+                filtered_df[column].to_numpy(dtype=float),
+            )
+            or [(0.0, 0.0)]
+            for _, column, _ in series
+        ]
+        for index, (_, _, color) in enumerate(series):
+            chart.lines[index].strokeColor = colors.HexColor(color)
+            chart.lines[index].strokeWidth = 0.8
+        if len(days_axis):
+            chart.xValueAxis.valueMin = float(days_axis.min())
+            chart.xValueAxis.valueMax = float(days_axis.max())
+            chart.xValueAxis.valueSteps = np.linspace(
+                days_axis.min(),
+                days_axis.max(),
+                6,
+            ).tolist()
+        chart.xValueAxis.labelTextFormat = lambda value: (
+            pd.Timestamp(value * 86_400e9).strftime("%d/%m/%Y")
+        )
+        _style_chart_axes(chart.xValueAxis, chart.yValueAxis)
+        drawing.add(chart)
+        drawing.add(
+            _pdf_chart_legend(
+                chart.x + 10,
+                10,
+                [
+                    (colors.HexColor(color), label)
+                    for label, _, color in series
+                ],
+                columns=2,
+            )
         )
+        drawings["compare"] = drawing
 
-    return {
-        "profile": profile,
-        "self_consumption": self_consumption,
-        "self_sufficiency": self_sufficiency,
-    }
+    return drawings
 
 
 def create_cma_pdf_report(
@@ -3859,9 +6374,45 @@ def create_cma_pdf_report(
     hourly_df: pd.DataFrame,
     filtered_df: pd.DataFrame,
     logo_path: Path | None,
+    progress=None,
+    chart_backend: str = "kaleido",
+    renderer_pool: dict | None = None,
+    irradiance_provider: str = "pvgis",
 ) -> bytes:
+    """Construit le rapport PDF CMA.
+
+    ``progress``, facultatif, est appelée avec (fraction, étape) au fil de la
+    génération ; elle permet de suivre une génération lancée en tâche de fond.
+    ``chart_backend`` choisit le rendu des graphiques (voir
+    PDF_CHART_BACKENDS) : dessin vectoriel ReportLab ou images Plotly. Pour
+    ces dernières, ``renderer_pool`` est le pool Kaleido à utiliser ; une
+    tâche de fond le reçoit du script, les ressources Streamlit n'étant
+    accessibles que depuis le thread du script.
+    """
     output = BytesIO()
 
+    def report_progress(fraction: float, step: str) -> None:
+        if progress is not None:
+            progress(fraction, step)
+
+    report_progress(0.05, "Rendu des graphiques")
+    if chart_backend == "reportlab":
+        charts = build_pdf_drawings(monthly_df, weekday_hour_matrix, filtered_df)
+    else:
+        figure_images = figures_to_png_bytes(
+            build_pdf_figures(monthly_df, weekday_hour_matrix, filtered_df),
+            renderer_pool or kaleido_renderer_pool(),
+        )
+        charts = {
+            name: Image(
+                image,
+                width=PDF_CHART_WIDTH,
+                height=PDF_CHART_HEIGHTS[name],
+            )
+            for name, image in figure_images.items()
+        }
+    report_progress(0.5, "Composition du rapport")
+
     page_width, page_height = A4
     cma_blue = colors.HexColor("#17365D")
     cma_red = colors.HexColor("#E53935")
@@ -4186,17 +6737,7 @@ def create_cma_pdf_report(
     story.append(Spacer(1, 0.3 * cm))
 
     # Graphique mensuel
-    fig_monthly_pdf = px.bar(
-        monthly_df,
-        x="Mois_date",
-        y="Consommation_kWh",
-        labels={"Mois_date": "Mois", "Consommation_kWh": "Consommation (kWh)"},
-        title="Consommation mensuelle",
-        color_discrete_sequence=["#17365D"],
-    )
-    fig_monthly_pdf.update_layout(template="plotly_white", showlegend=False)
-    month_img = Image(figure_to_png_bytes(fig_monthly_pdf), width=16.5 * cm, height=7.4 * cm)
-    story.append(month_img)
+    story.append(charts["monthly"])
     story.append(PageBreak())
 
     # Profil hebdomadaire
@@ -4234,49 +6775,25 @@ def create_cma_pdf_report(
         ("BACKGROUND", (0, 1), (0, -1), light_grey),
     ]
 
-    numeric_values = matrix.to_numpy(dtype=float)
-    valid_values = numeric_values[np.isfinite(numeric_values)]
-    vmin = float(valid_values.min()) if valid_values.size else 0
-    vmax = float(valid_values.max()) if valid_values.size else 1
-    span = max(vmax - vmin, 1e-9)
-
-    for r_index, (_, row) in enumerate(matrix.iterrows(), start=1):
-        for c_index, value in enumerate(row, start=1):
-            if pd.isna(value):
-                bg = colors.white
-            else:
-                ratio = (float(value) - vmin) / span
-                if ratio < 0.25:
-                    bg = colors.HexColor("#63BE7B")
-                elif ratio < 0.50:
-                    bg = colors.HexColor("#A9D26D")
-                elif ratio < 0.70:
-                    bg = colors.HexColor("#FFEB84")
-                elif ratio < 0.87:
-                    bg = colors.HexColor("#F6B26B")
-                else:
-                    bg = colors.HexColor("#F8696B")
-            heat_styles.append(("BACKGROUND", (c_index, r_index), (c_index, r_index), bg))
+    heat_styles += [
+        (
+            "BACKGROUND",
+            (first_column + 1, row + 1),
+            (last_column + 1, row + 1),
+            colors.HexColor(HEAT_HEX[level]),
+        )
+        for row, first_column, last_column, level in heat_style_runs(
+            heat_levels(matrix.to_numpy(dtype=float))
+        )
+        # Cellules vides : fond blanc, comme le reste du tableau.
+        if level >= 0
+    ]
 
     heat_table.setStyle(TableStyle(heat_styles))
     story.append(heat_table)
     story.append(Spacer(1, 0.45 * cm))
 
-    profile_long = (
-        weekday_hour_matrix.reset_index()
-        .melt(id_vars="Heure", var_name="Jour", value_name="Puissance_kW")
-        .dropna()
-    )
-    fig_profiles_pdf = px.line(
-        profile_long,
-        x="Heure",
-        y="Puissance_kW",
-        color="Jour",
-        title="Profil horaire moyen selon le jour de la semaine",
-        labels={"Heure": "Heure", "Puissance_kW": "Puissance moyenne (kW)"},
-    )
-    fig_profiles_pdf.update_layout(template="plotly_white", hovermode="x unified")
-    story.append(Image(figure_to_png_bytes(fig_profiles_pdf), width=16.5 * cm, height=7.6 * cm))
+    story.append(charts["profiles"])
     story.append(PageBreak())
 
     # Solaire
@@ -4319,37 +6836,18 @@ def create_cma_pdf_report(
         )
     )
 
-    if "Production_PV_kW" in filtered_df.columns:
-        solar_plot_pdf = filtered_df[
-            ["Horodate", "Puissance_kW", "Production_PV_kW"]
-        ].copy()
-        fig_compare_pdf = go.Figure()
-        fig_compare_pdf.add_trace(
-            go.Scatter(
-                x=solar_plot_pdf["Horodate"],
-                y=solar_plot_pdf["Puissance_kW"],
-                name="Consommation",
-                mode="lines",
-                line=dict(color="#17365D", width=1.3),
-            )
-        )
-        fig_compare_pdf.add_trace(
-            go.Scatter(
-                x=solar_plot_pdf["Horodate"],
-                y=solar_plot_pdf["Production_PV_kW"],
-                name="Production PV estimée",
-                mode="lines",
-                line=dict(color="#E53935", width=1.3),
+    if irradiance_provider == "clearsky":
+        story.append(
+            Paragraph(
+                "<b>Estimation hors ligne :</b> PVGIS n'a pas été interrogé. "
+                "La production est calculée par ciel clair (sans nuages) et "
+                "constitue donc un majorant à confirmer avec PVGIS.",
+                styles["CMA_Body"],
             )
         )
-        fig_compare_pdf.update_layout(
-            title="Consommation et production photovoltaïque simulée",
-            xaxis_title="Date",
-            yaxis_title="Puissance (kW)",
-            template="plotly_white",
-            legend=dict(orientation="h"),
-        )
-        story.append(Image(figure_to_png_bytes(fig_compare_pdf), width=16.5 * cm, height=7.6 * cm))
+
+    if "compare" in charts:
+        story.append(charts["compare"])
 
     story.append(PageBreak())
 
@@ -4750,7 +7248,9 @@ def create_cma_pdf_report(
         )
     )
 
+    report_progress(0.85, "Mise en page du rapport")
     doc.build(story)
+    report_progress(1.0, "Rapport prêt")
     output.seek(0)
     return output.getvalue()
 
@@ -4763,97 +7263,364 @@ def format_fr(value: float, decimals: int = 1) -> str:
     )
 
 
-def make_excel_export(
-    hourly_standardized_data: pd.DataFrame,
-    hourly_data: pd.DataFrame,
-    daily_data: pd.DataFrame,
-    monthly_data: pd.DataFrame,
-    weekday_hour_matrix: pd.DataFrame,
-    date_hour_matrix: pd.DataFrame,
-    tariff_summary: pd.DataFrame,
-    tariff_detail: pd.DataFrame,
-    financial_summary: pd.DataFrame,
-    financial_projection_data: pd.DataFrame,
-    summary: pd.DataFrame,
-) -> bytes:
-    output = BytesIO()
+EXCEL_STREAM_CHUNK_ROWS = 5000
+EXCEL_HEADER_FONT = Font(bold=True)
+EXCEL_HEADER_BORDER = Border(
+    left=Side(style="thin"),
+    right=Side(style="thin"),
+    top=Side(style="thin"),
+    bottom=Side(style="thin"),
+)
+EXCEL_HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="top")
+# Format appliqué par DataFrame.to_excel aux dates et heures.
+EXCEL_DATETIME_FORMAT = "YYYY-MM-DD HH:MM:SS"
+
+
+def _excel_datetime_cell(worksheet, value) -> WriteOnlyCell:
+    cell = WriteOnlyCell(worksheet, value=value)
+    if isinstance(value, pd.Timestamp):
+        cell.number_format = EXCEL_DATETIME_FORMAT
+    return cell
+
+
+def _excel_header_cell(worksheet, value) -> WriteOnlyCell:
+    cell = _excel_datetime_cell(worksheet, value)
+    cell.font = EXCEL_HEADER_FONT
+    cell.border = EXCEL_HEADER_BORDER
+    cell.alignment = EXCEL_HEADER_ALIGNMENT
+    return cell
+
+
+def write_frame_streaming(
+    workbook: Workbook,
+    sheet_name: str,
+    frame: pd.DataFrame,
+    index: bool = False,
+) -> None:
+    """Écrit un DataFrame dans un classeur en écriture seule, par blocs de lignes.
+
+    Rendu identique à DataFrame.to_excel (en-têtes et index en gras et
+    encadrés) avec le volet figé sous l'en-tête et un filtre automatique sur
+    toute la plage. La mémoire reste bornée par EXCEL_STREAM_CHUNK_ROWS.
+    """
+    headers = list(frame.columns)
+    if index:
+        headers = [frame.index.name] + headers
+        frame = frame.reset_index()
+
+    worksheet = workbook.create_sheet(sheet_name)
+    worksheet.freeze_panes = "A2"
+    worksheet.auto_filter.ref = (
+        f"A1:{get_column_letter(max(len(headers), 1))}{len(frame) + 1}"
+    )
+
+    widths = excel_column_widths(frame, headers, minimum=11, maximum=35)
+    for position, width in enumerate(widths, start=1):
+        worksheet.column_dimensions[get_column_letter(position)].width = width
+
+    worksheet.append([_excel_header_cell(worksheet, header) for header in headers])
+
+    datetime_positions = [
+        position
+        for position, dtype in enumerate(frame.dtypes)
+        if pd.api.types.is_datetime64_any_dtype(dtype)
+        and not (index and position == 0)
+    ]
+
+    for start in range(0, len(frame), EXCEL_STREAM_CHUNK_ROWS):
+        chunk = frame.iloc[start : start + EXCEL_STREAM_CHUNK_ROWS]
+        rows = chunk.astype(object).where(chunk.notna(), None).to_numpy().tolist()
+
+        for row in rows:
+            if index:
+                row[0] = _excel_header_cell(worksheet, row[0])
+            for position in datetime_positions:
+                row[position] = _excel_datetime_cell(worksheet, row[position])
+            worksheet.append(row)
+
+
+def make_excel_export(
+    hourly_standardized_data: pd.DataFrame,
+    hourly_data: pd.DataFrame,
+    daily_data: pd.DataFrame,
+    monthly_data: pd.DataFrame,
+    weekday_hour_matrix: pd.DataFrame,
+    date_hour_matrix: pd.DataFrame,
+    tariff_summary: pd.DataFrame,
+    tariff_detail: pd.DataFrame,
+    financial_summary: pd.DataFrame,
+    financial_projection_data: pd.DataFrame,
+    summary: pd.DataFrame,
+) -> bytes:
+    date_hour_export = date_hour_matrix.copy()
+    date_hour_export.insert(
+        0,
+        "Jour",
+        [WEEKDAYS[d.weekday()] for d in date_hour_export.index],
+    )
+
+    workbook = Workbook(write_only=True)
+    sheets = [
+        ("Synthèse", summary, False),
+        ("Données traitées 1h", hourly_standardized_data, False),
+        ("Profil horaire", hourly_data, False),
+        ("Consommations journalières", daily_data, False),
+        ("Consommations mensuelles", monthly_data, False),
+        ("Moyenne heure-jour", weekday_hour_matrix, True),
+        ("Heures toutes dates", date_hour_export, True),
+        ("Répartition tarifaire", tariff_summary, False),
+        ("Détail tarifaire", tariff_detail, False),
+        ("Synthèse financière", financial_summary, False),
+        ("Projection financière", financial_projection_data, False),
+    ]
+
+    for sheet_name, frame, index in sheets:
+        write_frame_streaming(workbook, sheet_name, frame, index=index)
+
+    output = BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+
+# ============================================================
+# RAPPORT PDF EN TÂCHE DE FOND
+# ============================================================
+# La génération du PDF (rendus Kaleido + mise en page ReportLab) prend
+# plusieurs secondes. Elle est lancée explicitement dans un thread dédié et
+# indexée par l'empreinte des entrées du rapport : un rerun sans rapport
+# avec le PDF ne la relance pas, et un rapport déjà produit est resservi
+# immédiatement, y compris depuis une autre session.
+
+PDF_JOB_WORKERS = 2
+PDF_JOB_ENTRIES = 8
+PDF_JOB_ERROR = "Le rapport PDF n'a pas pu être généré. Détail : {}"
+
+
+@st.cache_resource(show_spinner=False)
+def pdf_job_registry() -> dict:
+    """Exécuteur et tâches PDF partagés par toutes les sessions."""
+    return {
+        "executor": ThreadPoolExecutor(
+            max_workers=PDF_JOB_WORKERS,
+            thread_name_prefix="cma-pdf",
+        ),
+        "jobs": {},
+        "lock": threading.Lock(),
+    }
+
+
+def find_pdf_job(report_key: str) -> dict | None:
+    """Tâche connue pour ``report_key``, en cours, réussie ou échouée.
+
+    Une tâche échouée reste enregistrée jusqu'à forget_pdf_job : son erreur
+    est ainsi affichée même si l'attente avait été interrompue par un rerun.
+    """
+    registry = pdf_job_registry()
+
+    with registry["lock"]:
+        job = registry["jobs"].pop(report_key, None)
+
+        if job is not None:
+            registry["jobs"][report_key] = job
+
+        return job
+
+
+def forget_pdf_job(report_key: str) -> None:
+    registry = pdf_job_registry()
+
+    with registry["lock"]:
+        registry["jobs"].pop(report_key, None)
+
+
+def submit_pdf_job(report_key: str, report_arguments: dict) -> dict:
+    """Lance create_cma_pdf_report en tâche de fond, sauf si elle existe déjà.
+
+    Les arguments sont figés au moment de l'envoi : un rerun ultérieur du
+    script ne modifie pas le rapport en cours de génération.
+    """
+    job = find_pdf_job(report_key)
+    if job is not None and not (
+        job["future"].done() and job["future"].exception() is not None
+    ):
+        return job
+
+    registry = pdf_job_registry()
+    job = {"progress": 0.0, "step": "En attente"}
+
+    def update(fraction: float, step: str) -> None:
+        job["progress"] = fraction
+        job["step"] = step
+
+    if report_arguments.get("chart_backend", "kaleido") == "kaleido":
+        report_arguments = {
+            **report_arguments,
+            "renderer_pool": kaleido_renderer_pool(),
+        }
+
+    with registry["lock"]:
+        job["future"] = registry["executor"].submit(
+            create_cma_pdf_report,
+            **report_arguments,
+            progress=update,
+        )
+        jobs = registry["jobs"]
+        jobs[report_key] = job
+
+        finished = [key for key, item in jobs.items() if item["future"].done()]
+        while len(jobs) > PDF_JOB_ENTRIES and finished:
+            jobs.pop(finished.pop(0))
+
+    return job
+
+
+def wait_for_pdf_job(job: dict, placeholder) -> None:
+    """Affiche l'avancement de la tâche dans ``placeholder`` jusqu'à sa fin.
+
+    Appelée en fin de script, une fois la page entièrement affichée. Si
+    l'utilisateur modifie un widget pendant l'attente, le rerun interrompt
+    seulement cet affichage : la génération continue dans son thread.
+    """
+    while not job["future"].done():
+        placeholder.progress(job["progress"], text=job["step"])
+        time.sleep(0.2)
+
+    placeholder.empty()
+
+
+# ============================================================
+# PRÉCHARGEMENT PVGIS EN TÂCHE DE FOND
+# ============================================================
+# La requête PVGIS peut durer jusqu'à deux minutes. Elle part dès que
+# l'adresse et l'installation sont connues dans le panneau latéral, pendant
+# la saisie des autres hypothèses ; la page s'affiche sans l'attendre et
+# le profil est intégré par un rerun dès sa réception. Une requête échouée
+# est conservée jusqu'à une nouvelle tentative demandée par l'utilisateur.
+
+PVGIS_PREFETCH_WORKERS = 2
+PVGIS_PREFETCH_ENTRIES = 16
+
+
+@st.cache_resource(show_spinner=False)
+def pvgis_prefetch_registry() -> dict:
+    """Exécuteur et requêtes PVGIS partagés par toutes les sessions."""
+    return {
+        "executor": ThreadPoolExecutor(
+            max_workers=PVGIS_PREFETCH_WORKERS,
+            thread_name_prefix="cma-pvgis",
+        ),
+        "jobs": {},
+        "lock": threading.Lock(),
+    }
+
+
+def pvgis_request(selected_location: dict, pv_settings: dict) -> tuple:
+    """Arguments de fetch_pvgis_reference_profile, ramenés à la maille PVGIS.
+
+    La puissance crête n'en fait pas partie : le profil est exprimé par kWc.
+    """
+    latitude, longitude = pvgis_grid_cell(
+        selected_location["latitude"],
+        selected_location["longitude"],
+    )
+    return (
+        latitude,
+        longitude,
+        pv_settings["tilt"],
+        pv_settings["aspect"],
+        pv_settings["losses_percent"],
+        pv_settings["provider"],
+    )
+
+
+def prefetch_pvgis_profile(request: tuple, retry: bool = False) -> Future:
+    """Lance la requête PVGIS en tâche de fond, sauf si elle existe déjà.
+
+    Les profils reçus restent disponibles pour les requêtes suivantes. Une
+    requête échouée est conservée telle quelle, pour que l'erreur s'affiche
+    sans relance en boucle ; elle n'est soumise à nouveau qu'avec ``retry``.
+    """
+    registry = pvgis_prefetch_registry()
+
+    with registry["lock"]:
+        jobs = registry["jobs"]
+        future = jobs.pop(request, None)
+
+        if future is None or (
+            retry and future.done() and future.exception() is not None
+        ):
+            future = registry["executor"].submit(
+                fetch_pvgis_reference_profile,
+                *request,
+            )
+
+        jobs[request] = future
+
+        finished = [key for key, item in jobs.items() if item.done()]
+        while len(jobs) > PVGIS_PREFETCH_ENTRIES and finished:
+            jobs.pop(finished.pop(0))
+
+    return future
+
+
+def wait_for_pvgis_prefetch(future: Future, placeholder) -> None:
+    """Patiente jusqu'à la réponse PVGIS en affichant le temps écoulé.
 
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        summary.to_excel(writer, index=False, sheet_name="Synthèse")
-        hourly_standardized_data.to_excel(
-            writer,
-            index=False,
-            sheet_name="Données traitées 1h",
-        )
-        hourly_data.to_excel(writer, index=False, sheet_name="Profil horaire")
-        daily_data.to_excel(
-            writer,
-            index=False,
-            sheet_name="Consommations journalières",
-        )
-        monthly_data.to_excel(
-            writer,
-            index=False,
-            sheet_name="Consommations mensuelles",
-        )
-        weekday_hour_matrix.to_excel(
-            writer,
-            sheet_name="Moyenne heure-jour",
-        )
-        date_hour_export = date_hour_matrix.copy()
-        date_hour_export.insert(
-            0,
-            "Jour",
-            [WEEKDAYS[d.weekday()] for d in date_hour_export.index],
-        )
-        date_hour_export.to_excel(
-            writer,
-            sheet_name="Heures toutes dates",
-        )
-        tariff_summary.to_excel(
-            writer,
-            index=False,
-            sheet_name="Répartition tarifaire",
-        )
-        tariff_detail.to_excel(
-            writer,
-            index=False,
-            sheet_name="Détail tarifaire",
-        )
-        financial_summary.to_excel(
-            writer,
-            index=False,
-            sheet_name="Synthèse financière",
-        )
-        financial_projection_data.to_excel(
-            writer,
-            index=False,
-            sheet_name="Projection financière",
+    Si l'utilisateur modifie un widget pendant l'attente, le rerun interrompt
+    seulement cet affichage : la requête continue dans son thread.
+    """
+    started = time.monotonic()
+
+    while not future.done():
+        placeholder.info(
+            "⏳ Données PVGIS en cours de récupération "
+            f"({time.monotonic() - started:.0f} s)…"
         )
+        time.sleep(0.5)
 
-        workbook = writer.book
+    placeholder.empty()
 
-        for sheet_name in workbook.sheetnames:
-            worksheet = workbook[sheet_name]
-            worksheet.freeze_panes = "A2"
-            worksheet.auto_filter.ref = worksheet.dimensions
 
-            for column_cells in worksheet.columns:
-                max_length = 0
-                column_letter = column_cells[0].column_letter
+# ============================================================
+# EXPORTS À LA DEMANDE
+# ============================================================
+# Les livrables lourds (classeurs, PNG, PDF) ne sont plus produits à chaque
+# rerun : ils sont préparés sur demande puis conservés dans la session tant
+# que l'empreinte des données dont ils dépendent reste identique.
+
+def on_demand_artifact(
+    key: str,
+    fingerprint: str,
+    build,
+    prepare_label: str,
+) -> dict | None:
+    """Renvoie l'export ``key`` s'il est à jour, sinon propose de le préparer.
+
+    ``build`` est appelée sans argument et renvoie un dictionnaire (au moins
+    la clé ``data`` attendue par st.download_button). Le résultat est
+    conservé dans st.session_state avec ``fingerprint`` ; un export dont
+    l'empreinte ne correspond plus est écarté et doit être préparé à nouveau.
+    """
+    artifacts = st.session_state.setdefault("on_demand_artifacts", {})
+    artifact = artifacts.get(key)
 
-                for cell in column_cells:
-                    max_length = max(
-                        max_length,
-                        len(str(cell.value or "")),
-                    )
+    if artifact is not None and artifact["fingerprint"] == fingerprint:
+        return artifact
 
-                worksheet.column_dimensions[column_letter].width = min(
-                    max(max_length + 2, 11),
-                    35,
-                )
+    artifacts.pop(key, None)
 
-    return output.getvalue()
+    if not st.button(
+        prepare_label,
+        key=f"prepare_{key}",
+        use_container_width=True,
+    ):
+        return None
+
+    with st.spinner("Préparation de l'export..."):
+        artifact = {"fingerprint": fingerprint, **build()}
+
+    artifacts[key] = artifact
+    return artifact
 
 
 # ============================================================
@@ -4885,13 +7652,18 @@ st.markdown(
 with st.sidebar:
     st.markdown("## 1. Import")
 
-    uploaded_file = st.file_uploader(
-        "Fichier Enedis",
-        type=["csv", "xlsx", "xls"],
-        help="Colonnes obligatoires : Horodate et Valeur.",
+    uploaded_files = st.file_uploader(
+        "Fichier(s) Enedis",
+        type=["csv", "xlsx", "xls", "zip"],
+        accept_multiple_files=True,
+        help=(
+            "Colonnes obligatoires : Horodate et Valeur. Plusieurs tranches "
+            "(annuelles, mensuelles) ou une archive ZIP peuvent être déposées : "
+            "elles sont fusionnées automatiquement."
+        ),
     )
 
-if uploaded_file is None:
+if not uploaded_files:
     st.markdown(
         """
         <div class="feature-grid">
@@ -4928,16 +7700,12 @@ if uploaded_file is None:
 
 
 try:
-    source_df = read_enedis_file(
-        uploaded_file.getvalue(),
-        uploaded_file.name,
-    )
-    time_step = detect_time_step(source_df)
-    source_unit = detect_source_unit(source_df)
-    enriched_df, interpretation = enrich_energy_data(
-        source_df,
-        time_step,
-        source_unit,
+    # Ordre de dépôt conservé : il départage les tranches de même pas.
+    source_filename = ", ".join(uploaded.name for uploaded in uploaded_files)
+    upload_key = uploaded_files_key(uploaded_files)
+    enriched_df, time_step, source_unit, interpretation = load_enedis_upload(
+        upload_key,
+        uploaded_files,
     )
 except Exception as exc:
     st.error(f"Impossible de traiter le fichier : {exc}")
@@ -5138,6 +7906,44 @@ with st.sidebar:
         format="%d%%",
     )
 
+    irradiance_provider_label = st.selectbox(
+        "Source d'irradiation",
+        options=list(IRRADIANCE_PROVIDER_LABELS),
+        index=list(IRRADIANCE_PROVIDER_LABELS.values()).index(
+            DEFAULT_IRRADIANCE_PROVIDER
+        ),
+        help=(
+            "Hors connexion, le profil est calculé localement par ciel clair : "
+            "la production obtenue est un majorant, sans nébulosité."
+        ),
+    )
+    irradiance_provider = IRRADIANCE_PROVIDER_LABELS[irradiance_provider_label]
+
+    pv_settings = {
+        "tilt": pv_tilt,
+        "aspect": pv_aspect,
+        "peak_power_kwp": pv_peak_kwp,
+        "losses_percent": pv_losses,
+        "provider": irradiance_provider,
+    }
+
+    # PVGIS est interrogé en tâche de fond dès maintenant, pendant la saisie
+    # des hypothèses tarifaires et économiques.
+    pvgis_request_args = None
+    pvgis_future = None
+
+    if selected_location is not None:
+        pvgis_request_args = pvgis_request(selected_location, pv_settings)
+        pvgis_future = prefetch_pvgis_profile(pvgis_request_args)
+
+        if pvgis_future.done() and pvgis_future.exception() is not None:
+            if st.button("Relancer la requête PVGIS", key="pvgis_retry"):
+                pvgis_future = prefetch_pvgis_profile(
+                    pvgis_request_args,
+                    retry=True,
+                )
+    pvgis_status = st.empty()
+
     st.caption(
         "Le lever et le coucher sont calculés pour chaque date à partir "
         "des coordonnées exactes. PVGIS estime automatiquement "
@@ -5553,6 +8359,13 @@ filtered_df = filter_period(
     start_date,
     end_date,
 )
+period_key = stage_fingerprint(
+    upload_key,
+    period_mode,
+    selected_year,
+    start_date,
+    end_date,
+)
 
 if filtered_df.empty:
     st.warning("Aucune donnée sur la période sélectionnée.")
@@ -5563,313 +8376,163 @@ if filtered_df.empty:
 # CALCULS
 # ============================================================
 
-hourly_df = build_hourly_data(filtered_df)
-daily_df = build_daily_data(filtered_df)
-monthly_df = build_monthly_data(filtered_df)
-weekday_hour_matrix = build_weekday_hour_matrix(hourly_df)
-date_hour_matrix = build_date_hour_matrix(hourly_df)
-
-filtered_df = add_tariff_categories(
-    filtered_df,
-    hc_ranges,
-)
-tariff_summary_df = build_tariff_summary(filtered_df)
-
-analysis_start = filtered_df["Horodate"].min()
-analysis_end = filtered_df["Horodate"].max()
-analysis_days = max(
-    (analysis_end - analysis_start).total_seconds() / 86400,
-    1,
-)
-coverage_ratio = min(analysis_days / 365.25, 1.0)
-
-tariff_score_data = calculate_tariff_optimization_score(
-    tariff_summary=tariff_summary_df,
-    daily_consumption=daily_df["Consommation_kWh"],
-    coverage_ratio=coverage_ratio,
-)
-
-tariff_values = tariff_summary_df.set_index(
-    "Categorie_tarifaire"
-)["Consommation_kWh"]
-
-hp_winter_kwh = float(tariff_values.get("HP hiver", 0))
-hc_winter_kwh = float(tariff_values.get("HC hiver", 0))
-hp_summer_kwh = float(tariff_values.get("HP été", 0))
-hc_summer_kwh = float(tariff_values.get("HC été", 0))
-
-total_kwh = filtered_df["Energie_kWh"].sum()
-average_daily_kwh = daily_df["Consommation_kWh"].mean()
-median_daily_kwh = daily_df["Consommation_kWh"].median()
-maximum_power_kw = filtered_df["Puissance_kW"].max()
-mean_power_kw = filtered_df["Puissance_kW"].mean()
-
-solar_analysis_available = selected_location is not None
-pvgis_available = False
-solar_error = None
-solar_daily_df = pd.DataFrame()
-
-daylight_kwh = np.nan
-daylight_share = np.nan
-solar_rows_count = 0
-solar_day_rows_count = 0
-solar_event_rows_count = 0
-solar_coherence_rate = np.nan
-production_period_kwh = np.nan
-production_period_share = np.nan
-pvgis_production_kwh = np.nan
-self_consumed_kwh = np.nan
-pv_surplus_kwh = np.nan
-grid_import_kwh = np.nan
-self_consumption_rate = np.nan
-self_sufficiency_rate = np.nan
-annual_yield_kwh_per_kwp = np.nan
-cma_score_data = {
-    "score": 0.0,
-    "label": "Non calculé",
-    "color": "#7B8794",
-    "overlap_score": 0.0,
-    "self_consumption_score": 0.0,
-    "self_sufficiency_score": 0.0,
-    "regularity_score": 0.0,
-    "solar_resource_score": 0.0,
-    "coefficient_variation": np.nan,
-}
-
-if solar_analysis_available:
-    try:
-        filtered_df = add_astronomical_solar_data(
-            filtered_df,
-            latitude=selected_location["latitude"],
-            longitude=selected_location["longitude"],
-        )
-
-        daylight_kwh = filtered_df.loc[
-            filtered_df["Soleil_leve"],
-            "Energie_kWh",
-        ].sum()
-
-        daylight_share = (
-            daylight_kwh / total_kwh * 100
-            if total_kwh
-            else 0
-        )
-
-        solar_rows_count = len(filtered_df)
-        solar_day_rows_count = int(
-            filtered_df["Soleil_leve"].sum()
-        )
-        solar_event_rows_count = int(
-            filtered_df["Lever_soleil"].notna().sum()
-        )
-        solar_coherence_rate = (
-            filtered_df["Controle_solaire_coherent"].mean() * 100
-            if solar_rows_count
-            else np.nan
-        )
-
-        try:
-            pvgis_profile, pvgis_metadata = (
-                fetch_pvgis_reference_profile(
-                    latitude=selected_location["latitude"],
-                    longitude=selected_location["longitude"],
-                    tilt=pv_tilt,
-                    aspect=pv_aspect,
-                    peak_power_kwp=pv_peak_kwp,
-                    losses_percent=pv_losses,
-                )
-            )
-
-            filtered_df = merge_pvgis_profile(
-                filtered_df,
-                pvgis_profile,
-            )
-            pvgis_available = True
-
-            production_active_mask = (
-                filtered_df["Production_PV_kW"].fillna(0) > 0
-            )
-
-            production_period_kwh = filtered_df.loc[
-                production_active_mask,
-                "Energie_kWh",
-            ].sum()
-
-            production_period_share = (
-                production_period_kwh / total_kwh * 100
-                if total_kwh
-                else 0
-            )
-
-            pvgis_production_kwh = filtered_df[
-                "Production_PV_kWh"
-            ].sum()
-
-            self_consumed_kwh = filtered_df[
-                "Autoconsommation_estimee_kWh"
-            ].sum()
-
-            self_consumption_rate = (
-                self_consumed_kwh / pvgis_production_kwh * 100
-                if pvgis_production_kwh
-                else 0
-            )
-
-            self_sufficiency_rate = (
-                self_consumed_kwh / total_kwh * 100
-                if total_kwh
-                else 0
-            )
-
-            pv_surplus_kwh = max(
-                pvgis_production_kwh - self_consumed_kwh,
-                0,
-            )
-
-            grid_import_kwh = max(
-                total_kwh - self_consumed_kwh,
-                0,
-            )
-
-            annual_yield_kwh_per_kwp = (
-                pvgis_production_kwh / pv_peak_kwp
-                if pv_peak_kwp
-                else np.nan
-            )
-
-            cma_score_data = calculate_cma_pv_score(
-                production_period_share=production_period_share,
-                self_consumption_rate=self_consumption_rate,
-                self_sufficiency_rate=self_sufficiency_rate,
-                daily_consumption=daily_df["Consommation_kWh"],
-                annual_yield_kwh_per_kwp=annual_yield_kwh_per_kwp,
-            )
-
-            solar_daily_df = build_daily_solar_summary(
-                filtered_df
-            )
-
-        except Exception as exc:
-            solar_error = (
-                "Les heures de lever/coucher ont été calculées, "
-                f"mais PVGIS n'a pas pu être interrogé : {exc}"
-            )
-
-    except Exception as exc:
-        solar_analysis_available = False
-        solar_error = f"Analyse solaire impossible : {exc}"
-
-analysis_duration_years = max(
-    analysis_days / 365.25,
-    1 / 365.25,
-)
-
-connection_data = calculate_connection_cost(
-    peak_power_kwp=pv_peak_kwp,
-    connection_mode=connection_mode,
-    public_extension_length_m=public_extension_length_m,
-    private_trench_length_m=private_trench_length_m,
-    apply_enedis_reduction=apply_enedis_reduction,
-    include_private_hta_post=include_private_hta_post,
-    include_decoupling_cell=include_decoupling_cell,
-)
-
-investment_data = calculate_investment_costs(
-    peak_power_kwp=pv_peak_kwp,
-    fixing_type=fixing_type,
-    erp_icpe_surcharge=erp_icpe_surcharge,
-    structural_study_cost=structural_study_cost,
-    roof_renovation_enabled=roof_renovation_enabled,
-    roof_type=roof_type,
-    roof_area_m2=roof_area_m2,
-    asbestos_removal_enabled=asbestos_removal_enabled,
-    connection_data=connection_data,
-    other_investment_costs=other_investment_costs,
-    grant_amount=grant_amount,
-)
-
-electricity_prices = tariff_price_map(
-    tariff_type=electricity_tariff_type,
-    unique_price=unique_electricity_price,
-    hp_price=hp_electricity_price,
-    hc_price=hc_electricity_price,
-    hp_winter_price=hp_winter_electricity_price,
-    hc_winter_price=hc_winter_electricity_price,
-    hp_summer_price=hp_summer_electricity_price,
-    hc_summer_price=hc_summer_electricity_price,
-)
-
-energy_value_data = calculate_energy_value(
-    df=filtered_df,
-    price_map=electricity_prices,
-    surplus_sale_price=surplus_sale_price_eur_kwh,
-    annual_subscription=annual_subscription_eur,
-    analysis_years=analysis_duration_years,
-)
-
-operating_cost_data = calculate_annual_operating_costs(
-    peak_power_kwp=pv_peak_kwp,
-    investment_gross=investment_data["gross_total"],
-    insurance_rate_percent=insurance_rate_percent,
-    maintenance_eur_kwp=maintenance_eur_kwp,
-    inverter_provision_eur_kwp=inverter_provision_eur_kwp,
-    ifer_rate_eur_kwp=ifer_rate_eur_kwp,
-    other_annual_costs=other_annual_costs,
-)
-
-financial_projection = build_financial_projection(
-    net_investment=investment_data["net_total"],
-    annual_self_consumption_saving=(
-        energy_value_data["annual_self_consumption_saving"]
-    ),
-    annual_surplus_revenue=(
-        energy_value_data["annual_surplus_revenue"]
-    ),
-    annual_operating_cost=operating_cost_data["total"],
-    horizon_years=financial_horizon_years,
-    electricity_price_increase_percent=(
-        electricity_price_increase_percent
-    ),
-    surplus_price_increase_percent=(
-        surplus_price_increase_percent
-    ),
-    production_degradation_percent=(
-        production_degradation_percent
-    ),
-    operating_cost_increase_percent=(
-        operating_cost_increase_percent
-    ),
-    discount_rate_percent=discount_rate_percent,
-)
-
-business_assistant = build_cma_business_assistant(
-    daylight_share=daylight_share,
-    production_period_share=production_period_share,
-    self_consumption_rate=self_consumption_rate,
-    self_sufficiency_rate=self_sufficiency_rate,
-    pv_surplus_kwh=pv_surplus_kwh,
-    pvgis_production_kwh=pvgis_production_kwh,
-    cma_score_data=cma_score_data,
-    tariff_score_data=tariff_score_data,
-    investment_data=investment_data,
-    operating_cost_data=operating_cost_data,
-    financial_projection=financial_projection,
-    roof_renovation_enabled=roof_renovation_enabled,
-    asbestos_removal_enabled=asbestos_removal_enabled,
-    connection_data=connection_data,
-    coverage_ratio=coverage_ratio,
+(
+    calculation_values,
+    calculation_fingerprints,
+    calculation_timings,
+) = run_calculation_graph(
+    CALCULATION_GRAPH,
+    params={
+        "period_df": filtered_df,
+        "period_key": period_key,
+        "time_step": time_step,
+        "hc_ranges": hc_ranges,
+        "selected_location": selected_location,
+        "pv_settings": pv_settings,
+        "pvgis_future": pvgis_future,
+        "investment_settings": {
+            "peak_power_kwp": pv_peak_kwp,
+            "connection": {
+                "connection_mode": connection_mode,
+                "public_extension_length_m": public_extension_length_m,
+                "private_trench_length_m": private_trench_length_m,
+                "apply_enedis_reduction": apply_enedis_reduction,
+                "include_private_hta_post": include_private_hta_post,
+                "include_decoupling_cell": include_decoupling_cell,
+            },
+            "investment": {
+                "fixing_type": fixing_type,
+                "erp_icpe_surcharge": erp_icpe_surcharge,
+                "structural_study_cost": structural_study_cost,
+                "roof_renovation_enabled": roof_renovation_enabled,
+                "roof_type": roof_type,
+                "roof_area_m2": roof_area_m2,
+                "asbestos_removal_enabled": asbestos_removal_enabled,
+                "other_investment_costs": other_investment_costs,
+                "grant_amount": grant_amount,
+            },
+            "operating": {
+                "insurance_rate_percent": insurance_rate_percent,
+                "maintenance_eur_kwp": maintenance_eur_kwp,
+                "inverter_provision_eur_kwp": inverter_provision_eur_kwp,
+                "ifer_rate_eur_kwp": ifer_rate_eur_kwp,
+                "other_annual_costs": other_annual_costs,
+            },
+        },
+        "price_settings": {
+            "tariff_type": electricity_tariff_type,
+            "unique_price": unique_electricity_price,
+            "hp_price": hp_electricity_price,
+            "hc_price": hc_electricity_price,
+            "hp_winter_price": hp_winter_electricity_price,
+            "hc_winter_price": hc_winter_electricity_price,
+            "hp_summer_price": hp_summer_electricity_price,
+            "hc_summer_price": hc_summer_electricity_price,
+        },
+        "sale_settings": {
+            "surplus_sale_price": surplus_sale_price_eur_kwh,
+            "annual_subscription": annual_subscription_eur,
+        },
+        "projection_settings": {
+            "horizon_years": financial_horizon_years,
+            "electricity_price_increase_percent": (
+                electricity_price_increase_percent
+            ),
+            "surplus_price_increase_percent": surplus_price_increase_percent,
+            "production_degradation_percent": production_degradation_percent,
+            "operating_cost_increase_percent": operating_cost_increase_percent,
+            "discount_rate_percent": discount_rate_percent,
+        },
+        "assistant_settings": {
+            "roof_renovation_enabled": roof_renovation_enabled,
+            "asbestos_removal_enabled": asbestos_removal_enabled,
+        },
+    },
+    state=st.session_state.setdefault("calculation_graph", {}),
+    param_keys={
+        "period_df": period_key,
+        # Le nœud PVGIS est réévalué quand la requête préchargée aboutit.
+        "pvgis_future": stage_fingerprint(
+            pvgis_request_args,
+            pvgis_future is not None and pvgis_future.done(),
+        ),
+    },
 )
 
-load_factor = (
-    mean_power_kw / maximum_power_kw * 100
-    if maximum_power_kw
-    else 0
-)
+with st.sidebar.expander("⏱ Coût du dernier calcul"):
+    timings_df = pd.DataFrame(calculation_timings)
+    st.dataframe(
+        timings_df.style.format({"Durée (ms)": "{:.1f}"}),
+        use_container_width=True,
+        hide_index=True,
+    )
+    st.caption(
+        f"{(timings_df['Statut'] == 'Recalculé').sum()} nœud(s) recalculé(s) "
+        f"en {timings_df['Durée (ms)'].sum():.0f} ms."
+    )
+
+hourly_stage = calculation_values["hourly"]
+hourly_df = hourly_stage["hourly"]
+weekday_hour_matrix = hourly_stage["weekday_hour_matrix"]
+date_hour_matrix = hourly_stage["date_hour_matrix"]
+daily_df = calculation_values["daily"]["daily"]
+monthly_df = calculation_values["daily"]["monthly"]
+
+indicators = calculation_values["indicators"]
+analysis_days = indicators["analysis_days"]
+coverage_ratio = indicators["coverage_ratio"]
+analysis_duration_years = indicators["analysis_duration_years"]
+total_kwh = indicators["total_kwh"]
+average_daily_kwh = indicators["average_daily_kwh"]
+median_daily_kwh = indicators["median_daily_kwh"]
+maximum_power_kw = indicators["maximum_power_kw"]
+mean_power_kw = indicators["mean_power_kw"]
+load_factor = indicators["load_factor"]
+
+tariff_stage = calculation_values["tariff"]
+tariff_summary_df = tariff_stage["summary"]
+tariff_score_data = tariff_stage["score_data"]
+hp_winter_kwh = tariff_stage["hp_winter_kwh"]
+hc_winter_kwh = tariff_stage["hc_winter_kwh"]
+hp_summer_kwh = tariff_stage["hp_summer_kwh"]
+hc_summer_kwh = tariff_stage["hc_summer_kwh"]
+
+solar_stage = calculation_values["solar"]
+solar_analysis_available = solar_stage["available"]
+daylight_kwh = solar_stage["daylight_kwh"]
+daylight_share = solar_stage["daylight_share"]
+solar_rows_count = solar_stage["rows_count"]
+solar_day_rows_count = solar_stage["day_rows_count"]
+solar_event_rows_count = solar_stage["event_rows_count"]
+solar_coherence_rate = solar_stage["coherence_rate"]
+
+# Tableau détaillé le plus enrichi : tarif, puis soleil et PVGIS si connus.
+pvgis_stage = calculation_values["pvgis"]
+filtered_df = pvgis_stage["frame"]
+pvgis_available = pvgis_stage["available"]
+solar_error = pvgis_stage["error"]
+pvgis_pending = pvgis_stage["pending"]
+production_period_kwh = pvgis_stage["production_period_kwh"]
+production_period_share = pvgis_stage["production_period_share"]
+pvgis_production_kwh = pvgis_stage["pvgis_production_kwh"]
+self_consumed_kwh = pvgis_stage["self_consumed_kwh"]
+pv_surplus_kwh = pvgis_stage["pv_surplus_kwh"]
+grid_import_kwh = pvgis_stage["grid_import_kwh"]
+self_consumption_rate = pvgis_stage["self_consumption_rate"]
+self_sufficiency_rate = pvgis_stage["self_sufficiency_rate"]
+annual_yield_kwh_per_kwp = pvgis_stage["annual_yield_kwh_per_kwp"]
+cma_score_data = pvgis_stage["cma_score_data"]
+solar_daily_df = pvgis_stage["solar_daily_df"]
+
+connection_data = calculation_values["investment"]["connection_data"]
+investment_data = calculation_values["investment"]["investment_data"]
+operating_cost_data = calculation_values["investment"]["operating_cost_data"]
+energy_value_data = calculation_values["energy_value"]["energy_value_data"]
+financial_projection = calculation_values["projection"]
+business_assistant = calculation_values["assistant"]
+
+quality_report_df, quality_metrics = calculation_values["quality"]
 
-quality_report_df, quality_metrics = build_quality_report(
-    filtered_df,
-    time_step,
-)
 
 duplicate_count = quality_metrics["duplicate_count_non_dst"]
 expected_points_per_day = quality_metrics["expected_points_per_day"]
@@ -6020,9 +8683,8 @@ with nav_report:
         "par AutoCal-Sol. Les heures absentes sont automatiquement renseignées à 0 W."
     )
 
-    autocalsol_reference = add_consumption_period_columns(enriched_df)
     autocalsol_years = sorted(
-        autocalsol_reference["Horodate_debut"].dropna().dt.year.unique().astype(int).tolist()
+        enriched_df["Annee_conso"].dropna().unique().astype(int).tolist()
     )
     autocalsol_default_year = (
         int(selected_year)
@@ -6036,559 +8698,529 @@ with nav_report:
         key="autocalsol_export_year",
     )
 
-    autocalsol_df, autocalsol_missing_hours = build_autocalsol_export(
-        enriched_df,
-        int(autocalsol_year),
-    )
-    autocalsol_excel = make_autocalsol_excel(autocalsol_df)
-
-    auto_info1, auto_info2, auto_info3 = st.columns(3)
-    with auto_info1:
-        st.metric("Année", str(autocalsol_year))
-    with auto_info2:
-        st.metric("Lignes horaires", f"{len(autocalsol_df):,}".replace(",", " "))
-    with auto_info3:
-        st.metric("Heures complétées à 0", autocalsol_missing_hours)
-
-    st.download_button(
-        "⬇️ Exporter la courbe de charge pour AutoCal-Sol",
-        data=autocalsol_excel,
-        file_name=f"courbe_charge_autocalsol_{autocalsol_year}.xlsx",
-        mime=(
-            "application/vnd.openxmlformats-officedocument."
-            "spreadsheetml.sheet"
-        ),
-        use_container_width=True,
-        key="download_autocalsol_excel",
-    )
+    def build_autocalsol_artifact() -> dict:
+        autocalsol_df, autocalsol_missing_hours = build_autocalsol_export(
+            enriched_df,
+            int(autocalsol_year),
+        )
+        return {
+            "data": make_autocalsol_excel(autocalsol_df),
+            "rows": len(autocalsol_df),
+            "missing_hours": autocalsol_missing_hours,
+        }
+
+    autocalsol_artifact = on_demand_artifact(
+        "autocalsol_export",
+        stage_fingerprint(upload_key, autocalsol_year),
+        build_autocalsol_artifact,
+        "⚙️ Préparer l'export AutoCal-Sol",
+    )
+
+    if autocalsol_artifact is not None:
+        auto_info1, auto_info2, auto_info3 = st.columns(3)
+        with auto_info1:
+            st.metric("Année", str(autocalsol_year))
+        with auto_info2:
+            st.metric(
+                "Lignes horaires",
+                f"{autocalsol_artifact['rows']:,}".replace(",", " "),
+            )
+        with auto_info3:
+            st.metric(
+                "Heures complétées à 0",
+                autocalsol_artifact["missing_hours"],
+            )
+
+        st.download_button(
+            "⬇️ Exporter la courbe de charge pour AutoCal-Sol",
+            data=autocalsol_artifact["data"],
+            file_name=f"courbe_charge_autocalsol_{autocalsol_year}.xlsx",
+            mime=(
+                "application/vnd.openxmlformats-officedocument."
+                "spreadsheetml.sheet"
+            ),
+            use_container_width=True,
+            key="download_autocalsol_excel",
+        )
 
     st.markdown("---")
     st.markdown("### Exports complets CMA")
 
-    summary_df = pd.DataFrame(
-        {
-            "Indicateur": [
-                "Nom de l'entreprise",
-                "SIRET",
-                "Conseiller CMA",
-                "Date du diagnostic",
-                "Fichier source",
-                "Début de période",
-                "Fin de période",
-                "Pas de temps source",
-                "Pas de temps après traitement",
-                "Unité source",
-                "Consommation totale (kWh)",
-                "Moyenne journalière (kWh)",
-                "Médiane journalière (kWh)",
-                "Pic de puissance (kW)",
-                "Adresse de l'entreprise",
-                "Latitude",
-                "Longitude",
-                "Part de consommation pendant le jour (%)",
-                "Part de consommation pendant la production PV (%)",
-                "Puissance photovoltaïque étudiée (kWc)",
-                "Production PVGIS estimée (kWh)",
-                "Énergie solaire autoconsommée estimée (kWh)",
-                "Surplus photovoltaïque estimé (kWh)",
-                "Électricité restant achetée au réseau (kWh)",
-                "Taux d'autoconsommation estimé (%)",
-                "Taux d'autoproduction estimé (%)",
-                "Indice photovoltaïque CMA (/100)",
-                "Appréciation de l'indice CMA",
-                "Score correspondance usages / production (/100)",
-                "Score autoconsommation (/100)",
-                "Score autoproduction (/100)",
-                "Score régularité des consommations (/100)",
-                "Score potentiel solaire local (/100)",
-                "Productible estimé (kWh/kWc)",
-                "HP hiver (kWh)",
-                "HC hiver (kWh)",
-                "HP été (kWh)",
-                "HC été (kWh)",
-                "Part totale HP (%)",
-                "Part totale HC (%)",
-                "Indice optimisation tarifaire CMA (/100)",
-                "Appréciation indice tarifaire",
-                "Investissement brut estimé (€ HT)",
-                "Investissement net estimé (€ HT)",
-                "Charges annuelles estimées (€ HT/an)",
-                "Économie autoconsommation annuelle (€ HT)",
-                "Revenu surplus annuel (€ HT)",
-                "Gain net année 1 (€ HT)",
-                "Temps de retour simple (années)",
-                "VAN du projet (€)",
-                "TRI estimé (%)",
-                "Gain net cumulé sur l'horizon (€)",
-                "Synthèse assistant CMA",
-                "Statut assistant CMA",
-                "Facteur de charge (%)",
-                "Horodatages en doublon",
-                "Jours atypiques",
-            ],
-            "Valeur": [
-                company_name,
-                company_siret,
-                advisor_name,
-                diagnostic_date.strftime("%d/%m/%Y"),
-                uploaded_file.name,
-                filtered_df["Horodate"].min(),
-                filtered_df["Horodate"].max(),
-                str(time_step),
-                "01:00:00",
-                source_unit,
-                total_kwh,
-                average_daily_kwh,
-                median_daily_kwh,
-                maximum_power_kw,
-                (
-                    selected_location["label"]
-                    if selected_location
-                    else ""
-                ),
-                (
-                    selected_location["latitude"]
-                    if selected_location
-                    else ""
-                ),
-                (
-                    selected_location["longitude"]
-                    if selected_location
-                    else ""
-                ),
-                (
-                    daylight_share
-                    if solar_analysis_available
-                    else ""
-                ),
-                (
-                    production_period_share
-                    if pvgis_available
-                    else ""
-                ),
-                pv_peak_kwp,
-                (
-                    pvgis_production_kwh
-                    if pvgis_available
-                    else ""
-                ),
-                (
-                    self_consumed_kwh
-                    if pvgis_available
-                    else ""
-                ),
-                (
-                    pv_surplus_kwh
-                    if pvgis_available
-                    else ""
-                ),
-                (
-                    grid_import_kwh
-                    if pvgis_available
-                    else ""
-                ),
-                (
-                    self_consumption_rate
-                    if pvgis_available
-                    else ""
-                ),
-                (
-                    self_sufficiency_rate
-                    if pvgis_available
-                    else ""
-                ),
-                (
-                    cma_score_data["score"]
-                    if pvgis_available
-                    else ""
-                ),
-                (
-                    cma_score_data["label"]
-                    if pvgis_available
-                    else ""
-                ),
-                (
-                    cma_score_data["overlap_score"]
-                    if pvgis_available
-                    else ""
-                ),
-                (
-                    cma_score_data["self_consumption_score"]
-                    if pvgis_available
-                    else ""
-                ),
-                (
-                    cma_score_data["self_sufficiency_score"]
-                    if pvgis_available
-                    else ""
-                ),
-                (
-                    cma_score_data["regularity_score"]
-                    if pvgis_available
-                    else ""
-                ),
-                (
-                    cma_score_data["solar_resource_score"]
-                    if pvgis_available
-                    else ""
-                ),
-                (
-                    annual_yield_kwh_per_kwp
-                    if pvgis_available
-                    else ""
-                ),
-                hp_winter_kwh,
-                hc_winter_kwh,
-                hp_summer_kwh,
-                hc_summer_kwh,
-                tariff_score_data["hp_share"],
-                tariff_score_data["hc_share"],
-                tariff_score_data["score"],
-                tariff_score_data["label"],
-                investment_data["gross_total"],
-                investment_data["net_total"],
-                operating_cost_data["total"],
-                energy_value_data["annual_self_consumption_saving"],
-                energy_value_data["annual_surplus_revenue"],
-                financial_projection["annual_net_gain_year_1"],
-                (
-                    financial_projection["payback_year"]
-                    if not pd.isna(financial_projection["payback_year"])
-                    else ""
-                ),
-                financial_projection["npv"],
-                (
-                    financial_projection["irr"] * 100
-                    if not pd.isna(financial_projection["irr"])
-                    else ""
-                ),
-                financial_projection["total_net_gain"],
-                business_assistant["conclusion"],
-                business_assistant["status"],
-                load_factor,
-                duplicate_count,
-                len(atypical_days),
-            ],
-        }
+    daily_export = daily_df.copy()
+    daily_export["Date"] = (
+        daily_export["Date"]
+        .dt.strftime("%d/%m/%Y")
+    )
+
+    logo_candidates = [
+        Path("logo_cma.png"),
+        Path("logo_cma.jpg"),
+        Path("assets/logo_cma.png"),
+        Path("assets/logo_cma.jpg"),
+    ]
+    report_logo_path = next(
+        (path for path in logo_candidates if path.exists()),
+        None,
     )
 
-    # Export principal obligatoirement normalisé à un pas horaire.
-    # Les relevés de 30 minutes sont agrégés dans hourly_df :
-    # - moyenne pour une unité de puissance (W / kW) ;
-    # - somme pour une unité d'énergie (Wh / kWh).
-    hourly_standardized_export = hourly_df.copy()
+    report_key = stage_fingerprint(
+        *calculation_fingerprints.values(),
+        source_filename,
+        company_name,
+        company_siret,
+        advisor_name,
+        diagnostic_date,
+        report_logo_path,
+    )
 
-    if solar_analysis_available:
-        solar_hourly_columns = [
-            "Horodate",
-            "Lever_soleil",
-            "Coucher_soleil",
-            "Hauteur_soleil_deg",
-        ]
+    def build_full_excel_artifact() -> dict:
+        summary_df = pd.DataFrame(
+            {
+                "Indicateur": [
+                    "Nom de l'entreprise",
+                    "SIRET",
+                    "Conseiller CMA",
+                    "Date du diagnostic",
+                    "Fichier source",
+                    "Début de période",
+                    "Fin de période",
+                    "Pas de temps source",
+                    "Pas de temps après traitement",
+                    "Unité source",
+                    "Consommation totale (kWh)",
+                    "Moyenne journalière (kWh)",
+                    "Médiane journalière (kWh)",
+                    "Pic de puissance (kW)",
+                    "Adresse de l'entreprise",
+                    "Latitude",
+                    "Longitude",
+                    "Part de consommation pendant le jour (%)",
+                    "Part de consommation pendant la production PV (%)",
+                    "Puissance photovoltaïque étudiée (kWc)",
+                    "Production PVGIS estimée (kWh)",
+                    "Énergie solaire autoconsommée estimée (kWh)",
+                    "Surplus photovoltaïque estimé (kWh)",
+                    "Électricité restant achetée au réseau (kWh)",
+                    "Taux d'autoconsommation estimé (%)",
+                    "Taux d'autoproduction estimé (%)",
+                    "Indice photovoltaïque CMA (/100)",
+                    "Appréciation de l'indice CMA",
+                    "Score correspondance usages / production (/100)",
+                    "Score autoconsommation (/100)",
+                    "Score autoproduction (/100)",
+                    "Score régularité des consommations (/100)",
+                    "Score potentiel solaire local (/100)",
+                    "Productible estimé (kWh/kWc)",
+                    "HP hiver (kWh)",
+                    "HC hiver (kWh)",
+                    "HP été (kWh)",
+                    "HC été (kWh)",
+                    "Part totale HP (%)",
+                    "Part totale HC (%)",
+                    "Indice optimisation tarifaire CMA (/100)",
+                    "Appréciation indice tarifaire",
+                    "Investissement brut estimé (€ HT)",
+                    "Investissement net estimé (€ HT)",
+                    "Charges annuelles estimées (€ HT/an)",
+                    "Économie autoconsommation annuelle (€ HT)",
+                    "Revenu surplus annuel (€ HT)",
+                    "Gain net année 1 (€ HT)",
+                    "Temps de retour simple (années)",
+                    "VAN du projet (€)",
+                    "TRI estimé (%)",
+                    "Gain net cumulé sur l'horizon (€)",
+                    "Synthèse assistant CMA",
+                    "Statut assistant CMA",
+                    "Facteur de charge (%)",
+                    "Horodatages en doublon",
+                    "Jours atypiques",
+                ],
+                "Valeur": [
+                    company_name,
+                    company_siret,
+                    advisor_name,
+                    diagnostic_date.strftime("%d/%m/%Y"),
+                    source_filename,
+                    filtered_df["Horodate"].min(),
+                    filtered_df["Horodate"].max(),
+                    str(time_step),
+                    "01:00:00",
+                    source_unit,
+                    total_kwh,
+                    average_daily_kwh,
+                    median_daily_kwh,
+                    maximum_power_kw,
+                    (
+                        selected_location["label"]
+                        if selected_location
+                        else ""
+                    ),
+                    (
+                        selected_location["latitude"]
+                        if selected_location
+                        else ""
+                    ),
+                    (
+                        selected_location["longitude"]
+                        if selected_location
+                        else ""
+                    ),
+                    (
+                        daylight_share
+                        if solar_analysis_available
+                        else ""
+                    ),
+                    (
+                        production_period_share
+                        if pvgis_available
+                        else ""
+                    ),
+                    pv_peak_kwp,
+                    (
+                        pvgis_production_kwh
+                        if pvgis_available
+                        else ""
+                    ),
+                    (
+                        self_consumed_kwh
+                        if pvgis_available
+                        else ""
+                    ),
+                    (
+                        pv_surplus_kwh
+                        if pvgis_available
+                        else ""
+                    ),
+                    (
+                        grid_import_kwh
+                        if pvgis_available
+                        else ""
+                    ),
+                    (
+                        self_consumption_rate
+                        if pvgis_available
+                        else ""
+                    ),
+                    (
+                        self_sufficiency_rate
+                        if pvgis_available
+                        else ""
+                    ),
+                    (
+                        cma_score_data["score"]
+                        if pvgis_available
+                        else ""
+                    ),
+                    (
+                        cma_score_data["label"]
+                        if pvgis_available
+                        else ""
+                    ),
+                    (
+                        cma_score_data["overlap_score"]
+                        if pvgis_available
+                        else ""
+                    ),
+                    (
+                        cma_score_data["self_consumption_score"]
+                        if pvgis_available
+                        else ""
+                    ),
+                    (
+                        cma_score_data["self_sufficiency_score"]
+                        if pvgis_available
+                        else ""
+                    ),
+                    (
+                        cma_score_data["regularity_score"]
+                        if pvgis_available
+                        else ""
+                    ),
+                    (
+                        cma_score_data["solar_resource_score"]
+                        if pvgis_available
+                        else ""
+                    ),
+                    (
+                        annual_yield_kwh_per_kwp
+                        if pvgis_available
+                        else ""
+                    ),
+                    hp_winter_kwh,
+                    hc_winter_kwh,
+                    hp_summer_kwh,
+                    hc_summer_kwh,
+                    tariff_score_data["hp_share"],
+                    tariff_score_data["hc_share"],
+                    tariff_score_data["score"],
+                    tariff_score_data["label"],
+                    investment_data["gross_total"],
+                    investment_data["net_total"],
+                    operating_cost_data["total"],
+                    energy_value_data["annual_self_consumption_saving"],
+                    energy_value_data["annual_surplus_revenue"],
+                    financial_projection["annual_net_gain_year_1"],
+                    (
+                        financial_projection["payback_year"]
+                        if not pd.isna(financial_projection["payback_year"])
+                        else ""
+                    ),
+                    financial_projection["npv"],
+                    (
+                        financial_projection["irr"] * 100
+                        if not pd.isna(financial_projection["irr"])
+                        else ""
+                    ),
+                    financial_projection["total_net_gain"],
+                    business_assistant["conclusion"],
+                    business_assistant["status"],
+                    load_factor,
+                    duplicate_count,
+                    len(atypical_days),
+                ],
+            }
+        )
 
-        if pvgis_available:
-            solar_hourly_columns += [
-                "Irradiation_Wm2",
-                "Production_PV_kW",
-                "Production_PV_kWh",
-                "Autoconsommation_estimee_kWh",
-            ]
+        # Export principal obligatoirement normalisé à un pas horaire.
+        # Les relevés de 30 minutes sont agrégés dans hourly_df :
+        # - moyenne pour une unité de puissance (W / kW) ;
+        # - somme pour une unité d'énergie (Wh / kWh).
+        hourly_standardized_export = hourly_df.copy()
 
-        solar_hourly_export = filtered_df.copy()
-        solar_hourly_export["Horodate_heure"] = (
-            solar_hourly_export["Horodate"].dt.ceil("h")
-        )
+        if solar_analysis_available:
+            solar_hourly_columns = [
+                "Horodate",
+                "Lever_soleil",
+                "Coucher_soleil",
+                "Hauteur_soleil_deg",
+            ]
 
-        aggregations = {
-            "Lever_soleil": "first",
-            "Coucher_soleil": "first",
-            "Hauteur_soleil_deg": "mean",
-        }
+            if pvgis_available:
+                solar_hourly_columns += [
+                    "Irradiation_Wm2",
+                    "Production_PV_kW",
+                    "Production_PV_kWh",
+                    "Autoconsommation_estimee_kWh",
+                ]
 
-        if pvgis_available:
-            aggregations.update(
-                {
-                    "Irradiation_Wm2": "mean",
-                    "Production_PV_kW": "mean",
-                    "Production_PV_kWh": "sum",
-                    "Autoconsommation_estimee_kWh": "sum",
-                }
+            solar_hourly_export = filtered_df.copy()
+            solar_hourly_export["Horodate_heure"] = (
+                solar_hourly_export["Horodate"].dt.ceil("h")
             )
 
-        solar_hourly_export = (
-            solar_hourly_export.groupby(
-                "Horodate_heure",
-                as_index=False,
-            )
-            .agg(aggregations)
-            .rename(
-                columns={"Horodate_heure": "Horodate"}
+            aggregations = {
+                "Lever_soleil": "first",
+                "Coucher_soleil": "first",
+                "Hauteur_soleil_deg": "mean",
+            }
+
+            if pvgis_available:
+                aggregations.update(
+                    {
+                        "Irradiation_Wm2": "mean",
+                        "Production_PV_kW": "mean",
+                        "Production_PV_kWh": "sum",
+                        "Autoconsommation_estimee_kWh": "sum",
+                    }
+                )
+
+            solar_hourly_export = (
+                solar_hourly_export.groupby(
+                    "Horodate_heure",
+                    as_index=False,
+                )
+                .agg(aggregations)
+                .rename(
+                    columns={"Horodate_heure": "Horodate"}
+                )
             )
-        )
 
-        hourly_standardized_export = (
-            hourly_standardized_export.merge(
-                solar_hourly_export,
-                on="Horodate",
-                how="left",
+            hourly_standardized_export = (
+                hourly_standardized_export.merge(
+                    solar_hourly_export,
+                    on="Horodate",
+                    how="left",
+                )
             )
-        )
 
-    normalized_unit = str(source_unit).lower().replace(" ", "")
+        normalized_unit = str(source_unit).lower().replace(" ", "")
 
-    if normalized_unit in {"w", "watt", "watts"}:
-        hourly_standardized_export["Valeur"] = (
-            hourly_standardized_export["Puissance_kW"] * 1000
-        )
-        export_unit = "W"
-    elif normalized_unit in {"kw", "kilowatt", "kilowatts"}:
-        hourly_standardized_export["Valeur"] = (
-            hourly_standardized_export["Puissance_kW"]
-        )
-        export_unit = "kW"
-    elif normalized_unit in {"kwh", "kw.h"}:
-        hourly_standardized_export["Valeur"] = (
-            hourly_standardized_export["Energie_kWh"]
+        if normalized_unit in {"w", "watt", "watts"}:
+            hourly_standardized_export["Valeur"] = (
+                hourly_standardized_export["Puissance_kW"] * 1000
+            )
+            export_unit = "W"
+        elif normalized_unit in {"kw", "kilowatt", "kilowatts"}:
+            hourly_standardized_export["Valeur"] = (
+                hourly_standardized_export["Puissance_kW"]
+            )
+            export_unit = "kW"
+        elif normalized_unit in {"kwh", "kw.h"}:
+            hourly_standardized_export["Valeur"] = (
+                hourly_standardized_export["Energie_kWh"]
+            )
+            export_unit = "kWh"
+        else:
+            hourly_standardized_export["Valeur"] = (
+                hourly_standardized_export["Energie_kWh"] * 1000
+            )
+            export_unit = "Wh"
+
+        hourly_standardized_export.insert(0, "Unité", export_unit)
+        hourly_standardized_export["Pas"] = "PT60M"
+        hourly_standardized_export["Horodate"] = (
+            hourly_standardized_export["Horodate"]
+            .dt.strftime("%d/%m/%Y %H:%M:%S")
         )
-        export_unit = "kWh"
-    else:
-        hourly_standardized_export["Valeur"] = (
-            hourly_standardized_export["Energie_kWh"] * 1000
-        )
-        export_unit = "Wh"
-
-    hourly_standardized_export.insert(0, "Unité", export_unit)
-    hourly_standardized_export["Pas"] = "PT60M"
-    hourly_standardized_export["Horodate"] = (
-        hourly_standardized_export["Horodate"]
-        .dt.strftime("%d/%m/%Y %H:%M:%S")
-    )
-    export_columns = [
-        "Unité",
-        "Horodate",
-        "Valeur",
-        "Pas",
-    ]
+        export_columns = [
+            "Unité",
+            "Horodate",
+            "Valeur",
+            "Pas",
+        ]
 
-    optional_solar_columns = [
-        "Lever_soleil",
-        "Coucher_soleil",
-        "Hauteur_soleil_deg",
-        "Irradiation_Wm2",
-        "Production_PV_kW",
-        "Production_PV_kWh",
-        "Autoconsommation_estimee_kWh",
-    ]
+        optional_solar_columns = [
+            "Lever_soleil",
+            "Coucher_soleil",
+            "Hauteur_soleil_deg",
+            "Irradiation_Wm2",
+            "Production_PV_kW",
+            "Production_PV_kWh",
+            "Autoconsommation_estimee_kWh",
+        ]
 
-    export_columns += [
-        column
-        for column in optional_solar_columns
-        if column in hourly_standardized_export.columns
-    ]
+        export_columns += [
+            column
+            for column in optional_solar_columns
+            if column in hourly_standardized_export.columns
+        ]
 
-    hourly_standardized_export = hourly_standardized_export[
-        export_columns
-    ]
+        hourly_standardized_export = hourly_standardized_export[
+            export_columns
+        ]
 
-    hourly_export = hourly_df.copy()
-    hourly_export["Horodate"] = (
-        hourly_export["Horodate"]
-        .dt.strftime("%d/%m/%Y %H:%M:%S")
-    )
+        hourly_export = hourly_df.copy()
+        hourly_export["Horodate"] = (
+            hourly_export["Horodate"]
+            .dt.strftime("%d/%m/%Y %H:%M:%S")
+        )
 
-    daily_export = daily_df.copy()
-    daily_export["Date"] = (
-        daily_export["Date"]
-        .dt.strftime("%d/%m/%Y")
-    )
+        monthly_export = monthly_df.copy()
+        monthly_export["Mois_date"] = (
+            monthly_export["Mois_date"]
+            .dt.strftime("%m/%Y")
+        )
 
-    monthly_export = monthly_df.copy()
-    monthly_export["Mois_date"] = (
-        monthly_export["Mois_date"]
-        .dt.strftime("%m/%Y")
-    )
+        tariff_summary_export = tariff_summary_df.copy()
 
-    tariff_summary_export = tariff_summary_df.copy()
+        tariff_detail_export = filtered_df[
+            [
+                "Horodate",
+                "Horodate_tarif",
+                "Energie_kWh",
+                "Saison_tarifaire",
+                "Plage_tarifaire",
+                "Categorie_tarifaire",
+            ]
+        ].copy()
 
-    tariff_detail_export = filtered_df[
-        [
-            "Horodate",
-            "Horodate_tarif",
-            "Energie_kWh",
-            "Saison_tarifaire",
-            "Plage_tarifaire",
-            "Categorie_tarifaire",
-        ]
-    ].copy()
+        tariff_detail_export["Horodate"] = (
+            tariff_detail_export["Horodate"]
+            .dt.strftime("%d/%m/%Y %H:%M:%S")
+        )
+        tariff_detail_export["Horodate_tarif"] = (
+            tariff_detail_export["Horodate_tarif"]
+            .dt.strftime("%d/%m/%Y %H:%M:%S")
+        )
 
-    tariff_detail_export["Horodate"] = (
-        tariff_detail_export["Horodate"]
-        .dt.strftime("%d/%m/%Y %H:%M:%S")
-    )
-    tariff_detail_export["Horodate_tarif"] = (
-        tariff_detail_export["Horodate_tarif"]
-        .dt.strftime("%d/%m/%Y %H:%M:%S")
-    )
+        financial_summary_export = pd.DataFrame(
+            {
+                "Indicateur": [
+                    "Puissance étudiée (kWc)",
+                    "Type de fixation",
+                    "Coût équipements + pose (€/Wc)",
+                    "Coût fixation (€/Wc)",
+                    "Investissement brut (€ HT)",
+                    "Aides déduites (€)",
+                    "Investissement net (€ HT)",
+                    "Raccordement (€ HT)",
+                    "Charges annuelles (€ HT/an)",
+                    "Facture annuelle de référence (€ HT)",
+                    "Économie autoconsommation (€ HT/an)",
+                    "Revenu surplus (€ HT/an)",
+                    "Gain net année 1 (€ HT)",
+                    "Temps de retour simple (années)",
+                    "VAN (€)",
+                    "TRI (%)",
+                    "Gain net cumulé (€)",
+                ],
+                "Valeur": [
+                    pv_peak_kwp,
+                    fixing_type,
+                    investment_data["equipment_rate"],
+                    investment_data["fixing_rate"],
+                    investment_data["gross_total"],
+                    investment_data["grant_amount"],
+                    investment_data["net_total"],
+                    connection_data["total"],
+                    operating_cost_data["total"],
+                    energy_value_data["annual_energy_bill"],
+                    energy_value_data["annual_self_consumption_saving"],
+                    energy_value_data["annual_surplus_revenue"],
+                    financial_projection["annual_net_gain_year_1"],
+                    (
+                        financial_projection["payback_year"]
+                        if not pd.isna(financial_projection["payback_year"])
+                        else ""
+                    ),
+                    financial_projection["npv"],
+                    (
+                        financial_projection["irr"] * 100
+                        if not pd.isna(financial_projection["irr"])
+                        else ""
+                    ),
+                    financial_projection["total_net_gain"],
+                ],
+            }
+        )
 
-    financial_summary_export = pd.DataFrame(
-        {
-            "Indicateur": [
-                "Puissance étudiée (kWc)",
-                "Type de fixation",
-                "Coût équipements + pose (€/Wc)",
-                "Coût fixation (€/Wc)",
-                "Investissement brut (€ HT)",
-                "Aides déduites (€)",
-                "Investissement net (€ HT)",
-                "Raccordement (€ HT)",
-                "Charges annuelles (€ HT/an)",
-                "Facture annuelle de référence (€ HT)",
-                "Économie autoconsommation (€ HT/an)",
-                "Revenu surplus (€ HT/an)",
-                "Gain net année 1 (€ HT)",
-                "Temps de retour simple (années)",
-                "VAN (€)",
-                "TRI (%)",
-                "Gain net cumulé (€)",
-            ],
-            "Valeur": [
-                pv_peak_kwp,
-                fixing_type,
-                investment_data["equipment_rate"],
-                investment_data["fixing_rate"],
-                investment_data["gross_total"],
-                investment_data["grant_amount"],
-                investment_data["net_total"],
-                connection_data["total"],
-                operating_cost_data["total"],
-                energy_value_data["annual_energy_bill"],
-                energy_value_data["annual_self_consumption_saving"],
-                energy_value_data["annual_surplus_revenue"],
-                financial_projection["annual_net_gain_year_1"],
-                (
-                    financial_projection["payback_year"]
-                    if not pd.isna(financial_projection["payback_year"])
-                    else ""
-                ),
-                financial_projection["npv"],
-                (
-                    financial_projection["irr"] * 100
-                    if not pd.isna(financial_projection["irr"])
-                    else ""
-                ),
-                financial_projection["total_net_gain"],
-            ],
+        return {
+            "data": make_excel_export(
+                hourly_standardized_export,
+                hourly_export,
+                daily_export,
+                monthly_export,
+                weekday_hour_matrix.round(3),
+                date_hour_matrix.round(3),
+                tariff_summary_export,
+                tariff_detail_export,
+                financial_summary_export,
+                financial_projection["table"],
+                summary_df,
+            ),
         }
-    )
-
-    excel_bytes = make_excel_export(
-        hourly_standardized_export,
-        hourly_export,
-        daily_export,
-        monthly_export,
-        weekday_hour_matrix.round(3),
-        date_hour_matrix.round(3),
-        tariff_summary_export,
-        tariff_detail_export,
-        financial_summary_export,
-        financial_projection["table"],
-        summary_df,
-    )
 
     export1, export2 = st.columns(2)
 
-    logo_candidates = [
-        Path("logo_cma.png"),
-        Path("logo_cma.jpg"),
-        Path("assets/logo_cma.png"),
-        Path("assets/logo_cma.jpg"),
-    ]
-    report_logo_path = next(
-        (path for path in logo_candidates if path.exists()),
-        None,
-    )
-
-    pdf_ready = bool(
-        solar_analysis_available
-        and pvgis_available
-        and selected_location is not None
-    )
+    with export1:
+        full_excel_artifact = on_demand_artifact(
+            "full_excel_export",
+            report_key,
+            build_full_excel_artifact,
+            "⚙️ Préparer le classeur Excel complet",
+        )
 
-    if pdf_ready:
-        try:
-            pdf_report_bytes = create_cma_pdf_report(
-                company_name=company_name,
-                company_siret=company_siret,
-                advisor_name=advisor_name,
-                diagnostic_date=diagnostic_date,
-                address_label=selected_location["label"],
-                latitude=selected_location["latitude"],
-                longitude=selected_location["longitude"],
-                source_filename=uploaded_file.name,
-                period_start=filtered_df["Horodate"].min(),
-                period_end=filtered_df["Horodate"].max(),
-                source_unit=source_unit,
-                time_step=time_step,
-                total_kwh=total_kwh,
-                average_daily_kwh=average_daily_kwh,
-                maximum_power_kw=maximum_power_kw,
-                daylight_share=daylight_share,
-                production_period_share=production_period_share,
-                pv_peak_kwp=pv_peak_kwp,
-                pv_tilt=pv_tilt,
-                orientation_label=orientation_label,
-                pv_losses=pv_losses,
-                pvgis_production_kwh=pvgis_production_kwh,
-                self_consumed_kwh=self_consumed_kwh,
-                self_consumption_rate=self_consumption_rate,
-                self_sufficiency_rate=self_sufficiency_rate,
-                cma_score_data=cma_score_data,
-                annual_yield_kwh_per_kwp=annual_yield_kwh_per_kwp,
-                tariff_summary_df=tariff_summary_df,
-                tariff_score_data=tariff_score_data,
-                hc_ranges=hc_ranges,
-                investment_data=investment_data,
-                connection_data=connection_data,
-                operating_cost_data=operating_cost_data,
-                energy_value_data=energy_value_data,
-                financial_projection=financial_projection,
-                business_assistant=business_assistant,
-                financial_horizon_years=financial_horizon_years,
-                electricity_tariff_type=electricity_tariff_type,
-                surplus_sale_price_eur_kwh=surplus_sale_price_eur_kwh,
-                electricity_price_increase_percent=(
-                    electricity_price_increase_percent
-                ),
-                production_degradation_percent=(
-                    production_degradation_percent
+        if full_excel_artifact is not None:
+            st.download_button(
+                "⬇️ Télécharger le classeur Excel complet",
+                data=full_excel_artifact["data"],
+                file_name="analyse_photovoltaique_cma.xlsx",
+                mime=(
+                    "application/vnd.openxmlformats-officedocument."
+                    "spreadsheetml.sheet"
                 ),
-                discount_rate_percent=discount_rate_percent,
-                monthly_df=monthly_df,
-                weekday_hour_matrix=weekday_hour_matrix,
-                hourly_df=hourly_df,
-                filtered_df=filtered_df,
-                logo_path=report_logo_path,
-            )
-        except Exception as exc:
-            pdf_report_bytes = None
-            st.error(
-                "Le rapport PDF n'a pas pu être généré. "
-                f"Détail : {exc}"
+                use_container_width=True,
             )
-    else:
-        pdf_report_bytes = None
-
-    with export1:
-        st.download_button(
-            "⬇️ Télécharger le classeur Excel complet",
-            data=excel_bytes,
-            file_name="analyse_photovoltaique_cma.xlsx",
-            mime=(
-                "application/vnd.openxmlformats-officedocument."
-                "spreadsheetml.sheet"
-            ),
-            use_container_width=True,
-        )
 
     with export2:
         csv_data = daily_export.to_csv(
@@ -6607,22 +9239,133 @@ with nav_report:
     st.markdown("---")
     st.subheader("Rapport pédagogique CMA")
 
-    if pdf_report_bytes:
-        pdf_filename_company = (
-            company_name.strip().replace(" ", "_")
-            if company_name.strip()
-            else "entreprise"
-        )
+    pdf_waiting_job = None
+    pdf_ready = bool(
+        solar_analysis_available
+        and pvgis_available
+        and selected_location is not None
+    )
 
-        st.download_button(
-            "📄 Télécharger le rapport PDF CMA",
-            data=pdf_report_bytes,
-            file_name=(
-                f"pre_diagnostic_photovoltaique_"
-                f"{pdf_filename_company}.pdf"
+    if pdf_ready:
+        pdf_chart_label = st.selectbox(
+            "Rendu des graphiques du rapport",
+            options=list(PDF_CHART_BACKENDS),
+            key="pdf_chart_backend",
+            help=(
+                "Le rendu vectoriel est tracé directement dans le PDF : il est "
+                "plus rapide et plus net. Le rendu Plotly reproduit à "
+                "l'identique les graphiques de l'application."
+            ),
+        )
+        pdf_chart_backend = PDF_CHART_BACKENDS[pdf_chart_label]
+        pdf_report_arguments = dict(
+            company_name=company_name,
+            company_siret=company_siret,
+            advisor_name=advisor_name,
+            diagnostic_date=diagnostic_date,
+            address_label=selected_location["label"],
+            latitude=selected_location["latitude"],
+            longitude=selected_location["longitude"],
+            irradiance_provider=irradiance_provider,
+            source_filename=source_filename,
+            period_start=filtered_df["Horodate"].min(),
+            period_end=filtered_df["Horodate"].max(),
+            source_unit=source_unit,
+            time_step=time_step,
+            total_kwh=total_kwh,
+            average_daily_kwh=average_daily_kwh,
+            maximum_power_kw=maximum_power_kw,
+            daylight_share=daylight_share,
+            production_period_share=production_period_share,
+            pv_peak_kwp=pv_peak_kwp,
+            pv_tilt=pv_tilt,
+            orientation_label=orientation_label,
+            pv_losses=pv_losses,
+            pvgis_production_kwh=pvgis_production_kwh,
+            self_consumed_kwh=self_consumed_kwh,
+            self_consumption_rate=self_consumption_rate,
+            self_sufficiency_rate=self_sufficiency_rate,
+            cma_score_data=cma_score_data,
+            annual_yield_kwh_per_kwp=annual_yield_kwh_per_kwp,
+            tariff_summary_df=tariff_summary_df,
+            tariff_score_data=tariff_score_data,
+            hc_ranges=hc_ranges,
+            investment_data=investment_data,
+            connection_data=connection_data,
+            operating_cost_data=operating_cost_data,
+            energy_value_data=energy_value_data,
+            financial_projection=financial_projection,
+            business_assistant=business_assistant,
+            financial_horizon_years=financial_horizon_years,
+            electricity_tariff_type=electricity_tariff_type,
+            surplus_sale_price_eur_kwh=surplus_sale_price_eur_kwh,
+            electricity_price_increase_percent=(
+                electricity_price_increase_percent
             ),
-            mime="application/pdf",
+            production_degradation_percent=(
+                production_degradation_percent
+            ),
+            discount_rate_percent=discount_rate_percent,
+            monthly_df=monthly_df,
+            weekday_hour_matrix=weekday_hour_matrix,
+            hourly_df=hourly_df,
+            filtered_df=filtered_df,
+            logo_path=report_logo_path,
+            chart_backend=pdf_chart_backend,
+        )
+        pdf_job_key = stage_fingerprint(report_key, pdf_chart_backend)
+        pdf_job = find_pdf_job(pdf_job_key)
+
+        if pdf_job is not None and pdf_job["future"].done():
+            pdf_error = pdf_job["future"].exception()
+
+            # L'échec est signalé une seule fois ; le bouton permet de
+            # relancer la génération.
+            if pdf_error is not None:
+                forget_pdf_job(pdf_job_key)
+                pdf_job = None
+                st.error(PDF_JOB_ERROR.format(pdf_error))
+
+        if pdf_job is None and st.button(
+            "⚙️ Générer le rapport PDF CMA",
+            key="prepare_cma_pdf_report",
             use_container_width=True,
+        ):
+            pdf_job = submit_pdf_job(pdf_job_key, pdf_report_arguments)
+
+        pdf_report_bytes = None
+
+        if pdf_job is not None and pdf_job["future"].done():
+            pdf_report_bytes = pdf_job["future"].result()
+        elif pdf_job is not None:
+            # L'avancement est suivi en fin de script : les onglets suivants
+            # s'affichent sans attendre la génération.
+            pdf_waiting_job = pdf_job
+            pdf_waiting_key = pdf_job_key
+            pdf_status = st.empty()
+            pdf_status.progress(pdf_job["progress"], text=pdf_job["step"])
+
+        if pdf_report_bytes:
+            pdf_filename_company = (
+                company_name.strip().replace(" ", "_")
+                if company_name.strip()
+                else "entreprise"
+            )
+
+            st.download_button(
+                "📄 Télécharger le rapport PDF CMA",
+                data=pdf_report_bytes,
+                file_name=(
+                    f"pre_diagnostic_photovoltaique_"
+                    f"{pdf_filename_company}.pdf"
+                ),
+                mime="application/pdf",
+                use_container_width=True,
+            )
+    elif pvgis_pending:
+        st.info(
+            "⏳ Le rapport PDF sera disponible dès la réception des données "
+            "PVGIS."
         )
     else:
         st.info(
@@ -6960,6 +9703,13 @@ with tab_solar:
         if solar_error:
             st.warning(solar_error)
 
+        if pvgis_pending:
+            st.info(
+                "⏳ Les données PVGIS sont en cours de récupération : la "
+                "production estimée s'affichera automatiquement dès leur "
+                "réception."
+            )
+
         if not pd.isna(daylight_share) and (
             daylight_share < 5 or daylight_share > 95
         ):
@@ -7428,6 +10178,13 @@ with tab_solar:
             "mesure météorologique réelle de chaque journée analysée."
         )
 
+        if pvgis_stage["provider"] == "clearsky":
+            st.warning(
+                "Estimation hors ligne : la production est calculée par ciel "
+                "clair avec pvlib, sans nuages. Elle majore la production "
+                "réelle et doit être confirmée avec PVGIS."
+            )
+
 
 # ============================================================
 # ANALYSE TARIFAIRE
@@ -8121,35 +10878,47 @@ with tab_profiles:
             height=810,
         )
 
-        weekly_excel = make_colored_excel_bytes(
-            display_matrix,
-            sheet_name="Profil hebdomadaire",
-            index_label="Plage horaire",
-        )
-        weekly_png = make_colored_png_bytes(
-            display_matrix,
-            title="Consommation horaire moyenne selon le jour de la semaine",
-            index_label="Plage horaire",
-        )
-        dl_weekly_xlsx, dl_weekly_png = st.columns(2)
-        with dl_weekly_xlsx:
-            st.download_button(
-                "Télécharger Excel",
-                data=weekly_excel,
-                file_name="consommation_horaire_moyenne_hebdomadaire.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                use_container_width=True,
-                key="download_weekly_heatmap_xlsx",
-            )
-        with dl_weekly_png:
-            st.download_button(
-                "Télécharger PNG",
-                data=weekly_png,
-                file_name="consommation_horaire_moyenne_hebdomadaire.png",
-                mime="image/png",
-                use_container_width=True,
-                key="download_weekly_heatmap_png",
-            )
+        weekly_artifact = on_demand_artifact(
+            "weekly_heatmap_exports",
+            calculation_fingerprints["hourly"],
+            lambda: {
+                "data": make_colored_excel_bytes(
+                    display_matrix,
+                    sheet_name="Profil hebdomadaire",
+                    index_label="Plage horaire",
+                ),
+                "png": make_colored_png_bytes(
+                    display_matrix,
+                    title=(
+                        "Consommation horaire moyenne selon le jour "
+                        "de la semaine"
+                    ),
+                    index_label="Plage horaire",
+                ),
+            },
+            "⚙️ Préparer les exports Excel et PNG",
+        )
+
+        if weekly_artifact is not None:
+            dl_weekly_xlsx, dl_weekly_png = st.columns(2)
+            with dl_weekly_xlsx:
+                st.download_button(
+                    "Télécharger Excel",
+                    data=weekly_artifact["data"],
+                    file_name="consommation_horaire_moyenne_hebdomadaire.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    use_container_width=True,
+                    key="download_weekly_heatmap_xlsx",
+                )
+            with dl_weekly_png:
+                st.download_button(
+                    "Télécharger PNG",
+                    data=weekly_artifact["png"],
+                    file_name="consommation_horaire_moyenne_hebdomadaire.png",
+                    mime="image/png",
+                    use_container_width=True,
+                    key="download_weekly_heatmap_png",
+                )
 
     with col_chart:
         profile_long = (
@@ -8209,13 +10978,7 @@ with tab_profiles:
                 f"{hour:02d}:00"
                 for hour in weekday_hour_matrix.index
             ],
-            colorscale=[
-                [0.00, "#63BE7B"],
-                [0.30, "#A9D26D"],
-                [0.50, "#FFEB84"],
-                [0.72, "#F6B26B"],
-                [1.00, "#F8696B"],
-            ],
+            colorscale=HEAT_COLORSCALE,
             colorbar=dict(title="kW"),
             hovertemplate=(
                 "Jour : %{x}<br>"
@@ -8261,48 +11024,51 @@ with tab_profiles:
         height=720,
     )
 
-    full_excel = make_colored_excel_bytes(
-        full_display_matrix,
-        sheet_name="Toutes dates",
-        index_label="Date",
-    )
-    full_png = make_colored_png_bytes(
-        full_display_matrix,
-        title="Consommation horaire sur l’ensemble de la période",
-        index_label="Date",
+    full_artifact = on_demand_artifact(
+        "full_heatmap_exports",
+        calculation_fingerprints["hourly"],
+        lambda: {
+            "data": make_colored_excel_bytes(
+                full_display_matrix,
+                sheet_name="Toutes dates",
+                index_label="Date",
+            ),
+            "png": make_colored_png_bytes(
+                full_display_matrix,
+                title="Consommation horaire sur l’ensemble de la période",
+                index_label="Date",
+            ),
+        },
+        "⚙️ Préparer les exports Excel et PNG",
     )
-    dl_full_xlsx, dl_full_png = st.columns(2)
-    with dl_full_xlsx:
-        st.download_button(
-            "Télécharger Excel",
-            data=full_excel,
-            file_name="consommation_horaire_toutes_dates.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            use_container_width=True,
-            key="download_full_heatmap_xlsx",
-        )
-    with dl_full_png:
-        st.download_button(
-            "Télécharger PNG",
-            data=full_png,
-            file_name="consommation_horaire_toutes_dates.png",
-            mime="image/png",
-            use_container_width=True,
-            key="download_full_heatmap_png",
-        )
+
+    if full_artifact is not None:
+        dl_full_xlsx, dl_full_png = st.columns(2)
+        with dl_full_xlsx:
+            st.download_button(
+                "Télécharger Excel",
+                data=full_artifact["data"],
+                file_name="consommation_horaire_toutes_dates.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                use_container_width=True,
+                key="download_full_heatmap_xlsx",
+            )
+        with dl_full_png:
+            st.download_button(
+                "Télécharger PNG",
+                data=full_artifact["png"],
+                file_name="consommation_horaire_toutes_dates.png",
+                mime="image/png",
+                use_container_width=True,
+                key="download_full_heatmap_png",
+            )
 
     full_heatmap = go.Figure(
         data=go.Heatmap(
             z=date_hour_matrix.values,
             x=date_hour_matrix.columns,
             y=[d.strftime("%d/%m/%Y") for d in date_hour_matrix.index],
-            colorscale=[
-                [0.00, "#63BE7B"],
-                [0.30, "#A9D26D"],
-                [0.50, "#FFEB84"],
-                [0.72, "#F6B26B"],
-                [1.00, "#F8696B"],
-            ],
+            colorscale=HEAT_COLORSCALE,
             colorbar=dict(title="kW"),
             hovertemplate=(
                 "Date : %{y}<br>"
@@ -8395,13 +11161,7 @@ with tab_daily:
                     f"Semaine {int(week)}"
                     for week in calendar_matrix.index
                 ],
-                colorscale=[
-                    [0.00, "#63BE7B"],
-                    [0.30, "#A9D26D"],
-                    [0.50, "#FFEB84"],
-                    [0.72, "#F6B26B"],
-                    [1.00, "#F8696B"],
-                ],
+                colorscale=HEAT_COLORSCALE,
                 colorbar=dict(title="kWh"),
                 hovertemplate=(
                     "Jour : %{x}<br>"
@@ -8538,3 +11298,37 @@ with tab_quality:
 # EXPORT
 # ============================================================
 
+
+# ============================================================
+# RAPPORT PDF EN COURS DE GÉNÉRATION
+# ============================================================
+# La page est entièrement affichée : on suit ici la génération lancée depuis
+# l'onglet Rapport, puis un rerun affiche le téléchargement ; un échec est
+# signalé sur place.
+
+if pdf_waiting_job is not None:
+    wait_for_pdf_job(pdf_waiting_job, pdf_status)
+    pdf_error = pdf_waiting_job["future"].exception()
+
+    if pdf_error is None:
+        st.rerun()
+
+    forget_pdf_job(pdf_waiting_key)
+    pdf_status.error(PDF_JOB_ERROR.format(pdf_error))
+
+
+# ============================================================
+# RÉCEPTION DES DONNÉES PVGIS
+# ============================================================
+# La page est entièrement affichée : on attend la requête PVGIS préchargée
+# puis on relance le script pour intégrer le profil. Un échec est signalé
+# sur place ; la requête n'est relancée qu'à la demande (panneau latéral).
+
+if pvgis_future is not None and not pvgis_future.done():
+    wait_for_pvgis_prefetch(pvgis_future, pvgis_status)
+    pvgis_error = pvgis_future.exception()
+
+    if pvgis_error is None:
+        st.rerun()
+
+    pvgis_status.error(PVGIS_ERROR.format(pvgis_error))
@@ -0,0 +1,146 @@
+"""
+Serveur local de substitution à l'API PVGIS seriescalc.
+
+Il rejoue des réponses PVGIS enregistrées (fichiers JSON) pour travailler
+sans connexion ou rendre les diagnostics reproductibles :
+
+    python pvgis_standin.py --directory enregistrements_pvgis
+    CMA_PVGIS_URL=http://127.0.0.1:8765/api/v5_3/seriescalc streamlit run app.py
+
+Avec --record, une requête absente est transmise à PVGIS puis enregistrée.
+"""
+
+import argparse
+import hashlib
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+PVGIS_UPSTREAM_URL = "https://re.jrc.ec.europa.eu/api/v5_3/seriescalc"
+
+# Paramètres qui déterminent la série ; les autres (format...) sont ignorés.
+RECORDING_PARAMS = (
+    "lat",
+    "lon",
+    "startyear",
+    "endyear",
+    "peakpower",
+    "loss",
+    "angle",
+    "aspect",
+)
+
+
+def recording_name(query: dict) -> str:
+    """Nom du fichier enregistré pour une requête seriescalc."""
+    values = []
+
+    for name in RECORDING_PARAMS:
+        value = query.get(name, "")
+        try:
+            value = f"{float(value):g}"
+        except ValueError:
+            pass
+        values.append(f"{name}={value}")
+
+    digest = hashlib.sha256("&".join(values).encode()).hexdigest()[:16]
+    return f"seriescalc_{digest}.json"
+
+
+def make_handler(directory: Path, record: bool) -> type:
+    class PvgisStandinHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            url = urlsplit(self.path)
+
+            if not url.path.endswith("/seriescalc"):
+                self.send_json(404, {"message": "Seul seriescalc est rejoué."})
+                return
+
+            query = dict(parse_qsl(url.query))
+            path = directory / recording_name(query)
+
+            if path.exists():
+                self.send_json(200, json.loads(path.read_text("utf-8")))
+                return
+
+            if not record:
+                self.send_json(
+                    404,
+                    {"message": f"Aucun enregistrement : {path.name}."},
+                )
+                return
+
+            try:
+                response = requests.get(
+                    PVGIS_UPSTREAM_URL,
+                    params=query,
+                    timeout=120,
+                )
+            except requests.RequestException as exc:
+                self.send_json(502, {"message": f"PVGIS injoignable : {exc}"})
+                return
+
+            try:
+                payload = response.json()
+            except ValueError:
+                # Page d'erreur HTML, réponse tronquée... : statut amont
+                # conservé s'il signale déjà une erreur.
+                status = response.status_code
+                self.send_json(
+                    status if status >= 400 else 502,
+                    {
+                        "message": "Réponse PVGIS non JSON.",
+                        "body": response.text[:500],
+                    },
+                )
+                return
+
+            if response.status_code == 200:
+                directory.mkdir(parents=True, exist_ok=True)
+                path.write_text(response.text, encoding="utf-8")
+
+            self.send_json(response.status_code, payload)
+
+        def send_json(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return PvgisStandinHandler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--directory",
+        type=Path,
+        default=Path("pvgis_recordings"),
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        help="Interroge PVGIS et enregistre les requêtes absentes.",
+    )
+    arguments = parser.parse_args()
+
+    server = ThreadingHTTPServer(
+        (arguments.host, arguments.port),
+        make_handler(arguments.directory, arguments.record),
+    )
+    print(
+        "Substitut PVGIS : "
+        f"http://{arguments.host}:{arguments.port}/api/v5_3/seriescalc"
+    )
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
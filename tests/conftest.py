@@ -0,0 +1,87 @@
+"""
+Accès aux fonctions de app.py sans exécuter l'interface Streamlit.
+
+app.py est un script : seules les définitions qui précèdent la section
+ACCUEIL (constantes, fonctions de calcul et d'export) sont chargées.
+"""
+
+import types
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+APP_PATH = Path(__file__).resolve().parents[1] / "app.py"
+INTERFACE_MARKER = (
+    "# ============================================================\n"
+    "# ACCUEIL"
+)
+
+
+@pytest.fixture(scope="session")
+def app() -> types.ModuleType:
+    source = APP_PATH.read_text(encoding="utf-8")
+    module = types.ModuleType("app")
+    module.__file__ = str(APP_PATH)
+    exec(
+        compile(source[: source.index(INTERFACE_MARKER)], APP_PATH, "exec"),
+        module.__dict__,
+    )
+    return module
+
+
+def enedis_csv(
+    start: str,
+    end: str,
+    step_minutes: int,
+    seed: int = 0,
+) -> bytes:
+    """Export Enedis synthétique (puissance moyenne en W, fin d'intervalle)."""
+    horodates = pd.date_range(
+        start,
+        end,
+        freq=f"{step_minutes}min",
+        tz="Europe/Paris",
+    )[1:]
+    values = (
+        pd.Series(range(len(horodates)))
+        .sample(frac=1.0, random_state=seed)
+        .to_numpy()
+        % 4900
+        + 100
+    )
+    frame = pd.DataFrame(
+        {
+            "Identifiant PRM": "12345678901234",
+            "Grandeur physique": "PA",
+            "Unité": "W",
+            "Horodate": horodates.strftime("%Y-%m-%dT%H:%M:%S%z").str.replace(
+                r"(\d\d)(\d\d)$",
+                r"\1:\2",
+                regex=True,
+            ),
+            "Valeur": values,
+            "Pas": f"PT{step_minutes}M",
+        }
+    )
+    return frame.to_csv(sep=";", index=False).encode("utf-8")
+
+
+@pytest.fixture(scope="session")
+def interval_table(app):
+    """Table des intervalles construite comme pour un import réel."""
+
+    def build(start: str, end: str, step_minutes: int) -> pd.DataFrame:
+        source_df = app.read_enedis_file(
+            enedis_csv(start, end, step_minutes),
+            "courbe.csv",
+        )
+        time_step = app.detect_time_step(source_df)
+        enriched_df, _interpretation = app.enrich_energy_data(
+            source_df,
+            time_step,
+            app.detect_source_unit(source_df),
+        )
+        return app.build_interval_table(enriched_df)
+
+    return build
@@ -0,0 +1,98 @@
+"""
+Graphe de calcul : seuls les nœuds dont une entrée a changé sont recalculés.
+"""
+
+from collections import Counter
+
+import pytest
+
+
+@pytest.fixture
+def graph(app):
+    calls = Counter()
+    outcome = {"fail": False}
+
+    def node(name, function):
+        def wrapped(*args):
+            calls[name] += 1
+            return function(*args)
+
+        return wrapped
+
+    def fetch(base):
+        if outcome["fail"]:
+            return {"value": None, "error": "injoignable"}
+        return {"value": base * 10, "error": None}
+
+    nodes = {
+        "base": app.calculation_node(node("base", lambda a: a + 1), "a"),
+        "other": app.calculation_node(node("other", lambda b: b * 2), "b"),
+        "remote": app.calculation_node(node("remote", fetch), "base"),
+        "total": app.calculation_node(
+            node("total", lambda remote, other: (remote["value"], other)),
+            "remote",
+            "other",
+        ),
+    }
+    return app, nodes, calls, outcome
+
+
+def statuses(timings):
+    return {timing["Nœud"]: timing["Statut"] for timing in timings}
+
+
+def test_untouched_nodes_are_not_called_again(graph):
+    app, nodes, calls, _outcome = graph
+    state = {}
+
+    first, _fingerprints, _timings = app.run_calculation_graph(
+        nodes, {"a": 1, "b": 2}, state
+    )
+    second, _fingerprints, timings = app.run_calculation_graph(
+        nodes, {"a": 1, "b": 2}, state
+    )
+
+    assert calls == Counter(base=1, other=1, remote=1, total=1)
+    assert second["total"] == first["total"] == (20, 4)
+    assert set(statuses(timings).values()) == {"À jour"}
+    assert all(timing["Durée (ms)"] == 0 for timing in timings)
+
+
+def test_only_downstream_nodes_are_recalculated(graph):
+    app, nodes, calls, _outcome = graph
+    state = {}
+
+    app.run_calculation_graph(nodes, {"a": 1, "b": 2}, state)
+    values, _fingerprints, timings = app.run_calculation_graph(
+        nodes, {"a": 1, "b": 5}, state
+    )
+
+    assert calls == Counter(base=1, other=2, remote=1, total=2)
+    assert values["total"] == (20, 10)
+    assert statuses(timings) == {
+        "base": "À jour",
+        "other": "Recalculé",
+        "remote": "À jour",
+        "total": "Recalculé",
+    }
+
+
+def test_error_results_are_retried_and_refresh_downstream(graph):
+    app, nodes, calls, outcome = graph
+    state = {}
+    outcome["fail"] = True
+
+    values, _fingerprints, _timings = app.run_calculation_graph(
+        nodes, {"a": 1, "b": 2}, state
+    )
+    assert values["total"] == (None, 4)
+
+    outcome["fail"] = False
+    values, _fingerprints, timings = app.run_calculation_graph(
+        nodes, {"a": 1, "b": 2}, state
+    )
+
+    assert calls == Counter(base=1, other=1, remote=2, total=2)
+    assert values["total"] == (20, 4)
+    assert statuses(timings)["remote"] == "Recalculé"
+    assert statuses(timings)["total"] == "Recalculé"
@@ -0,0 +1,52 @@
+"""
+Lecture des CSV Enedis par blocs : un format d'horodate commun au fichier.
+"""
+
+import pandas as pd
+import pytest
+
+from conftest import enedis_csv
+
+
+def with_date_only_row(csv: bytes, line_number: int) -> bytes:
+    """Remplace une horodate par une date seule, qu'aucun format ne reconnaît."""
+    lines = csv.decode("utf-8").splitlines()
+    fields = lines[line_number].split(";")
+    fields[3] = fields[3][:10]
+    lines[line_number] = ";".join(fields)
+    return "\n".join(lines).encode("utf-8")
+
+
+@pytest.mark.parametrize("chunk_rows", [20, 50, 1000])
+def test_format_change_across_chunks_keeps_every_utc_instant(
+    app,
+    monkeypatch,
+    chunk_rows,
+):
+    # Le premier bloc n'est pas reconnu (date seule), les suivants le sont.
+    monkeypatch.setattr(app, "CSV_CHUNK_ROWS", chunk_rows)
+    csv = with_date_only_row(enedis_csv("2023-03-25", "2023-03-28", 30), 5)
+
+    df = app.read_enedis_file(csv, "courbe.csv")
+
+    assert len(df) == 3 * 48 - 2 - 1
+    assert df["Horodate"].dt.tz is None
+    assert df["Horodate_UTC"].notna().all()
+    pd.testing.assert_series_equal(
+        df["Horodate_UTC"].dt.tz_convert("Europe/Paris").dt.tz_localize(None),
+        df["Horodate"],
+        check_names=False,
+    )
+    assert df["Horodate_UTC"].is_monotonic_increasing
+
+
+def test_detected_format_is_kept_for_later_chunks(app, monkeypatch):
+    monkeypatch.setattr(app, "CSV_CHUNK_ROWS", 20)
+    csv = with_date_only_row(enedis_csv("2023-10-28", "2023-10-31", 30), 40)
+
+    df = app.read_enedis_file(csv, "courbe.csv")
+
+    assert df["Horodate_UTC"].notna().all()
+    # L'heure répétée du 29 octobre reste ordonnée par l'instant UTC.
+    assert df["Horodate_UTC"].is_monotonic_increasing
+    assert (df["Horodate"] == "2023-10-29 02:30").sum() == 2
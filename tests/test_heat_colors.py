@@ -0,0 +1,104 @@
+"""
+Échelle de couleurs partagée : règles Excel vivantes et cellules vides.
+"""
+
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+
+def evaluate_rule(formula: str, cell: str, cell_range: str, value, values):
+    """Évalue une règle Excel (ISNUMBER, MIN, MAX, INT, IF, AND) en Python."""
+    numbers = [number for number in values if number is not None]
+    expression = (
+        formula.replace(f"MIN({cell_range})", "low")
+        .replace(f"MAX({cell_range})", "high")
+        .replace("ISNUMBER(", "is_number(")
+        .replace("AND(", "all_of(")
+        .replace("IF(", "if_else(")
+        .replace("INT(", "int_part(")
+        .replace("MIN(", "min(")
+        .replace("=", "==")
+        .replace(cell, "x")
+    )
+    # IF d'Excel n'évalue qu'une branche : les deux le sont ici, d'où
+    # des flottants NumPy et les divisions par zéro ignorées.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return eval(
+            expression,
+            {
+                "x": np.float64(np.nan if value is None else value),
+                "low": np.float64(min(numbers)),
+                "high": np.float64(max(numbers)),
+                "is_number": lambda item: not np.isnan(item),
+                "all_of": lambda *items: all(items),
+                "if_else": lambda test, yes, no: yes if test else no,
+                "int_part": np.floor,
+            },
+        )
+
+
+def excel_levels(app, table: pd.DataFrame) -> np.ndarray:
+    """Niveau appliqué par les règles du classeur exporté à chaque cellule."""
+    workbook = load_workbook(BytesIO(app.make_colored_excel_bytes(table, "Test")))
+    sheet = workbook["Test"]
+    (formatting,) = list(sheet.conditional_formatting)
+    rules = formatting.rules
+    bounds = str(formatting.sqref)
+    absolute = app.absolute_coordinate(bounds)
+    top_left = bounds.split(":")[0]
+    colors = {color: level for level, color in enumerate(app.HEAT_HEX[:-1])}
+
+    cells = [[cell.value for cell in row] for row in sheet[bounds]]
+    flat = [value for row in cells for value in row]
+    levels = np.full((len(cells), len(cells[0])), -1)
+
+    for row, values in enumerate(cells):
+        for column, value in enumerate(values):
+            for rule in rules:
+                formula = rule.formula[0]
+                if evaluate_rule(formula, top_left, absolute, value, flat):
+                    color = "#" + rule.dxf.fill.fgColor.rgb[-6:]
+                    levels[row, column] = colors[color]
+                    break
+
+    return levels
+
+
+@pytest.mark.parametrize("constant", [False, True])
+def test_excel_rules_match_shared_levels(app, constant):
+    rng = np.random.default_rng(0)
+    values = np.full((6, 5), 7.5) if constant else rng.uniform(-3, 40, (6, 5))
+    values[1, 2] = np.nan
+    table = pd.DataFrame(values, columns=list("ABCDE"))
+
+    np.testing.assert_array_equal(excel_levels(app, table), app.heat_levels(values))
+
+
+def test_excel_rules_follow_edited_values(app):
+    rules = app.heat_excel_rules("B2:C3")
+
+    # Aucun seuil figé : seules les bornes MIN/MAX de la plage interviennent.
+    for formula, _color in rules:
+        assert "MIN($B$2:$C$3)" in formula and "MAX($B$2:$C$3)" in formula
+
+    top_level = rules[app.HEAT_LEVELS - 1][0]
+    before = [0.0, 10.0, 5.0, 2.0]
+    # Une autre cellule passe de 2 à 100 dans Excel : 10 n'est plus rouge.
+    after = [0.0, 10.0, 5.0, 100.0]
+
+    assert evaluate_rule(top_level, "B2", "$B$2:$C$3", 10.0, before)
+    assert not evaluate_rule(top_level, "B2", "$B$2:$C$3", 10.0, after)
+
+
+def test_missing_cells_keep_the_table_background(app):
+    block = pd.DataFrame([[1.0, np.nan], [3.0, 4.0]])
+
+    css = app.heat_background_css(block)
+
+    assert css.iloc[0, 1] == ""
+    top_color = app.HEAT_HEX[app.HEAT_LEVELS - 1]
+    assert css.iloc[1, 1] == f"background-color: {top_color}"
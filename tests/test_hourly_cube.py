@@ -0,0 +1,141 @@
+"""
+Équivalence du cube horaire np.bincount avec l'agrégation groupby d'origine.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def groupby_hourly_cube(app, df: pd.DataFrame) -> pd.DataFrame:
+    """Implémentation groupby remplacée par build_hourly_cube (référence)."""
+    data = app.add_consumption_period_columns(df)
+
+    hourly = pd.DataFrame(
+        {
+            "_Heure_fin_utc": pd.DatetimeIndex(data["Horodate_UTC"]).ceil("h"),
+            "Energie_kWh": data["Energie_kWh"].to_numpy(),
+            "Puissance_ponderee": (
+                data["Puissance_kW"] * data["Duree_h"]
+            ).to_numpy(),
+            "Duree_h": data["Duree_h"].to_numpy(),
+            "Puissance_kW": data["Puissance_kW"].to_numpy(),
+            "Valeur": data["Valeur"].to_numpy(),
+        }
+    )
+
+    grouped = (
+        hourly.groupby("_Heure_fin_utc", as_index=False)
+        .agg(
+            Energie_kWh=("Energie_kWh", "sum"),
+            Puissance_ponderee=("Puissance_ponderee", "sum"),
+            Duree_totale_h=("Duree_h", "sum"),
+            Puissance_somme_kW=("Puissance_kW", "sum"),
+            Nombre_puissances=("Puissance_kW", "count"),
+            Puissance_max_kW=("Puissance_kW", "max"),
+            Nombre_points=("Valeur", "size"),
+        )
+        .sort_values("_Heure_fin_utc")
+        .reset_index(drop=True)
+    )
+
+    end_local_aware = pd.DatetimeIndex(grouped["_Heure_fin_utc"]).tz_convert(
+        "Europe/Paris"
+    )
+    start_local_aware = end_local_aware - pd.Timedelta(hours=1)
+    grouped["_Debut_local"] = start_local_aware.tz_localize(None)
+
+    grouped = (
+        grouped.groupby("_Debut_local", as_index=False)
+        .agg(
+            **{column: (column, "sum") for column in app.CUBE_SUM_COLUMNS},
+            Puissance_max_kW=("Puissance_max_kW", "max"),
+        )
+        .sort_values("_Debut_local")
+        .reset_index(drop=True)
+    )
+
+    grouped["Puissance_kW"] = np.where(
+        grouped["Duree_totale_h"] > 0,
+        grouped["Puissance_ponderee"] / grouped["Duree_totale_h"],
+        np.nan,
+    )
+    grouped["Horodate_debut"] = grouped["_Debut_local"]
+    grouped["Horodate"] = grouped["Horodate_debut"] + pd.Timedelta(hours=1)
+    grouped["Horodate_milieu"] = (
+        grouped["Horodate_debut"] + pd.Timedelta(minutes=30)
+    )
+    return grouped
+
+
+def assert_same_cube(app, df: pd.DataFrame) -> pd.DataFrame:
+    cube = app.build_hourly_cube(df)
+    expected = groupby_hourly_cube(app, df)
+    columns = [*app.CUBE_SUM_COLUMNS, *app.HOURLY_COLUMNS]
+    columns = list(dict.fromkeys(columns))
+
+    pd.testing.assert_frame_equal(
+        cube[columns].reset_index(drop=True),
+        expected[columns].reset_index(drop=True),
+        check_dtype=False,
+        rtol=1e-9,
+    )
+    return cube
+
+
+@pytest.mark.parametrize("step_minutes", [10, 15, 30, 60])
+@pytest.mark.parametrize(
+    ("start", "end"),
+    [
+        # Passage à l'heure d'été : 02h-03h n'existe pas le 26/03/2023.
+        ("2023-03-25", "2023-03-28"),
+        # Retour à l'heure d'hiver : 02h-03h est vécue deux fois le 29/10.
+        ("2023-10-28", "2023-10-31"),
+        # Plusieurs semaines sans changement d'heure.
+        ("2023-05-01", "2023-06-15"),
+    ],
+)
+def test_bincount_cube_matches_groupby(
+    app,
+    interval_table,
+    start,
+    end,
+    step_minutes,
+):
+    assert_same_cube(app, interval_table(start, end, step_minutes))
+
+
+@pytest.mark.parametrize("step_minutes", [10, 15, 30, 60])
+def test_dst_days_keep_real_durations(app, interval_table, step_minutes):
+    cube = assert_same_cube(
+        app,
+        interval_table("2023-03-25", "2023-10-31", step_minutes),
+    )
+    hours = cube.set_index("Horodate_debut")
+
+    assert pd.Timestamp("2023-03-26 02:00") not in hours.index
+    assert hours.loc["2023-10-29 02:00", "Duree_totale_h"] == pytest.approx(2)
+    assert hours.loc["2023-10-29 02:00", "Nombre_points"] == (
+        2 * 60 // step_minutes
+    )
+
+
+@pytest.mark.parametrize("step_minutes", [10, 30])
+def test_missing_values_are_ignored_like_groupby(
+    app,
+    interval_table,
+    step_minutes,
+):
+    df = interval_table("2023-10-27", "2023-11-02", step_minutes).copy()
+    rng = np.random.default_rng(1)
+    missing = rng.random(len(df)) < 0.2
+    df.loc[missing, ["Puissance_kW", "Energie_kWh"]] = np.nan
+    # Une heure entière sans puissance renseignée.
+    hour = df["Horodate"].between("2023-10-30 10:00", "2023-10-30 11:00")
+    df.loc[hour, "Puissance_kW"] = np.nan
+
+    cube = assert_same_cube(app, df)
+
+    empty_hour = cube.set_index("Horodate_debut").loc["2023-10-30 10:00"]
+    assert empty_hour["Nombre_puissances"] == 0
+    assert np.isnan(empty_hour["Puissance_max_kW"])
@@ -0,0 +1,157 @@
+"""
+Sources d'irradiation : profil ciel clair hors ligne et substitut PVGIS.
+"""
+
+import importlib.util
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import pytest
+import requests
+
+STANDIN_PATH = Path(__file__).resolve().parents[1] / "pvgis_standin.py"
+LYON = (45.7640, 4.8357)
+
+
+@pytest.fixture(scope="module")
+def standin():
+    spec = importlib.util.spec_from_file_location("pvgis_standin", STANDIN_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def serve():
+    """Démarre un serveur HTTP local et renvoie l'URL seriescalc."""
+    servers = []
+
+    def start(handler) -> str:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}/api/v5_3/seriescalc"
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_clearsky_profile_merges_on_every_reading(app, interval_table):
+    lookup, metadata = app.fetch_pvgis_reference_profile(
+        *LYON,
+        30,
+        0,
+        14,
+        provider="clearsky",
+    )
+    df = interval_table("2023-03-25", "2023-04-02", 30)
+
+    merged = app.merge_pvgis_profile(df, lookup)
+
+    assert metadata["provider"] == "clearsky"
+    assert len(merged) == len(df)
+    for column in app.PVGIS_PROFILE_COLUMNS:
+        assert not merged[column].isna().any()
+
+    hours = merged["Horodate"].dt.hour
+    night = merged.loc[hours.isin([0, 1, 2, 23]), "Production_PV_kW"]
+    midday = merged.loc[hours.between(11, 14), "Production_PV_kW"]
+    assert (night == 0).all()
+    assert (midday > 0.3).all()
+    assert (midday <= app.PVGIS_REFERENCE_KWP).all()
+
+    scaled = app.scale_pv_production(merged, 9.0)
+    np.testing.assert_allclose(
+        scaled["Production_PV_kW"],
+        merged["Production_PV_kW"] * 9.0,
+    )
+
+
+def test_unknown_provider_is_rejected(app):
+    with pytest.raises(ValueError, match="Source d'irradiation inconnue"):
+        app.fetch_pvgis_reference_profile(*LYON, 30, 0, 14, provider="meteo")
+
+
+def test_standin_replays_recordings(app, standin, serve, tmp_path, monkeypatch):
+    latitude, longitude = app.pvgis_grid_cell(*LYON)
+    query = {
+        "lat": latitude,
+        "lon": longitude,
+        "startyear": 2020,
+        "endyear": 2023,
+        "peakpower": app.PVGIS_REFERENCE_KWP,
+        "loss": 14,
+        "angle": 30,
+        "aspect": 0,
+    }
+    recording = {
+        "outputs": {
+            "hourly": [
+                {"time": "20200621:1110", "P": 812.0, "G(i)": 905.0},
+                {"time": "20200621:2310", "P": 0.0, "G(i)": 0.0},
+            ]
+        }
+    }
+    (tmp_path / standin.recording_name(query)).write_text(
+        json.dumps(recording),
+        encoding="utf-8",
+    )
+    url = serve(standin.make_handler(tmp_path, record=False))
+    monkeypatch.setattr(app, "PVGIS_API_URL", url)
+
+    series, _metadata = app.download_pvgis_series(latitude, longitude, 30, 0, 14)
+
+    assert series["Production_PV_kW"].tolist() == [0.812, 0.0]
+    assert series["Irradiation_Wm2"].tolist() == [905.0, 0.0]
+
+
+def test_standin_relays_unreachable_upstream(standin, serve, tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        standin,
+        "PVGIS_UPSTREAM_URL",
+        "http://127.0.0.1:9/api/v5_3/seriescalc",
+    )
+    url = serve(standin.make_handler(tmp_path, record=True))
+
+    response = requests.get(url, params={"lat": 45.76}, timeout=10)
+
+    assert response.status_code == 502
+    assert "PVGIS injoignable" in response.json()["message"]
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.parametrize(("upstream_status", "relayed_status"), [(200, 502), (503, 503)])
+def test_standin_relays_non_json_upstream(
+    standin,
+    serve,
+    tmp_path,
+    monkeypatch,
+    upstream_status,
+    relayed_status,
+):
+    class HtmlHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            body = b"<html>Service indisponible</html>"
+            self.send_response(upstream_status)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    monkeypatch.setattr(standin, "PVGIS_UPSTREAM_URL", serve(HtmlHandler))
+    url = serve(standin.make_handler(tmp_path, record=True))
+
+    response = requests.get(url, params={"lat": 45.76}, timeout=10)
+
+    assert response.status_code == relayed_status
+    assert response.json()["message"] == "Réponse PVGIS non JSON."
+    assert not list(tmp_path.iterdir())
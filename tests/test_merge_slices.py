@@ -0,0 +1,101 @@
+"""
+Assemblage de tranches Enedis qui se recouvrent.
+"""
+
+import pandas as pd
+import pytest
+
+from conftest import enedis_csv
+
+
+@pytest.fixture(scope="module")
+def read_slice(app):
+    def read(name: str, start: str, end: str, step_minutes: int) -> pd.DataFrame:
+        frame = app.read_enedis_file(
+            enedis_csv(start, end, step_minutes),
+            f"{name}.csv",
+        )
+        # Colonne témoin : la fusion conserve les colonnes des tranches.
+        return frame.assign(Tranche=name)
+
+    return read
+
+
+def assert_no_overlap(merged: pd.DataFrame, app) -> None:
+    hours = app.parse_pas_hours_column(merged["Pas"], pd.Timedelta(minutes=30))
+    starts = merged["Horodate_UTC"] - pd.to_timedelta(hours, unit="h")
+    previous_ends = merged["Horodate_UTC"].shift()
+    assert (starts.iloc[1:] >= previous_ends.iloc[1:]).all()
+
+
+@pytest.mark.parametrize("order", [("a", "b"), ("b", "a")])
+def test_overlapping_slices_keep_the_first_imported(app, read_slice, order):
+    slices = {
+        "a": read_slice("a", "2023-01-01", "2023-01-10", 30),
+        "b": read_slice("b", "2023-01-05", "2023-01-15", 30),
+    }
+
+    merged = app.merge_enedis_slices([slices[name] for name in order])
+    sources = merged["Tranche"]
+
+    assert len(merged) == 14 * 48
+    assert merged["Horodate_UTC"].is_unique
+    overlap = merged["Horodate"].between("2023-01-05 00:30", "2023-01-10 00:00")
+    assert (sources[overlap] == order[0]).all()
+    assert (sources[merged["Horodate"] <= "2023-01-05 00:00"] == "a").all()
+    assert (sources[merged["Horodate"] > "2023-01-10 00:00"] == "b").all()
+    assert_no_overlap(merged, app)
+
+
+@pytest.mark.parametrize("order", [("year", "month"), ("month", "year")])
+def test_contained_finer_slice_replaces_its_interval(app, read_slice, order):
+    slices = {
+        "year": read_slice("year", "2023-01-01", "2024-01-01", 60),
+        "month": read_slice("month", "2023-03-01", "2023-04-01", 30),
+    }
+
+    merged = app.merge_enedis_slices([slices[name] for name in order])
+    sources = merged["Tranche"]
+
+    # Le pas le plus fin l'emporte quel que soit l'ordre d'import.
+    in_march = merged["Horodate"].between("2023-03-01 00:30", "2023-04-01 00:00")
+    assert (sources[in_march] == "month").all()
+    assert (sources[~in_march] == "year").all()
+    assert in_march.sum() == len(slices["month"])
+    assert (~in_march).sum() == len(slices["year"]) - (31 * 24 - 1)
+    assert_no_overlap(merged, app)
+
+
+@pytest.mark.parametrize("order", [("outer", "inner"), ("inner", "outer")])
+def test_contained_slice_with_same_step(app, read_slice, order):
+    slices = {
+        "outer": read_slice("outer", "2023-06-01", "2023-07-01", 30),
+        "inner": read_slice("inner", "2023-06-10", "2023-06-12", 30),
+    }
+
+    merged = app.merge_enedis_slices([slices[name] for name in order])
+    sources = merged["Tranche"]
+
+    assert len(merged) == len(slices["outer"])
+    inner = merged["Horodate"].between("2023-06-10 00:30", "2023-06-12 00:00")
+    assert (sources[inner] == order[0]).all()
+    assert (sources[~inner] == "outer").all()
+
+
+def test_gap_in_finer_slice_is_filled_by_coarser_one(app, read_slice):
+    month = read_slice("month", "2023-03-01", "2023-04-01", 30)
+    month = month[month["Horodate"].dt.strftime("%Y-%m-%d") != "2023-03-10"]
+    year = read_slice("year", "2023-01-01", "2024-01-01", 60)
+
+    merged = app.merge_enedis_slices([year, month])
+    gap = merged["Horodate"].between("2023-03-10 01:00", "2023-03-10 23:00")
+
+    # Le jour absent de la tranche mensuelle est repris de la tranche annuelle,
+    # sauf l'heure 23h-24h que recouvre encore la demi-heure de minuit.
+    assert (merged.loc[gap, "Tranche"] == "year").all()
+    assert gap.sum() == 23
+    assert merged.loc[
+        merged["Horodate"] == "2023-03-11 00:00",
+        "Tranche",
+    ].tolist() == ["month"]
+    assert_no_overlap(merged, app)
@@ -0,0 +1,36 @@
+"""
+Export PNG des tableaux colorés : valeurs lisibles même sur les longues matrices.
+"""
+
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+from PIL import Image
+
+
+@pytest.mark.parametrize("row_count", [12, 366, 1096])
+def test_every_cell_keeps_its_value(app, row_count):
+    rng = np.random.default_rng(0)
+    table = pd.DataFrame(
+        rng.uniform(0, 50, size=(row_count, 24)),
+        index=pd.date_range("2022-01-01", periods=row_count, freq="D").date,
+        columns=[f"{hour:02d}h" for hour in range(24)],
+    )
+
+    png = app.make_colored_png_bytes(table, "Matrice", "Date")
+    pixels = np.asarray(Image.open(BytesIO(png)).convert("RGB"))
+
+    body_top = 44 + app.PNG_ROW_HEIGHT
+    row_h = (pixels.shape[0] - body_top) // row_count
+    assert row_h >= app.PNG_TEXT_MIN_ROW_HEIGHT
+    assert pixels.shape[0] == body_top + row_h * row_count
+
+    # Dernière ligne : la date et chaque valeur sont dessinées sur le fond.
+    top = body_top + row_h * (row_count - 1) + 1
+    cells = pixels[top : top + row_h - 1]
+    lefts = np.concatenate([[0], 105 + 62 * np.arange(24)])
+    for left, width in zip(lefts, [105] + [62] * 24):
+        cell = cells[:, left + 1 : left + width - 1].reshape(-1, 3)
+        assert len(np.unique(cell, axis=0)) > 1
@@ -0,0 +1,120 @@
+"""
+Profil PVGIS dense : valeurs exactes et repli sur la moyenne mois/heure.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture(scope="module")
+def pvgis_series():
+    """Série horaire 2020-2021 trouée, avec le 29 février 2020."""
+    times = pd.date_range(
+        "2020-01-01 00:10",
+        "2021-12-31 23:10",
+        freq="h",
+        tz="UTC",
+    )
+    rng = np.random.default_rng(3)
+    series = pd.DataFrame(
+        {
+            "Datetime_UTC": times,
+            "Production_PV_kW": rng.uniform(0, 1, len(times)),
+            "Irradiation_Wm2": rng.uniform(0, 1000, len(times)),
+        }
+    )
+    local = series["Datetime_UTC"].dt.tz_convert("Europe/Paris")
+    # Le 15 mars manque les deux années : repli sur la moyenne de mars.
+    series = series[local.dt.strftime("%m-%d") != "03-15"]
+    # Trous ponctuels : lignes absentes et valeurs non renseignées.
+    series = series.drop(series.sample(frac=0.05, random_state=1).index)
+    for seed, column in enumerate(["Production_PV_kW", "Irradiation_Wm2"]):
+        gaps = series.sample(frac=0.05, random_state=10 + seed).index
+        series.loc[gaps, column] = np.nan
+    return series.reset_index(drop=True)
+
+
+def reference_lookup(pvgis: pd.DataFrame, column: str) -> pd.Series:
+    """Moyenne exacte (mois, jour, heure), sinon moyenne mois/heure des jours."""
+    local = pvgis["Datetime_UTC"].dt.tz_convert("Europe/Paris")
+    keys = pd.DataFrame(
+        {
+            "month": local.dt.month,
+            "day": local.dt.day,
+            "hour": local.dt.hour,
+            "value": pvgis[column],
+        }
+    )
+    exact = keys.groupby(["month", "day", "hour"])["value"].mean().dropna()
+    fallback = exact.groupby(["month", "hour"]).mean()
+
+    slots = pd.MultiIndex.from_product(
+        [range(1, 13), range(1, 32), range(24)],
+        names=["month", "day", "hour"],
+    )
+    filled = exact.reindex(slots)
+    missing = filled.isna()
+    filled[missing] = fallback.reindex(
+        slots[missing].droplevel("day")
+    ).to_numpy()
+    return filled
+
+
+@pytest.mark.parametrize("column", ["Production_PV_kW", "Irradiation_Wm2"])
+def test_lookup_matches_exact_then_month_hour_mean(app, pvgis_series, column):
+    lookup = app.build_pvgis_lookup(pvgis_series)[column]
+    expected = reference_lookup(pvgis_series, column)
+
+    assert lookup.shape == app.PVGIS_LOOKUP_SHAPE
+    np.testing.assert_allclose(lookup.ravel(), expected.to_numpy(), rtol=1e-12)
+
+    # 15 mars à midi : aucun relevé, moyenne de midi sur les jours de mars.
+    march_noon = expected.loc[(3, slice(None), 12)].drop(15)
+    assert lookup[2, 14, 12] == pytest.approx(march_noon.mean())
+    # Le 29 février n'existe qu'en 2020 : sa propre moyenne est utilisée.
+    local = pvgis_series["Datetime_UTC"].dt.tz_convert("Europe/Paris")
+    leap_noon = pvgis_series.loc[
+        local.dt.strftime("%m-%d %H") == "02-29 12",
+        column,
+    ].dropna()
+    assert len(leap_noon) == 1
+    assert lookup[1, 28, 12] == pytest.approx(leap_noon.mean())
+
+
+def test_merge_reads_the_slot_of_each_reading(app, pvgis_series):
+    lookup = app.build_pvgis_lookup(pvgis_series)
+    df = pd.DataFrame(
+        {
+            "Horodate": pd.to_datetime(
+                [
+                    "2024-02-29 12:30",
+                    "2023-03-15 12:00",
+                    "2023-03-15 12:45",
+                    "2023-12-31 23:50",
+                    "2023-06-21 00:10",
+                ]
+            ),
+            "Energie_kWh": [1.0, 2.0, 3.0, 4.0, 5.0],
+        },
+        index=[10, 11, 12, 13, 14],
+    )
+
+    merged = app.merge_pvgis_profile(df, lookup)
+
+    assert merged.index.tolist() == df.index.tolist()
+    assert merged["Energie_kWh"].tolist() == df["Energie_kWh"].tolist()
+    for column in app.PVGIS_PROFILE_COLUMNS:
+        expected = reference_lookup(pvgis_series, column)
+        slots = list(
+            zip(
+                df["Horodate"].dt.month,
+                df["Horodate"].dt.day,
+                df["Horodate"].dt.hour,
+            )
+        )
+        np.testing.assert_allclose(
+            merged[column].to_numpy(),
+            expected.loc[slots].to_numpy(),
+            rtol=1e-12,
+        )
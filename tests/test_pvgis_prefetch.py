@@ -0,0 +1,122 @@
+"""
+Préchargement PVGIS : réutilisation, échecs conservés et éviction.
+"""
+
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def prefetch(app, monkeypatch):
+    """Registre vidé et requête PVGIS remplacée par un stub instrumenté."""
+    # Hors d'une session Streamlit, cache_resource ne partage pas le registre.
+    registry = app.pvgis_prefetch_registry()
+    monkeypatch.setattr(app, "pvgis_prefetch_registry", lambda: registry)
+    calls = []
+    failing = set()
+    blocked = {}
+
+    def fetch(latitude, *args):
+        calls.append(latitude)
+        if latitude in blocked:
+            blocked[latitude].wait(10)
+        if latitude in failing:
+            raise ConnectionError("hors ligne simulé")
+        return {"latitude": latitude}, {"provider": "stub"}
+
+    monkeypatch.setattr(app, "fetch_pvgis_reference_profile", fetch)
+    yield registry, calls, failing, blocked
+
+    for event in blocked.values():
+        event.set()
+    registry["executor"].shutdown(wait=True)
+
+
+def request(latitude: float) -> tuple:
+    return (latitude, 4.84, 30, 0, 14, "pvgis")
+
+
+def test_finished_request_is_reused(app, prefetch):
+    _registry, calls, _failing, _blocked = prefetch
+
+    first = app.prefetch_pvgis_profile(request(45.76))
+    first.result(10)
+    second = app.prefetch_pvgis_profile(request(45.76))
+
+    assert second is first
+    assert calls == [45.76]
+    assert second.result()[0] == {"latitude": 45.76}
+
+
+def test_failed_request_waits_for_explicit_retry(app, prefetch):
+    _registry, calls, failing, _blocked = prefetch
+    failing.add(45.76)
+
+    failed = app.prefetch_pvgis_profile(request(45.76))
+    with pytest.raises(ConnectionError):
+        failed.result(10)
+
+    assert app.prefetch_pvgis_profile(request(45.76)) is failed
+    assert calls == [45.76]
+
+    failing.clear()
+    retried = app.prefetch_pvgis_profile(request(45.76), retry=True)
+
+    assert retried is not failed
+    assert retried.result(10)[0] == {"latitude": 45.76}
+    assert calls == [45.76, 45.76]
+    # Une requête aboutie n'est pas relancée, même avec retry.
+    assert app.prefetch_pvgis_profile(request(45.76), retry=True) is retried
+
+
+def test_only_finished_requests_are_evicted(app, prefetch, monkeypatch):
+    registry, _calls, _failing, blocked = prefetch
+    monkeypatch.setattr(app, "PVGIS_PREFETCH_ENTRIES", 2)
+    blocked[1.0] = threading.Event()
+
+    pending = app.prefetch_pvgis_profile(request(1.0))
+    for latitude in (2.0, 3.0):
+        app.prefetch_pvgis_profile(request(latitude)).result(10)
+    app.prefetch_pvgis_profile(request(4.0)).result(10)
+
+    jobs = registry["jobs"]
+    # La plus ancienne requête est en cours : seules les abouties sortent.
+    assert not pending.done()
+    assert list(jobs) == [request(1.0), request(4.0)]
+
+    blocked[5.0] = threading.Event()
+    app.prefetch_pvgis_profile(request(5.0))
+
+    # Au-delà de la limite, les requêtes en cours ne sont jamais évincées.
+    assert list(jobs) == [request(1.0), request(5.0)]
+    blocked[6.0] = threading.Event()
+    app.prefetch_pvgis_profile(request(6.0))
+    assert list(jobs) == [request(1.0), request(5.0), request(6.0)]
+
+    for event in blocked.values():
+        event.set()
+    pending.result(10)
+
+
+def test_wait_returns_once_the_request_is_done(app, prefetch):
+    _registry, _calls, failing, blocked = prefetch
+    failing.add(45.76)
+    blocked[45.76] = threading.Event()
+    messages = []
+
+    class Placeholder:
+        def info(self, message):
+            messages.append(message)
+            blocked[45.76].set()
+
+        def empty(self):
+            messages.append(None)
+
+    future = app.prefetch_pvgis_profile(request(45.76))
+    app.wait_for_pvgis_prefetch(future, Placeholder())
+
+    assert future.done()
+    assert isinstance(future.exception(), ConnectionError)
+    assert messages[0].startswith("⏳ Données PVGIS")
+    assert messages[-1] is None
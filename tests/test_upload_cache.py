@@ -0,0 +1,49 @@
+"""
+Cache disque des imports : une entrée incomplète est une simple absence.
+"""
+
+import json
+
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def cache_dir(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "UPLOAD_CACHE_DIR", tmp_path)
+    return tmp_path
+
+
+def test_cached_upload_round_trip(app, cache_dir):
+    df = pd.DataFrame({"Valeur": [1.0, 2.0]})
+    app.write_upload_cache("abc", df, pd.Timedelta(minutes=30), "W", "moyenne")
+
+    cached_df, time_step, source_unit, interpretation = app.read_upload_cache("abc")
+
+    pd.testing.assert_frame_equal(cached_df, df)
+    assert time_step == pd.Timedelta(minutes=30)
+    assert (source_unit, interpretation) == ("W", "moyenne")
+
+
+@pytest.mark.parametrize(
+    "metadata",
+    [
+        {"time_step_seconds": 1800, "source_unit": "W"},
+        ["time_step_seconds", 1800],
+        "{",
+    ],
+)
+def test_incomplete_metadata_is_a_cache_miss(app, cache_dir, metadata):
+    df = pd.DataFrame({"Valeur": [1.0, 2.0]})
+    app.write_upload_cache("abc", df, pd.Timedelta(minutes=30), "W", "moyenne")
+    _data_path, meta_path = app._upload_cache_paths("abc")
+    meta_path.write_text(
+        metadata if isinstance(metadata, str) else json.dumps(metadata),
+        encoding="utf-8",
+    )
+
+    assert app.read_upload_cache("abc") is None
+
+
+def test_missing_entry_is_a_cache_miss(app, cache_dir):
+    assert app.read_upload_cache("absent") is None